@@ -1,10 +1,19 @@
+import json
 import logging
+from typing import Any, AsyncIterator
 
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
 
-from app.core.config import Settings, get_settings
 from app.schemas.chat import ChatPlanRequest, ChatPlanResponse
-from app.services import GeminiPlannerError, get_gemini_planner
+from app.services import (
+    GeminiPlanner,
+    GeminiPlannerError,
+    GeminiUnavailableError,
+    get_gemini_planner,
+)
+from app.services.gemini import plan_events
 from app.services.sample_data import generate_sample_plan
 
 router = APIRouter(prefix="/chat", tags=["chat"])
@@ -15,14 +24,16 @@ LOGGER = logging.getLogger(__name__)
 @router.post("/plan", response_model=ChatPlanResponse)
 async def generate_plan(
     payload: ChatPlanRequest,
-    settings: Settings = Depends(get_settings),
+    planner: GeminiPlanner = Depends(get_gemini_planner),
 ) -> ChatPlanResponse:
     """Request a configuration plan from Gemini and fall back to the sample plan when unavailable."""
 
-    planner = get_gemini_planner(settings.gemini_api_key)
     if planner.available:
         try:
             return await planner.generate_plan(payload)
+        except GeminiUnavailableError as exc:
+            # Slow, failing or circuit-open: answer now rather than keep the user waiting.
+            LOGGER.warning("Gemini unavailable, serving the sample plan: %s", exc)
         except GeminiPlannerError as exc:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -32,3 +43,61 @@ async def generate_plan(
             LOGGER.exception("Gemini planner failed, falling back to sample plan: %s", exc)
 
     return generate_sample_plan()
+
+
+def _sse(event: str, data: Any) -> str:
+    body = data.model_dump_json() if isinstance(data, BaseModel) else json.dumps(data)
+    return f"event: {event}\ndata: {body}\n\n"
+
+
+@router.post("/plan/stream")
+async def stream_plan(
+    payload: ChatPlanRequest,
+    planner: GeminiPlanner = Depends(get_gemini_planner),
+) -> StreamingResponse:
+    """Stream a configuration plan as server-sent events.
+
+    Emits a ``component`` event per build component as soon as Gemini has produced it,
+    then ``summary`` and ``alternative`` events, and finally ``plan`` with the validated
+    ``ChatPlanResponse``. Failures arrive as an ``error`` event, except that when Gemini
+    is unavailable before anything was sent, or not configured, the sample plan is
+    streamed in the same shape.
+    """
+
+    async def events() -> AsyncIterator[str]:
+        if planner.available:
+            started = False
+            try:
+                async for event, data in planner.stream_plan(payload):
+                    started = True
+                    yield _sse(event, data)
+                return
+            except GeminiUnavailableError as exc:
+                if started:
+                    yield _sse("error", {"detail": str(exc)})
+                    return
+                LOGGER.warning("Gemini unavailable, streaming the sample plan: %s", exc)
+            except GeminiPlannerError as exc:
+                yield _sse("error", {"detail": str(exc)})
+                return
+            except Exception as exc:  # pragma: no cover - defensive logging
+                LOGGER.exception("Gemini plan stream failed: %s", exc)
+                yield _sse("error", {"detail": "Plan generation failed."})
+                return
+
+        for event, data in plan_events(generate_sample_plan()):
+            yield _sse(event, data)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # Keep proxies from buffering the stream into one late response.
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/planner/stats", response_model=dict)
+async def planner_stats(planner: GeminiPlanner = Depends(get_gemini_planner)) -> dict:
+    """Report the planner's circuit breaker state, call latency percentiles and counters."""
+
+    return planner.snapshot()
@@ -1,15 +1,54 @@
-from typing import List
+from datetime import datetime
+from typing import Dict, List, Literal, Optional
 
-from fastapi import APIRouter, Path
+from fastapi import APIRouter, Depends, HTTPException, Path, Query, status
 
-from app.schemas.product import PricePoint
-from app.services.sample_data import generate_price_history
+from app.schemas.product import PricePoint, PriceRollup
+from app.services import PriceHistoryStore, get_price_history_store
+from app.services.executors import run_search
 
 router = APIRouter(prefix="/price", tags=["price"])
 
+_MAX_BATCH_SKUS = 100
+
+
+@router.get("/history", response_model=Dict[str, List[PricePoint]])
+async def price_histories(
+    sku: List[str] = Query(..., description="Product SKUs; repeat the parameter for each"),
+    start: Optional[datetime] = Query(default=None, description="Range start (inclusive)"),
+    end: Optional[datetime] = Query(default=None, description="Range end (inclusive)"),
+    history: PriceHistoryStore = Depends(get_price_history_store),
+) -> Dict[str, List[PricePoint]]:
+    """Return the price history of several products at once, keyed by SKU."""
+
+    if len(sku) > _MAX_BATCH_SKUS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {_MAX_BATCH_SKUS} SKUs per request",
+        )
+    return await run_search(history.histories, list(dict.fromkeys(sku)), start, end)
+
 
 @router.get("/history/{sku}", response_model=List[PricePoint])
-async def price_history(sku: str = Path(..., description="Product SKU")) -> List[PricePoint]:
-    """Return price history data for the requested product."""
+async def price_history(
+    sku: str = Path(..., description="Product SKU"),
+    start: Optional[datetime] = Query(default=None, description="Range start (inclusive)"),
+    end: Optional[datetime] = Query(default=None, description="Range end (inclusive)"),
+    history: PriceHistoryStore = Depends(get_price_history_store),
+) -> List[PricePoint]:
+    """Return the recorded price changes of a product, oldest first."""
+
+    return await run_search(history.history, sku, start, end)
+
+
+@router.get("/history/{sku}/rollups", response_model=List[PriceRollup])
+async def price_rollups(
+    sku: str = Path(..., description="Product SKU"),
+    resolution: Literal["day", "week"] = Query(default="day", description="Period length"),
+    start: Optional[datetime] = Query(default=None, description="Range start (inclusive)"),
+    end: Optional[datetime] = Query(default=None, description="Range end (inclusive)"),
+    history: PriceHistoryStore = Depends(get_price_history_store),
+) -> List[PriceRollup]:
+    """Return per-vendor daily or weekly min/max/average prices for a product."""
 
-    return generate_price_history(sku)
+    return await run_search(history.rollups, sku, resolution, start, end)
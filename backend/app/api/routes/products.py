@@ -1,11 +1,19 @@
 from datetime import datetime
-from datetime import datetime
-from typing import List, Optional
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional
 
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
 
-from app.schemas.product import Product
-from app.services import DataPipeline, SimpleVectorStore, get_pipeline, get_vector_store
+from app.schemas.product import Product, ProductPage, RefreshJob
+from app.services import (
+    RefreshScheduler,
+    SimpleVectorStore,
+    get_refresh_scheduler,
+    get_vector_store,
+)
+from app.services.browse_index import SORT_KEYS, InvalidCursorError
+from app.services.executors import run_search
 
 router = APIRouter(prefix="/products", tags=["products"])
 
@@ -35,23 +43,149 @@ async def search_products(
     min_price: Optional[float] = Query(default=None, ge=0, description="Minimum price filter"),
     max_price: Optional[float] = Query(default=None, ge=0, description="Maximum price filter"),
     tags: Optional[List[str]] = Query(default=None, description="Optional scenario tags"),
+    nprobe: Optional[int] = Query(
+        default=None, ge=1, description="ANN lists to probe; higher trades latency for recall"
+    ),
+    limit: int = Query(default=10, ge=1, le=100, description="Maximum number of results"),
     store: SimpleVectorStore = Depends(get_vector_store),
 ) -> List[Product]:
     """Retrieve product details via the vector index."""
 
-    results = store.search(
+    if not (keyword and keyword.strip()):
+        # Without a keyword there is nothing to rank; serve the newest listings instead.
+        results, _ = await run_search(
+            store.browse,
+            limit=limit,
+            category=category,
+            min_price=min_price,
+            max_price=max_price,
+            tags=tags,
+        )
+        return [_to_product(item) for item in results]
+
+    results = await run_search(
+        store.search,
         keyword,
+        top_k=limit,
         category=category,
         min_price=min_price,
         max_price=max_price,
         tags=tags,
+        nprobe=nprobe,
     )
     return [_to_product(item) for item in results]
 
 
-@router.post("/refresh", response_model=dict)
-async def refresh_products(pipeline: DataPipeline = Depends(get_pipeline)) -> dict:
-    """Run the sample crawler and refresh the vector index."""
+@router.get("/browse", response_model=ProductPage)
+async def browse_products(
+    category: Optional[str] = Query(default=None, description="Product category"),
+    min_price: Optional[float] = Query(default=None, ge=0, description="Minimum price filter"),
+    max_price: Optional[float] = Query(default=None, ge=0, description="Maximum price filter"),
+    tags: Optional[List[str]] = Query(default=None, description="Optional scenario tags"),
+    sort: str = Query(
+        default="updated_at",
+        pattern=f"^({'|'.join(SORT_KEYS)})$",
+        description="Sort order: price_asc, price_desc, rating or updated_at (newest first)",
+    ),
+    cursor: Optional[str] = Query(default=None, description="Cursor from the previous page"),
+    limit: int = Query(default=20, ge=1, le=100, description="Page size"),
+    store: SimpleVectorStore = Depends(get_vector_store),
+) -> ProductPage:
+    """List products in a precomputed sort order with cursor pagination."""
+
+    try:
+        items, next_cursor = await run_search(
+            store.browse,
+            sort=sort,
+            cursor=cursor,
+            limit=limit,
+            category=category,
+            min_price=min_price,
+            max_price=max_price,
+            tags=tags,
+        )
+    except InvalidCursorError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+    return ProductPage(items=[_to_product(item) for item in items], next_cursor=next_cursor)
+
+
+def _ndjson_chunks(items: Iterable[dict], batch_size: int = 64) -> Iterator[bytes]:
+    # At most ``batch_size`` serialized products are buffered before being handed to the client.
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield "".join(_to_product(item).model_dump_json() + "\n" for item in batch).encode("utf-8")
+
+
+@router.get("/export")
+async def export_products(
+    keyword: Optional[str] = Query(default=None, description="Keyword to rank by"),
+    category: Optional[str] = Query(default=None, description="Product category"),
+    min_price: Optional[float] = Query(default=None, ge=0, description="Minimum price filter"),
+    max_price: Optional[float] = Query(default=None, ge=0, description="Maximum price filter"),
+    tags: Optional[List[str]] = Query(default=None, description="Optional scenario tags"),
+    sort: str = Query(
+        default="updated_at",
+        pattern=f"^({'|'.join(SORT_KEYS)})$",
+        description="Order used when no keyword is given",
+    ),
+    limit: Optional[int] = Query(default=None, ge=1, description="Stop after this many products"),
+    store: SimpleVectorStore = Depends(get_vector_store),
+) -> StreamingResponse:
+    """Stream every matching product as newline-delimited JSON."""
+
+    results = store.iter_search(
+        keyword,
+        category=category,
+        min_price=min_price,
+        max_price=max_price,
+        tags=tags,
+        sort=sort,
+    )
+    if limit is not None:
+        results = islice(results, limit)
+    return StreamingResponse(_ndjson_chunks(results), media_type="application/x-ndjson")
+
+
+@router.get("/cache/stats", response_model=dict)
+async def search_cache_stats(store: SimpleVectorStore = Depends(get_vector_store)) -> dict:
+    """Report hit, miss and eviction counters of the search result cache."""
+
+    return {"generation": store.generation, **store.cache.snapshot()}
+
+
+@router.post("/refresh", response_model=RefreshJob, status_code=status.HTTP_202_ACCEPTED)
+async def refresh_products(
+    vendor: Optional[List[str]] = Query(default=None, description="Vendors to crawl; all by default"),
+    scheduler: RefreshScheduler = Depends(get_refresh_scheduler),
+) -> RefreshJob:
+    """Queue a crawl and ingest job and return it without waiting for it to run.
+
+    A request for the same vendors as a job that is still queued or running returns
+    that job instead of starting another.
+    """
+
+    return scheduler.submit(vendor)
+
+
+@router.get("/refresh", response_model=List[RefreshJob])
+async def list_refresh_jobs(
+    scheduler: RefreshScheduler = Depends(get_refresh_scheduler),
+) -> List[RefreshJob]:
+    """List recent refresh jobs, newest first."""
+
+    return scheduler.jobs()
+
+
+@router.get("/refresh/{job_id}", response_model=RefreshJob)
+async def get_refresh_job(
+    job_id: str, scheduler: RefreshScheduler = Depends(get_refresh_scheduler)
+) -> RefreshJob:
+    """Report the status, timing and ingest counts of one refresh job."""
 
-    results = await pipeline.refresh_samples()
-    return {"ingested": len(results)}
+    job = scheduler.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Unknown refresh job.")
+    return job
@@ -1,12 +1,33 @@
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.api.router import api_router
 from app.core.config import get_settings
+from app.services import get_gemini_planner, get_refresh_scheduler
+from app.services.crawlers import get_crawler_runtime
+from app.services.executors import shutdown_parse_pool
 
 settings = get_settings()
 
-app = FastAPI(title=settings.project_name, version="0.1.0")
+
+@asynccontextmanager
+async def lifespan(_: FastAPI) -> AsyncIterator[None]:
+    planner = get_gemini_planner()
+    scheduler = get_refresh_scheduler()
+    await scheduler.start()
+    try:
+        yield
+    finally:
+        await scheduler.stop()
+        await planner.aclose()
+        await get_crawler_runtime().aclose()
+        shutdown_parse_pool()
+
+
+app = FastAPI(title=settings.project_name, version="0.1.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
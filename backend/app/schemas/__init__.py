@@ -7,7 +7,7 @@ from .chat import (
     ChatPlanResponse,
 )
 from .feedback import FeedbackRequest, FeedbackResponse
-from .product import PricePoint, Product, ProductFilter
+from .product import PricePoint, PriceRollup, Product, ProductFilter, ProductPage, RefreshJob
 
 __all__ = [
     "AlternativeBuild",
@@ -20,6 +20,9 @@ __all__ = [
     "FeedbackRequest",
     "FeedbackResponse",
     "PricePoint",
+    "PriceRollup",
     "Product",
     "ProductFilter",
+    "ProductPage",
+    "RefreshJob",
 ]
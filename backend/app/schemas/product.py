@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import List, Optional
+from typing import Dict, List, Literal, Optional
 
 from pydantic import BaseModel, Field
 
@@ -25,8 +25,49 @@ class Product(BaseModel):
     updated_at: datetime = Field(..., description="Last updated time")
 
 
+class ProductPage(BaseModel):
+    items: List[Product] = Field(default_factory=list, description="Products on this page")
+    next_cursor: Optional[str] = Field(
+        default=None, description="Opaque cursor for the next page, absent on the last page"
+    )
+
+
+class RefreshJob(BaseModel):
+    job_id: str = Field(..., description="Job identifier")
+    status: Literal["queued", "running", "done", "failed"] = Field(
+        default="queued", description="Lifecycle state"
+    )
+    trigger: Literal["manual", "schedule"] = Field(default="manual", description="What queued the job")
+    vendors: Optional[List[str]] = Field(default=None, description="Vendors to crawl, all when absent")
+    created_at: datetime = Field(..., description="Time the job was queued")
+    started_at: Optional[datetime] = Field(default=None, description="Time the job started running")
+    finished_at: Optional[datetime] = Field(default=None, description="Time the job finished")
+    duration_seconds: Optional[float] = Field(default=None, description="Run time once finished")
+    ingested: Optional[int] = Field(default=None, description="Products crawled")
+    added: Optional[int] = Field(default=None, description="New products indexed")
+    changed: Optional[int] = Field(default=None, description="Existing products updated")
+    unchanged: Optional[int] = Field(default=None, description="Products skipped as identical")
+    removed: Optional[int] = Field(default=None, description="Products no longer listed")
+    rejected: Optional[int] = Field(default=None, description="Listings that failed validation")
+    price_changes: Optional[int] = Field(default=None, description="Price history points recorded")
+    failed_vendors: List[str] = Field(default_factory=list, description="Vendors whose crawl failed")
+    stages: Dict[str, Dict[str, float]] = Field(
+        default_factory=dict, description="Per-stage items, busy seconds and throughput"
+    )
+    error: Optional[str] = Field(default=None, description="Failure reason")
+
+
 class PricePoint(BaseModel):
     timestamp: datetime = Field(..., description="Price timestamp")
     price: float = Field(..., description="Price")
     currency: str = Field(default="CNY", description="Currency unit")
     vendor: str = Field(..., description="Price source platform")
+
+
+class PriceRollup(BaseModel):
+    period_start: datetime = Field(..., description="Start of the day or week (UTC)")
+    min_price: float = Field(..., description="Lowest price in effect during the period")
+    max_price: float = Field(..., description="Highest price in effect during the period")
+    avg_price: float = Field(..., description="Time-weighted average price over the period")
+    currency: str = Field(default="CNY", description="Currency unit")
+    vendor: str = Field(..., description="Price source platform")
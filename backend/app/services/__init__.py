@@ -1,13 +1,31 @@
-from .gemini import GeminiPlanner, GeminiPlannerError, get_gemini_planner
+from .gemini import (
+    GeminiPlanner,
+    GeminiPlannerError,
+    GeminiUnavailableError,
+    get_gemini_planner,
+)
 from .pipeline import DataPipeline, get_pipeline
+from .plan_cache import PlanCache, get_plan_cache
+from .prompt_builder import PromptBuilder, get_prompt_builder
+from .price_history import PriceHistoryStore, get_price_history_store
+from .scheduler import RefreshScheduler, get_refresh_scheduler
 from .vector_store import SimpleVectorStore, get_vector_store
 
 __all__ = [
     "GeminiPlanner",
     "GeminiPlannerError",
+    "GeminiUnavailableError",
     "get_gemini_planner",
     "DataPipeline",
     "get_pipeline",
+    "PlanCache",
+    "get_plan_cache",
+    "PromptBuilder",
+    "get_prompt_builder",
+    "PriceHistoryStore",
+    "get_price_history_store",
+    "RefreshScheduler",
+    "get_refresh_scheduler",
     "SimpleVectorStore",
     "get_vector_store",
 ]
@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+import math
+from typing import Dict, List, Optional, Set
+
+import numpy as np
+
+_CHUNK_ROWS = 8192
+
+
+class IVFIndex:
+    """Inverted-file approximate nearest-neighbour index over normalized vectors.
+
+    Coarse centroids are trained with spherical k-means on a sample of the catalog and
+    every row is filed under its closest centroid. A query only visits the rows of its
+    ``nprobe`` best centroids, so raising ``nprobe`` trades latency for recall; probing
+    every list is equivalent to an exact scan.
+    """
+
+    default_nprobe = 32
+    training_sample_per_list = 64
+
+    def __init__(self, dimensions: int, seed: int = 0) -> None:
+        self.dimensions = dimensions
+        self.seed = seed
+        self.centroids: Optional[np.ndarray] = None
+        self.built_size = 0
+        self._assignments = np.empty(0, dtype=np.int32)
+        self._lists: List[Set[int]] = []
+        self._arrays: Dict[int, np.ndarray] = {}
+
+    @property
+    def ready(self) -> bool:
+        return self.centroids is not None
+
+    @property
+    def nlist(self) -> int:
+        return 0 if self.centroids is None else len(self.centroids)
+
+    def reset(self) -> None:
+        self.centroids = None
+        self.built_size = 0
+        self._assignments = np.empty(0, dtype=np.int32)
+        self._lists = []
+        self._arrays = {}
+
+    def build(self, vectors: np.ndarray, rows: np.ndarray, iterations: int = 10) -> None:
+        """Train centroids on ``vectors[rows]`` and file every listed row."""
+
+        self.reset()
+        if not len(rows):
+            return
+        rng = np.random.default_rng(self.seed)
+        nlist = max(1, int(math.sqrt(len(rows))))
+        sample_size = min(len(rows), nlist * self.training_sample_per_list)
+        sample = np.asarray(vectors[np.sort(rng.choice(rows, size=sample_size, replace=False))])
+        centroids = sample[rng.choice(sample_size, size=nlist, replace=False)].copy()
+
+        for _ in range(iterations):
+            labels = self._nearest(sample, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            norms = np.linalg.norm(sums, axis=1)
+            empty = norms == 0
+            if empty.any():
+                # Re-seed dead centroids from random sample points.
+                sums[empty] = sample[rng.choice(sample_size, size=int(empty.sum()))]
+                norms[empty] = np.linalg.norm(sums[empty], axis=1)
+            centroids = sums / np.maximum(norms, 1e-12)[:, np.newaxis]
+
+        self.centroids = centroids.astype(np.float32)
+        self._lists = [set() for _ in range(nlist)]
+        self.assign(rows, vectors[rows])
+        self.built_size = len(rows)
+
+    @staticmethod
+    def _nearest(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        labels = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), _CHUNK_ROWS):
+            chunk = vectors[start : start + _CHUNK_ROWS]
+            labels[start : start + len(chunk)] = np.argmax(chunk @ centroids.T, axis=1)
+        return labels
+
+    def assign(self, rows: np.ndarray, vectors: np.ndarray) -> None:
+        """File (or re-file) ``rows`` under the centroid nearest to their new vectors."""
+
+        if self.centroids is None or not len(rows):
+            return
+        rows = np.asarray(rows, dtype=np.intp)
+        needed = int(rows.max()) + 1
+        if needed > len(self._assignments):
+            grown = np.full(max(needed, len(self._assignments) * 2), -1, dtype=np.int32)
+            grown[: len(self._assignments)] = self._assignments
+            self._assignments = grown
+        labels = self._nearest(np.asarray(vectors, dtype=np.float32), self.centroids)
+        for row, label in zip(rows.tolist(), labels.tolist()):
+            self.discard(row)
+            self._lists[label].add(row)
+            self._assignments[row] = label
+            self._arrays.pop(label, None)
+
+    def discard(self, row: int) -> None:
+        if row >= len(self._assignments):
+            return
+        label = int(self._assignments[row])
+        if label < 0:
+            return
+        self._lists[label].discard(row)
+        self._assignments[row] = -1
+        self._arrays.pop(label, None)
+
+    def take(self, rows: np.ndarray) -> None:
+        """Renumber after compaction: new row ``i`` is old row ``rows[i]``."""
+
+        if self.centroids is None:
+            return
+        assignments = np.full(len(rows), -1, dtype=np.int32)
+        known = rows < len(self._assignments)
+        assignments[known] = self._assignments[rows[known]]
+        self.load_state(self.centroids, assignments, self.built_size)
+
+    def probe(self, query: np.ndarray, nprobe: Optional[int] = None) -> np.ndarray:
+        """Return the sorted rows filed under the ``nprobe`` centroids closest to ``query``."""
+
+        if self.centroids is None:
+            return np.empty(0, dtype=np.intp)
+        nprobe = min(self.nlist, max(1, nprobe or self.default_nprobe))
+        scores = self.centroids @ query
+        if nprobe < self.nlist:
+            selected = np.argpartition(-scores, nprobe - 1)[:nprobe]
+        else:
+            selected = np.arange(self.nlist)
+        arrays = [self._list_array(int(label)) for label in selected]
+        return np.sort(np.concatenate(arrays)) if arrays else np.empty(0, dtype=np.intp)
+
+    def _list_array(self, label: int) -> np.ndarray:
+        array = self._arrays.get(label)
+        if array is None:
+            array = np.fromiter(self._lists[label], dtype=np.intp, count=len(self._lists[label]))
+            self._arrays[label] = array
+        return array
+
+    def state(self) -> Dict[str, np.ndarray]:
+        if self.centroids is None:
+            return {}
+        return {
+            "centroids": self.centroids,
+            "assignments": self._assignments,
+            "built_size": np.asarray(self.built_size),
+        }
+
+    def load_state(
+        self, centroids: np.ndarray, assignments: np.ndarray, built_size: Optional[int] = None
+    ) -> None:
+        self.centroids = np.asarray(centroids, dtype=np.float32)
+        self._assignments = np.asarray(assignments, dtype=np.int32).copy()
+        self._lists = [set() for _ in range(len(self.centroids))]
+        self._arrays = {}
+        order = np.argsort(self._assignments, kind="stable")
+        labels = self._assignments[order]
+        bounds = np.searchsorted(labels, np.arange(len(self.centroids) + 1))
+        for label in range(len(self.centroids)):
+            self._lists[label] = set(order[bounds[label] : bounds[label + 1]].tolist())
+        if built_size is not None:
+            self.built_size = built_size
+        else:
+            self.built_size = int((self._assignments >= 0).sum())
@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import base64
+import bisect
+import binascii
+import hashlib
+import hmac
+import json
+import secrets
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.config import get_settings
+
+SORT_KEYS = ("price_asc", "price_desc", "rating", "updated_at")
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a browse cursor is malformed, forged or belongs to another sort."""
+
+
+def _timestamp(value: Any) -> float:
+    if isinstance(value, datetime):
+        return value.timestamp()
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+        except ValueError:
+            return 0.0
+    return 0.0
+
+
+def _sort_key(sort: str, metadata: Dict[str, Any]) -> float:
+    """Numeric key whose ascending order is the requested browse order."""
+
+    if sort == "price_asc":
+        return float(metadata.get("price", 0))
+    if sort == "price_desc":
+        return -float(metadata.get("price", 0))
+    if sort == "rating":
+        rating = metadata.get("rating")
+        return -float(rating) if rating is not None else np.inf
+    return -_timestamp(metadata.get("updated_at"))
+
+
+@lru_cache(maxsize=1)
+def _cursor_key() -> bytes:
+    secret = get_settings().browse_cursor_secret
+    return secret.encode("utf-8") if secret else secrets.token_bytes(32)
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).decode("ascii").rstrip("=")
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode((text + "=" * (-len(text) % 4)).encode("ascii"))
+
+
+def _signature(payload: bytes) -> bytes:
+    return hmac.new(_cursor_key(), payload, hashlib.sha256).digest()[:12]
+
+
+def encode_cursor(sort: str, key: float, identifier: str) -> str:
+    payload = json.dumps({"s": sort, "k": key, "id": identifier}, separators=(",", ":"))
+    payload_bytes = payload.encode("utf-8")
+    return f"{_b64encode(payload_bytes)}.{_b64encode(_signature(payload_bytes))}"
+
+
+def decode_cursor(cursor: str, sort: str) -> Tuple[float, str]:
+    try:
+        encoded_payload, encoded_signature = cursor.split(".")
+        payload_bytes = _b64decode(encoded_payload)
+        signature = _b64decode(encoded_signature)
+    except (binascii.Error, UnicodeError, ValueError) as exc:
+        raise InvalidCursorError("Malformed browse cursor.") from exc
+    if not hmac.compare_digest(signature, _signature(payload_bytes)):
+        raise InvalidCursorError("Browse cursor failed verification.")
+    try:
+        payload = json.loads(payload_bytes)
+        key, identifier = float(payload["k"]), str(payload["id"])
+    except (UnicodeError, ValueError, KeyError, TypeError) as exc:
+        raise InvalidCursorError("Malformed browse cursor.") from exc
+    if payload.get("s") != sort:
+        raise InvalidCursorError("Cursor was issued for a different sort order.")
+    return key, identifier
+
+
+class _SortedView:
+    """Live rows ordered by ``(key, identifier)`` with the inverse row -> position map."""
+
+    def __init__(self, rows: np.ndarray, keys: np.ndarray, identifiers: Sequence[str], total: int) -> None:
+        order = np.lexsort((np.asarray(identifiers, dtype=object), keys))
+        self.rows = rows[order]
+        self.keys = keys[order]
+        self.identifiers = [identifiers[index] for index in order.tolist()]
+        self.positions = np.full(total, -1, dtype=np.intp)
+        self.positions[self.rows] = np.arange(len(self.rows))
+
+    def seek(self, key: float, identifier: str) -> int:
+        """Position of the first entry strictly after ``(key, identifier)``."""
+
+        low = int(np.searchsorted(self.keys, key, side="left"))
+        high = int(np.searchsorted(self.keys, key, side="right"))
+        return bisect.bisect_right(self.identifiers, identifier, low, high)
+
+
+class BrowseIndex:
+    """Precomputed sort orders for keyword-less listings with keyset cursors.
+
+    Views are rebuilt lazily the first time they are read after the owning store's
+    generation changes. A page costs one binary search to resume from the cursor plus
+    a walk over the page itself, independent of how deep the cursor is.
+    """
+
+    def __init__(self) -> None:
+        self._generation: Optional[int] = None
+        self._views: Dict[str, _SortedView] = {}
+
+    def view(
+        self,
+        sort: str,
+        generation: int,
+        load: Callable[[], Tuple[np.ndarray, List[str], List[Dict[str, Any]]]],
+        total: int,
+    ) -> _SortedView:
+        """Return the view for ``sort``; ``load`` yields live rows, identifiers and metadata."""
+
+        if sort not in SORT_KEYS:
+            raise ValueError(f"Unsupported sort order: {sort}")
+        if self._generation != generation:
+            self._views = {}
+            self._generation = generation
+        view = self._views.get(sort)
+        if view is None:
+            rows, identifiers, metadata = load()
+            keys = np.fromiter(
+                (_sort_key(sort, item) for item in metadata), dtype=np.float64, count=len(metadata)
+            )
+            view = _SortedView(rows, keys, identifiers, total)
+            self._views[sort] = view
+        return view
+
+    @staticmethod
+    def page(
+        view: _SortedView,
+        start: int,
+        limit: int,
+        candidates: Optional[np.ndarray],
+        accept: Callable[[int], bool],
+    ) -> List[int]:
+        """Return up to ``limit + 1`` positions at or after ``start`` that pass the filters.
+
+        ``candidates`` (when given) are the exact rows matching the filters; otherwise rows
+        are walked in view order and checked with ``accept``.
+        """
+
+        if candidates is not None:
+            positions = view.positions[candidates]
+            positions = positions[positions >= start]
+            wanted = min(limit + 1, len(positions))
+            if wanted < len(positions):
+                positions = np.partition(positions, wanted - 1)[:wanted]
+            return np.sort(positions).tolist()
+
+        selected: List[int] = []
+        for position in range(start, len(view.rows)):
+            if accept(int(view.rows[position])):
+                selected.append(position)
+                if len(selected) > limit:
+                    break
+        return selected
@@ -1,4 +1,33 @@
-from .canadacomputers import CanadaComputersCrawler
-from .newegg import NeweggCrawler
+from .canadacomputers import CanadaComputersCrawler, CanadaComputersHtmlCrawler
+from .html import HtmlCrawler, parse_listing, parse_product
+from .http_cache import CachedPage, HttpCache
+from .newegg import NeweggCrawler, NeweggHtmlCrawler
+from .runtime import (
+    Crawler,
+    CrawlerRuntime,
+    Page,
+    RateLimiter,
+    VendorLimits,
+    get_crawler_runtime,
+)
+from .source import SourceCache, get_source_cache
 
-__all__ = ["CanadaComputersCrawler", "NeweggCrawler"]
+__all__ = [
+    "CanadaComputersCrawler",
+    "CanadaComputersHtmlCrawler",
+    "NeweggCrawler",
+    "NeweggHtmlCrawler",
+    "HtmlCrawler",
+    "parse_listing",
+    "parse_product",
+    "CachedPage",
+    "HttpCache",
+    "Crawler",
+    "CrawlerRuntime",
+    "Page",
+    "RateLimiter",
+    "VendorLimits",
+    "get_crawler_runtime",
+    "SourceCache",
+    "get_source_cache",
+]
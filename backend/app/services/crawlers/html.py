@@ -0,0 +1,250 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import re
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, Iterator, List, Mapping, Optional, Set, Tuple
+from urllib.parse import urldefrag, urljoin
+
+import httpx
+from selectolax.parser import HTMLParser
+
+from ..executors import run_parse
+from .base import CrawlerResult
+from .runtime import CrawlerRuntime, get_crawler_runtime
+
+LOGGER = logging.getLogger(__name__)
+
+# A product page that is gone has been delisted; any other failure fails the crawl.
+_GONE = (404, 410)
+
+
+# Parsers run in the process pool, so they stay module-level functions of plain data.
+
+
+def parse_listing(html: str, url: str, product_pattern: str) -> Tuple[List[str], Optional[str]]:
+    """Return the product links on a listing page, in page order, and its next page."""
+
+    tree = HTMLParser(html)
+    pattern = re.compile(product_pattern)
+    links: List[str] = []
+    seen: Set[str] = set()
+    for node in tree.css("a[href]"):
+        link = urldefrag(urljoin(url, node.attributes.get("href") or ""))[0]
+        if pattern.search(link) and link not in seen:
+            seen.add(link)
+            links.append(link)
+    next_node = tree.css_first('link[rel="next"][href], a[rel="next"][href]')
+    next_url = urljoin(url, next_node.attributes["href"]) if next_node is not None else None
+    return links, next_url
+
+
+def parse_product(html: str, url: str) -> Optional[Dict[str, Any]]:
+    """Extract a product from its page's schema.org markup.
+
+    Retail pages describe the product for search engines as JSON-LD, which is far more
+    stable than their visual markup; Open Graph product tags are the fallback. Returns
+    ``None`` when the page has neither a name nor a price.
+    """
+
+    tree = HTMLParser(html)
+    product = next((node for node in _json_ld(tree) if _is_product(node)), None)
+    data = _from_json_ld(product) if product is not None else _from_meta(tree)
+    if not data.get("name") or data.get("price") is None:
+        return None
+    if not data.get("url"):
+        canonical = tree.css_first('link[rel="canonical"][href]')
+        data["url"] = urljoin(url, canonical.attributes["href"]) if canonical is not None else url
+    return data
+
+
+def _json_ld(tree: HTMLParser) -> Iterator[Dict[str, Any]]:
+    for script in tree.css('script[type="application/ld+json"]'):
+        try:
+            pending: List[Any] = [json.loads(script.text())]
+        except ValueError:
+            continue
+        while pending:
+            node = pending.pop(0)
+            if isinstance(node, list):
+                pending.extend(node)
+            elif isinstance(node, dict):
+                yield node
+                pending.extend(node.get("@graph") or [])
+
+
+def _is_product(node: Dict[str, Any]) -> bool:
+    kind = node.get("@type")
+    return "Product" in (kind if isinstance(kind, list) else [kind])
+
+
+def _from_json_ld(product: Dict[str, Any]) -> Dict[str, Any]:
+    offers = product.get("offers") or {}
+    offer = (offers[0] if offers else {}) if isinstance(offers, list) else offers
+    rating = product.get("aggregateRating") or {}
+    brand = product.get("brand")
+    specs: Dict[str, Any] = {}
+    if isinstance(brand, dict) and brand.get("name"):
+        specs["brand"] = brand["name"]
+    elif isinstance(brand, str) and brand:
+        specs["brand"] = brand
+    for prop in product.get("additionalProperty") or []:
+        if isinstance(prop, dict) and prop.get("name") and prop.get("value") is not None:
+            specs[str(prop["name"])] = prop["value"]
+    category = product.get("category")
+    return {
+        "sku": product.get("sku") or product.get("mpn") or product.get("productID"),
+        "name": product.get("name"),
+        # Breadcrumb-style categories ("Components > Graphics Cards") keep the leaf.
+        "category": re.split(r"\s*[>/]\s*", category)[-1] if isinstance(category, str) else None,
+        "price": _number(offer.get("price", offer.get("lowPrice"))),
+        "currency": offer.get("priceCurrency"),
+        "rating": _number(rating.get("ratingValue")) if isinstance(rating, dict) else None,
+        "stock_status": _availability(offer.get("availability")),
+        "specs": specs,
+        "url": product.get("url"),
+    }
+
+
+def _from_meta(tree: HTMLParser) -> Dict[str, Any]:
+    def meta(selector: str) -> Optional[str]:
+        node = tree.css_first(selector)
+        return node.attributes.get("content") if node is not None else None
+
+    return {
+        "sku": meta('meta[itemprop="sku"]') or meta('meta[property="product:retailer_item_id"]'),
+        "name": meta('meta[property="og:title"]'),
+        "category": None,
+        "price": _number(meta('meta[property="product:price:amount"]')),
+        "currency": meta('meta[property="product:price:currency"]'),
+        "rating": None,
+        "stock_status": _availability(meta('meta[property="product:availability"]')),
+        "specs": {},
+        "url": meta('meta[property="og:url"]'),
+    }
+
+
+def _number(value: Any) -> Optional[float]:
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return float(re.sub(r"[^\d.]", "", value))
+        except ValueError:
+            return None
+    return None
+
+
+def _availability(value: Any) -> Optional[str]:
+    """``https://schema.org/InStock`` or ``in stock`` -> ``in_stock``."""
+
+    if not isinstance(value, str) or not value:
+        return None
+    leaf = value.rstrip("/").rsplit("/", 1)[-1]
+    return re.sub(r"(?<=[a-z])(?=[A-Z])|[\s-]+", "_", leaf).lower()
+
+
+class HtmlCrawler:
+    """Crawl a vendor's category listings and product pages.
+
+    ``listings`` maps each listing URL (relative to the vendor's ``base_url`` if one is
+    set) to the category used for products whose page does not name one. Listings are
+    followed through their ``rel="next"`` links. Pages come through
+    ``CrawlerRuntime.fetch_page``, so revisits are conditional GETs against the HTTP
+    cache, and parsing runs in the process pool to keep the event loop free.
+
+    Subclasses set ``vendor``, ``product_pattern`` (a regex that product links match)
+    and optionally ``sku_pattern`` to read the vendor's item number from the URL when
+    the page does not state a SKU.
+    """
+
+    vendor = ""
+    product_pattern = ""
+    sku_pattern: Optional[str] = None
+    max_listing_pages = 50
+
+    def __init__(self, listings: Mapping[str, str]) -> None:
+        self.listings = dict(listings)
+
+    async def fetch_latest(
+        self, runtime: Optional[CrawlerRuntime] = None
+    ) -> List[CrawlerResult]:
+        return [result async for batch in self.iter_batches(runtime) for result in batch]
+
+    async def iter_batches(
+        self, runtime: Optional[CrawlerRuntime] = None, batch_size: int = 256
+    ) -> AsyncIterator[List[CrawlerResult]]:
+        runtime = runtime or get_crawler_runtime()
+        batch: List[CrawlerResult] = []
+        seen: Set[str] = set()
+        for start, category in self.listings.items():
+            url: Optional[str] = start
+            for _ in range(self.max_listing_pages):
+                if url is None:
+                    break
+                page = await runtime.fetch_page(self.vendor, url)
+                links, url = await run_parse(
+                    parse_listing, page.text, page.url, self.product_pattern
+                )
+                links = [link for link in links if link not in seen]
+                seen.update(links)
+                # The runtime's per-vendor limits bound how many of these are in flight.
+                results = await asyncio.gather(
+                    *(self._product(runtime, link, category) for link in links),
+                    return_exceptions=True,
+                )
+                for result in results:
+                    if isinstance(result, BaseException):
+                        raise result
+                    if result is not None:
+                        batch.append(result)
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+        if batch:
+            yield batch
+
+    async def _product(
+        self, runtime: CrawlerRuntime, url: str, category: str
+    ) -> Optional[CrawlerResult]:
+        try:
+            page = await runtime.fetch_page(self.vendor, url)
+        except httpx.HTTPStatusError as exc:
+            if exc.response.status_code not in _GONE:
+                raise
+            LOGGER.info("Skipping delisted %s page %s", self.vendor, url)
+            return None
+        data = await run_parse(parse_product, page.text, page.url)
+        result = self._to_result(data, page.url, category) if data is not None else None
+        if result is None:
+            LOGGER.warning("No usable product data on %s page %s", self.vendor, url)
+        return result
+
+    def _to_result(
+        self, data: Dict[str, Any], url: str, category: str
+    ) -> Optional[CrawlerResult]:
+        sku = data.get("sku") or self._sku_from_url(url)
+        if not sku:
+            return None
+        return CrawlerResult(
+            # Vendors number items independently, so namespace their SKUs.
+            sku=f"{self.vendor}-{sku}",
+            name=data["name"],
+            category=data.get("category") or category,
+            price=data["price"],
+            currency=data.get("currency") or "USD",
+            vendor=self.vendor,
+            rating=data.get("rating"),
+            stock_status=data.get("stock_status"),
+            specs=data.get("specs") or {},
+            url=data.get("url") or url,
+            updated_at=datetime.now(timezone.utc),
+        )
+
+    def _sku_from_url(self, url: str) -> Optional[str]:
+        match = re.search(self.sku_pattern, url) if self.sku_pattern else None
+        if match is None:
+            return None
+        return next((group for group in match.groups() if group), None) or match.group(0)
@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Mapping, Optional, Tuple
+
+_CACHE_DIR = Path(__file__).resolve().parents[2] / "data" / "http_cache"
+
+
+@dataclass
+class CachedPage:
+    url: str
+    body: bytes
+    encoding: Optional[str] = None
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+    @property
+    def text(self) -> str:
+        return self.body.decode(self.encoding or "utf-8", errors="replace")
+
+    def validators(self) -> Dict[str, str]:
+        """Headers that turn a GET for this page into a conditional one."""
+
+        headers: Dict[str, str] = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class HttpCache:
+    """On-disk cache of fetched pages and their ``ETag``/``Last-Modified`` validators.
+
+    Each URL maps to a body file and a small JSON header file, named by a hash of the
+    URL. Both are written to a temporary file and renamed into place, and the header
+    records the body's size, so a torn write reads back as a miss rather than as a
+    wrong page. Responses without validators are not stored: they could never be
+    revalidated.
+    """
+
+    def __init__(self, directory: Path = _CACHE_DIR) -> None:
+        self.directory = Path(directory)
+
+    def get(self, url: str) -> Optional[CachedPage]:
+        body_path, meta_path = self._paths(url)
+        try:
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+            body = body_path.read_bytes()
+        except (FileNotFoundError, ValueError):
+            return None
+        if meta.get("url") != url or meta.get("size") != len(body):
+            return None
+        return CachedPage(
+            url=url,
+            body=body,
+            encoding=meta.get("encoding"),
+            etag=meta.get("etag"),
+            last_modified=meta.get("last_modified"),
+        )
+
+    def store(
+        self,
+        url: str,
+        body: bytes,
+        headers: Mapping[str, str],
+        encoding: Optional[str] = None,
+    ) -> Optional[CachedPage]:
+        page = CachedPage(
+            url=url,
+            body=body,
+            encoding=encoding,
+            etag=headers.get("etag"),
+            last_modified=headers.get("last-modified"),
+        )
+        if not page.validators():
+            return None
+        body_path, meta_path = self._paths(url)
+        meta = {
+            "url": url,
+            "size": len(body),
+            "encoding": encoding,
+            "etag": page.etag,
+            "last_modified": page.last_modified,
+        }
+        self._replace(body_path, body)
+        self._replace(meta_path, json.dumps(meta).encode("utf-8"))
+        return page
+
+    def clear(self) -> None:
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def _paths(self, url: str) -> Tuple[Path, Path]:
+        key = hashlib.blake2b(url.encode("utf-8"), digest_size=16).hexdigest()
+        # Shard by prefix so a large crawl does not put every file in one directory.
+        folder = self.directory / key[:2]
+        return folder / f"{key}.body", folder / f"{key}.json"
+
+    @staticmethod
+    def _replace(path: Path, data: bytes) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        handle, temp_name = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(handle, "wb") as temp:
+                temp.write(data)
+            os.replace(temp_name, path)
+        except BaseException:
+            Path(temp_name).unlink(missing_ok=True)
+            raise
@@ -2,9 +2,14 @@ from __future__ import annotations
 
 from datetime import datetime
 from pathlib import Path
-from typing import List
+from typing import TYPE_CHECKING, AsyncIterator, List, Optional
 
 from .base import CrawlerResult
+from .html import HtmlCrawler
+from .source import get_source_cache
+
+if TYPE_CHECKING:
+    from .runtime import CrawlerRuntime
 
 _DATA_PATH = Path(__file__).resolve().parents[2] / "data" / "sample_products.json"
 
@@ -14,17 +19,27 @@ class NeweggCrawler:
 
     vendor = "newegg"
 
-    async def fetch_latest(self) -> List[CrawlerResult]:
-        payloads = self._load_sample()
-        return [self._to_result(item) for item in payloads if item.get("vendor") == self.vendor]
+    async def fetch_latest(
+        self, runtime: Optional["CrawlerRuntime"] = None
+    ) -> List[CrawlerResult]:
+        return [result async for batch in self.iter_batches(runtime) for result in batch]
 
-    def _load_sample(self) -> List[dict]:
-        if not _DATA_PATH.exists():
-            return []
-        import json
+    async def iter_batches(
+        self, runtime: Optional["CrawlerRuntime"] = None, batch_size: int = 256
+    ) -> AsyncIterator[List[CrawlerResult]]:
+        # The sample payload is local; live scraping would request pages via ``runtime.fetch``.
+        batch: List[CrawlerResult] = []
+        for item in self._load_sample():
+            batch.append(self._to_result(item))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
 
-        with _DATA_PATH.open("r", encoding="utf-8") as handle:
-            return json.load(handle)
+    def _load_sample(self) -> List[dict]:
+        # Parsed once per file version and shared with the other crawlers.
+        return get_source_cache().vendor_records(_DATA_PATH, self.vendor)
 
     def _to_result(self, item: dict) -> CrawlerResult:
         updated_at = item.get("updated_at", datetime.utcnow().isoformat())
@@ -41,3 +56,12 @@ class NeweggCrawler:
             url=item.get("url"),
             updated_at=datetime.fromisoformat(updated_at.replace("Z", "+00:00")),
         )
+
+
+class NeweggHtmlCrawler(HtmlCrawler):
+    """Crawl Newegg listing and product pages over HTTP."""
+
+    vendor = "newegg"
+    # Item pages live under /p/<item number>, e.g. /p/N82E16814137846.
+    product_pattern = r"/p/[A-Z0-9-]+"
+    sku_pattern = r"/p/([A-Z0-9-]+)"
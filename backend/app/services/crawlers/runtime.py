@@ -0,0 +1,219 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Protocol
+
+import httpx
+
+from .base import CrawlerResult
+from .http_cache import HttpCache
+
+LOGGER = logging.getLogger(__name__)
+
+_USER_AGENT = "BuildaBot/0.1"
+
+
+@dataclass
+class VendorLimits:
+    """Politeness settings for one vendor.
+
+    ``base_url`` lets a crawler request relative paths, which is also how tests point a
+    vendor at a local stand-in server.
+    """
+
+    max_concurrency: int = 4
+    requests_per_second: float = 2.0
+    burst: int = 2
+    base_url: Optional[str] = None
+
+
+@dataclass
+class Page:
+    url: str
+    text: str
+    # True when the server answered 304 and the body came from the HTTP cache.
+    not_modified: bool = False
+
+
+class Crawler(Protocol):
+    vendor: str
+
+    async def fetch_latest(
+        self, runtime: Optional["CrawlerRuntime"] = None
+    ) -> List[CrawlerResult]:
+        ...
+
+    def iter_batches(
+        self, runtime: Optional["CrawlerRuntime"] = None, batch_size: int = 256
+    ) -> AsyncIterator[List[CrawlerResult]]:
+        ...
+
+
+class RateLimiter:
+    """Token bucket: ``rate`` requests per second on average, at most ``burst`` at once.
+
+    ``clock`` and ``sleep`` default to the running loop's clock and ``asyncio.sleep``.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: int = 1,
+        *,
+        clock: Optional[Callable[[], float]] = None,
+        sleep: Callable[[float], Awaitable[Any]] = asyncio.sleep,
+    ) -> None:
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = float(self.burst)
+        self._updated: Optional[float] = None
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            clock = self._clock or asyncio.get_running_loop().time
+            now = clock()
+            if self._updated is not None:
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens < 1.0:
+                # Holding the lock while sleeping keeps waiters in arrival order.
+                await self._sleep((1.0 - self._tokens) / self.rate)
+                self._updated = clock()
+                self._tokens = 1.0
+            self._tokens -= 1.0
+
+
+class _VendorGate:
+    def __init__(self, limits: VendorLimits) -> None:
+        self.limits = limits
+        self.semaphore = asyncio.Semaphore(max(1, limits.max_concurrency))
+        self.rate = RateLimiter(limits.requests_per_second, limits.burst)
+
+
+class CrawlerRuntime:
+    """Run crawlers concurrently over one pooled HTTP client with per-vendor limits.
+
+    Every request goes through ``fetch``, which waits for a slot in the vendor's
+    concurrency semaphore and a token from its rate limiter. Connections are kept alive
+    in the shared ``httpx.AsyncClient`` pool across requests and vendors.
+
+    ``fetch_page`` adds the HTTP cache: a page seen before is requested with its
+    ``ETag``/``Last-Modified`` validators, and a 304 is answered from disk.
+    """
+
+    default_limits = VendorLimits()
+
+    def __init__(
+        self,
+        vendors: Optional[Dict[str, VendorLimits]] = None,
+        *,
+        timeout: float = 15.0,
+        max_connections: int = 20,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        cache: Optional[HttpCache] = None,
+    ) -> None:
+        self.vendors = dict(vendors or {})
+        self.cache = cache
+        self.page_stats = {"fetched": 0, "not_modified": 0}
+        self._timeout = timeout
+        self._max_connections = max_connections
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._gates: Dict[str, _VendorGate] = {}
+
+    async def __aenter__(self) -> "CrawlerRuntime":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.aclose()
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=self._timeout,
+                follow_redirects=True,
+                headers={"User-Agent": _USER_AGENT},
+                limits=httpx.Limits(
+                    max_connections=self._max_connections,
+                    max_keepalive_connections=self._max_connections,
+                ),
+                transport=self._transport,
+            )
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        # Semaphores and locks belong to the loop that created them.
+        self._gates = {}
+
+    def limits_for(self, vendor: str) -> VendorLimits:
+        return self.vendors.get(vendor, self.default_limits)
+
+    def _gate(self, vendor: str) -> _VendorGate:
+        gate = self._gates.get(vendor)
+        if gate is None:
+            gate = _VendorGate(self.limits_for(vendor))
+            self._gates[vendor] = gate
+        return gate
+
+    def resolve(self, vendor: str, url: str) -> str:
+        base_url = self.limits_for(vendor).base_url
+        return str(httpx.URL(base_url).join(url)) if base_url else url
+
+    async def fetch(self, vendor: str, url: str, **kwargs: Any) -> httpx.Response:
+        """GET ``url`` (relative to the vendor's ``base_url`` if set) within its limits."""
+
+        response = await self._get(vendor, self.resolve(vendor, url), **kwargs)
+        response.raise_for_status()
+        return response
+
+    async def fetch_page(self, vendor: str, url: str) -> Page:
+        """Fetch an HTML page, revalidating a cached copy instead of downloading it again."""
+
+        url = self.resolve(vendor, url)
+        # Cache files are small, but thousands of them would still stall the loop.
+        cached = await asyncio.to_thread(self.cache.get, url) if self.cache is not None else None
+        headers = cached.validators() if cached is not None else {}
+        response = await self._get(vendor, url, headers=headers)
+        if cached is not None and response.status_code == 304:
+            self.page_stats["not_modified"] += 1
+            return Page(url=url, text=cached.text, not_modified=True)
+        response.raise_for_status()
+        self.page_stats["fetched"] += 1
+        if self.cache is not None:
+            await asyncio.to_thread(
+                self.cache.store, url, response.content, response.headers, response.encoding
+            )
+        return Page(url=url, text=response.text)
+
+    async def _get(self, vendor: str, url: str, **kwargs: Any) -> httpx.Response:
+        gate = self._gate(vendor)
+        async with gate.semaphore:
+            await gate.rate.acquire()
+            return await self.client.get(url, **kwargs)
+
+
+_runtime_instance: Optional[CrawlerRuntime] = None
+
+
+def get_crawler_runtime() -> CrawlerRuntime:
+    global _runtime_instance
+    if _runtime_instance is None:
+        _runtime_instance = CrawlerRuntime(
+            {
+                "newegg": VendorLimits(max_concurrency=4, requests_per_second=2.0),
+                "canadacomputers": VendorLimits(max_concurrency=2, requests_per_second=1.0),
+            },
+            cache=HttpCache(),
+        )
+    return _runtime_instance
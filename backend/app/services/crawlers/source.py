@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import json
+import threading
+from pathlib import Path
+from typing import IO, Any, Dict, Iterator, List, Optional, Tuple
+
+_CHUNK_SIZE = 1 << 16
+_WHITESPACE = " \t\r\n"
+
+
+def iter_json_array(handle: IO[str], chunk_size: int = _CHUNK_SIZE) -> Iterator[Dict[str, Any]]:
+    """Yield the objects of a top-level JSON array while reading it in chunks.
+
+    Only one chunk plus the object being decoded is held in memory. Elements must be
+    objects: a truncated object never decodes, so a failed decode simply means the
+    buffer needs more input.
+    """
+
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    started = False
+    exhausted = False
+    while True:
+        while position < len(buffer) and buffer[position] in _WHITESPACE + ",":
+            if buffer[position] == "," and not started:
+                raise ValueError("Malformed JSON array: unexpected ','")
+            position += 1
+        if position < len(buffer):
+            if not started:
+                if buffer[position] != "[":
+                    raise ValueError("Expected a JSON array")
+                started = True
+                position += 1
+                continue
+            if buffer[position] == "]":
+                return
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if exhausted:
+                    raise
+            else:
+                if not isinstance(item, dict):
+                    raise ValueError("Expected JSON objects in the array")
+                position = end
+                yield item
+                continue
+        if exhausted:
+            raise ValueError("Unexpected end of JSON array")
+        chunk = handle.read(chunk_size)
+        exhausted = not chunk
+        buffer = buffer[position:] + chunk
+        position = 0
+
+
+def iter_json_lines(handle: IO[str]) -> Iterator[Dict[str, Any]]:
+    for line in handle:
+        if line.strip():
+            yield json.loads(line)
+
+
+def iter_records(path: Path) -> Iterator[Dict[str, Any]]:
+    """Stream product records from a JSON array file or a ``.jsonl``/``.ndjson`` feed."""
+
+    with path.open("r", encoding="utf-8") as handle:
+        if path.suffix in (".jsonl", ".ndjson"):
+            yield from iter_json_lines(handle)
+        else:
+            yield from iter_json_array(handle)
+
+
+class SourceCache:
+    """Parse each source file once per version and share it, partitioned by vendor.
+
+    Entries are keyed by path and validated against the file's ``(mtime_ns, size)``, so
+    every crawler in a refresh (and the store's seeding) reuses one parse until the
+    file changes. The cached records are shared and must be treated as read-only.
+    """
+
+    def __init__(self) -> None:
+        self._entries: Dict[Path, Tuple[Tuple[int, int], Dict[str, List[Dict[str, Any]]]]] = {}
+        self._lock = threading.Lock()
+        self.parses = 0
+
+    def partitions(self, path: Path) -> Dict[str, List[Dict[str, Any]]]:
+        """Records of ``path`` grouped by their ``vendor`` field (empty if missing)."""
+
+        path = Path(path)
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return {}
+        version = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == version:
+                return entry[1]
+            partitions: Dict[str, List[Dict[str, Any]]] = {}
+            for record in iter_records(path):
+                partitions.setdefault(str(record.get("vendor", "")), []).append(record)
+            self.parses += 1
+            self._entries[path] = (version, partitions)
+            return partitions
+
+    def vendor_records(self, path: Path, vendor: str) -> List[Dict[str, Any]]:
+        return self.partitions(path).get(vendor, [])
+
+    def records(self, path: Path) -> List[Dict[str, Any]]:
+        return [record for records in self.partitions(path).values() for record in records]
+
+    def clear(self, path: Optional[Path] = None) -> None:
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(Path(path), None)
+
+
+_source_cache = SourceCache()
+
+
+def get_source_cache() -> SourceCache:
+    return _source_cache
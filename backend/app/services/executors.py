@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import asyncio
+import functools
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+# Searches are numpy-bound and release the GIL inside the matrix products, so a few
+# threads scale with cores; the cap keeps a burst of requests from oversubscribing them.
+SEARCH_WORKERS = min(8, os.cpu_count() or 1)
+
+_search_pool = ThreadPoolExecutor(max_workers=SEARCH_WORKERS, thread_name_prefix="vector-search")
+# A single ingest thread also serializes refreshes within the process.
+_ingest_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="vector-ingest")
+
+# HTML parsing holds the GIL for the whole document, so it gets processes instead. They
+# are started on first use: API workers that never crawl should not pay for them.
+PARSE_WORKERS = min(4, os.cpu_count() or 1)
+
+_parse_pool: Optional[ProcessPoolExecutor] = None
+_parse_pool_lock = threading.Lock()
+
+
+async def _run(pool: Executor, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(pool, functools.partial(func, *args, **kwargs))
+
+
+async def run_search(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run a read-only store call on the bounded search pool, off the event loop."""
+
+    return await _run(_search_pool, func, *args, **kwargs)
+
+
+async def run_ingest(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run embedding and persistence work on the dedicated ingest thread."""
+
+    return await _run(_ingest_pool, func, *args, **kwargs)
+
+
+def submit_ingest(func: Callable[..., T], *args: Any, **kwargs: Any) -> "Future[T]":
+    """Queue ``func`` on the ingest thread from synchronous code, without waiting for it."""
+
+    return _ingest_pool.submit(func, *args, **kwargs)
+
+
+def _get_parse_pool() -> ProcessPoolExecutor:
+    global _parse_pool
+    with _parse_pool_lock:
+        if _parse_pool is None:
+            # Spawned rather than forked: forking a process that already runs threads
+            # can leave a child holding a lock no thread will ever release.
+            _parse_pool = ProcessPoolExecutor(
+                max_workers=PARSE_WORKERS, mp_context=multiprocessing.get_context("spawn")
+            )
+        return _parse_pool
+
+
+async def run_parse(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run a CPU-bound parser in the process pool.
+
+    ``func`` and its arguments are pickled, so ``func`` must be importable at module
+    level and the arguments plain data such as page text.
+    """
+
+    return await _run(_get_parse_pool(), func, *args, **kwargs)
+
+
+def shutdown_parse_pool() -> None:
+    global _parse_pool
+    with _parse_pool_lock:
+        pool, _parse_pool = _parse_pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import math
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+
+def _category_key(metadata: Dict[str, Any]) -> str:
+    return str(metadata.get("category", "")).lower()
+
+
+def _scene_tags(metadata: Dict[str, Any]) -> Set[str]:
+    specs = metadata.get("specs", {})
+    if not isinstance(specs, dict):
+        return set()
+    return set(str(tag).lower() for tag in specs.get("scene_tags", []) or [])
+
+
+class FilterIndex:
+    """Secondary indexes over store rows for category, price range and scene tags.
+
+    ``candidates`` acts as a tiny query planner: when the most selective predicate
+    keeps at most ``prefilter_ratio`` of the catalog, it materializes the exact set
+    of matching rows so the caller only scores those. Otherwise it returns ``None``
+    and the caller scores everything and filters the ranked rows afterwards.
+    """
+
+    prefilter_ratio = 0.3
+
+    def __init__(self) -> None:
+        self._categories: Dict[str, Set[int]] = defaultdict(set)
+        self._tags: Dict[str, Set[int]] = defaultdict(set)
+        # Row -> price; NaN for rows that are not live, which sort after every price.
+        self._prices: List[float] = []
+        # Live prices in ascending order and the row of each, rebuilt on demand.
+        self._price_index: Optional[Tuple[np.ndarray, np.ndarray]] = None
+
+    def clear(self) -> None:
+        self._categories.clear()
+        self._tags.clear()
+        self._prices = []
+        self._price_index = None
+
+    def add(self, row: int, metadata: Dict[str, Any]) -> None:
+        self._categories[_category_key(metadata)].add(row)
+        for tag in _scene_tags(metadata):
+            self._tags[tag].add(row)
+        if row >= len(self._prices):
+            self._prices.extend([math.nan] * (row + 1 - len(self._prices)))
+        self._prices[row] = float(metadata.get("price", 0))
+        self._price_index = None
+
+    def remove(self, row: int, metadata: Dict[str, Any]) -> None:
+        self._discard(self._categories, _category_key(metadata), row)
+        for tag in _scene_tags(metadata):
+            self._discard(self._tags, tag, row)
+        if row < len(self._prices):
+            self._prices[row] = math.nan
+            self._price_index = None
+
+    @staticmethod
+    def _discard(index: Dict[str, Set[int]], key: str, row: int) -> None:
+        rows = index.get(key)
+        if rows is None:
+            return
+        rows.discard(row)
+        if not rows:
+            del index[key]
+
+    def _price_view(self) -> Tuple[np.ndarray, np.ndarray]:
+        view = self._price_index
+        if view is None:
+            prices = np.asarray(self._prices, dtype=np.float64)
+            order = np.argsort(prices, kind="stable")
+            # NaN sorts last, so the removed rows are the tail.
+            order = order[: int(np.count_nonzero(~np.isnan(prices)))]
+            view = (prices[order], order)
+            # Searches run concurrently on the search pool; publishing both arrays in one
+            # assignment means none of them can pair new prices with stale rows.
+            self._price_index = view
+        return view
+
+    @staticmethod
+    def _price_bounds(
+        sorted_prices: np.ndarray, min_price: Optional[float], max_price: Optional[float]
+    ) -> Tuple[int, int]:
+        start = 0 if min_price is None else int(np.searchsorted(sorted_prices, min_price, side="left"))
+        stop = (
+            len(sorted_prices)
+            if max_price is None
+            else int(np.searchsorted(sorted_prices, max_price, side="right"))
+        )
+        return start, max(start, stop)
+
+    def candidates(
+        self,
+        total: int,
+        *,
+        category: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        tags: Iterable[str] = (),
+        plan: bool = True,
+    ) -> Optional[np.ndarray]:
+        """Return the sorted rows matching every filter, or ``None`` to post-filter.
+
+        With ``plan=False`` the rows are materialized regardless of selectivity, and
+        ``None`` only means that no filter was requested.
+        """
+
+        requested_tags = set(tags)
+        has_price = min_price is not None or max_price is not None
+        if not category and not requested_tags and not has_price:
+            return None
+
+        sets: List[Set[int]] = []
+        if category:
+            sets.append(self._categories.get(category.lower(), set()))
+        for tag in requested_tags:
+            sets.append(self._tags.get(tag, set()))
+
+        estimate = min((len(rows) for rows in sets), default=total)
+        if has_price:
+            sorted_prices, price_rows = self._price_view()
+            start, stop = self._price_bounds(sorted_prices, min_price, max_price)
+            estimate = min(estimate, stop - start)
+        if plan and total and estimate > total * self.prefilter_ratio:
+            return None
+
+        sets.sort(key=len)
+        if sets:
+            selected = set(sets[0])
+            for rows in sets[1:]:
+                selected &= rows
+                if not selected:
+                    break
+        else:
+            selected = None
+
+        if has_price:
+            if selected is None:
+                return np.sort(price_rows[start:stop])
+            low = -np.inf if min_price is None else min_price
+            high = np.inf if max_price is None else max_price
+            selected = {row for row in selected if low <= self._prices[row] <= high}
+
+        return np.fromiter(sorted(selected or ()), dtype=np.intp)
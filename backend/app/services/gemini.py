@@ -1,13 +1,14 @@
 from __future__ import annotations
 
 import asyncio
-import json
 import logging
-import re
-from typing import Any, Dict, Optional
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Any, AsyncIterator, Dict, Iterator, Optional, Tuple, Union
 from uuid import uuid4
 
-from pydantic import ValidationError
+from pydantic import BaseModel, ValidationError
 
 try:  # pragma: no cover - optional dependency during local development
     import google.generativeai as genai
@@ -18,6 +19,7 @@ except ModuleNotFoundError:  # pragma: no cover - fallback when SDK is absent
     class GoogleAPIError(Exception):  # type: ignore[override]
         pass
 
+from app.core.config import get_settings
 from app.schemas.chat import (
     AlternativeBuild,
     BuildComponent,
@@ -25,20 +27,88 @@ from app.schemas.chat import (
     ChatPlanResponse,
 )
 
+from .executors import run_search
+from .json_stream import IncrementalJSONParser, Path
+from .plan_cache import PlanCache, get_plan_cache
+from .prompt_builder import PromptBuilder, get_prompt_builder
+from .resilience import HALF_OPEN, CircuitBreaker, LatencyWindow
+
 LOGGER = logging.getLogger(__name__)
 
+PlanEvent = Tuple[str, Union[BaseModel, Dict[str, Any]]]
+
+# Marks the end of a streamed response.
+_END = object()
+
 
 class GeminiPlannerError(Exception):
     """Raised when Gemini plan generation fails."""
 
 
-class GeminiPlanner:
-    """Generate build plans by orchestrating a Gemini model."""
+class GeminiUnavailableError(GeminiPlannerError):
+    """Raised when Gemini fails, times out or its circuit is open; callers fall back."""
+
+
+@dataclass
+class PlannerStats:
+    calls: int = 0
+    hedges: int = 0
+    retries: int = 0
+    timeouts: int = 0
+    failures: int = 0
+
+
+def plan_events(plan: ChatPlanResponse) -> Iterator[PlanEvent]:
+    """The events ``GeminiPlanner.stream_plan`` would emit for an already complete plan."""
 
-    def __init__(self, api_key: Optional[str], model: str = "gemini-1.5-pro-latest") -> None:
+    for component in plan.components:
+        yield "component", component
+    yield "summary", {"summary": plan.summary}
+    for alternative in plan.alternatives:
+        yield "alternative", alternative
+    yield "plan", plan
+
+
+class GeminiPlanner:
+    """Generate build plans by orchestrating a Gemini model.
+
+    One planner serves the whole process. Model calls run on its own thread pool, and a
+    semaphore admits at most ``max_concurrency`` at once, so a burst queues on the event
+    loop instead of tying up threads. Requests that build an identical prompt while a
+    call for it is in flight share that call's result.
+
+    Each request gets ``timeout`` seconds. A failed call is retried once, and a slow
+    one is hedged with a second call after ``hedge_after`` seconds (or the observed
+    p95, if longer); the first response wins. Requests that still fail or run out of
+    time count against ``breaker``, and while it is open requests fail at once with
+    ``GeminiUnavailableError`` so callers can fall back without waiting.
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str],
+        model: str = "gemini-1.5-pro-latest",
+        cache: Optional[PlanCache] = None,
+        max_concurrency: int = 4,
+        timeout: float = 25.0,
+        hedge_after: float = 8.0,
+        breaker: Optional[CircuitBreaker] = None,
+        prompts: Optional[PromptBuilder] = None,
+    ) -> None:
         self._api_key = api_key
         self._model_name = model
         self._model: Optional[Any] = None
+        self._cache = cache
+        self.max_concurrency = max(1, max_concurrency)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._inflight: Dict[str, "asyncio.Future[ChatPlanResponse]"] = {}
+        self.timeout = timeout
+        self.hedge_after = hedge_after
+        self.breaker = breaker if breaker is not None else CircuitBreaker()
+        self.latency = LatencyWindow()
+        self.stats = PlannerStats()
+        self._prompts = prompts if prompts is not None else PromptBuilder()
 
         if api_key and genai is not None:
             genai.configure(api_key=api_key)
@@ -54,61 +124,271 @@ class GeminiPlanner:
         if not self.available:
             raise GeminiPlannerError("Gemini API key is not configured.")
 
-        prompt = self._build_prompt(request)
+        if self._cache is not None:
+            # The lookup may read the price history and catalog, so keep it off the loop.
+            cached = await run_search(self._cache.get, request)
+            if cached is not None:
+                return cached
+
+        # Building the prompt searches the catalog for candidates.
+        prompt = await run_search(self._prompts.build, request)
+        call = self._inflight.get(prompt)
+        if call is None or call.get_loop() is not asyncio.get_running_loop():
+            call = asyncio.ensure_future(self._generate(request, prompt))
+            self._inflight[prompt] = call
+            call.add_done_callback(lambda done: self._settle(prompt, done))
+        # A caller that gives up must not cancel the call for the others sharing it.
+        return await asyncio.shield(call)
+
+    async def stream_plan(self, request: ChatPlanRequest) -> AsyncIterator[PlanEvent]:
+        """Generate a plan with the model's streaming API, yielding parts as they complete.
+
+        Yields ``("component", BuildComponent)`` as soon as each component's JSON object
+        has arrived, ``("summary", {"summary": ...})``, ``("alternative",
+        AlternativeBuild)``, and finally ``("plan", ChatPlanResponse)`` once the whole
+        response has been validated. A cached plan is replayed in the same shape.
+        """
+
+        if not self.available:
+            raise GeminiPlannerError("Gemini API key is not configured.")
+
+        if self._cache is not None:
+            cached = await run_search(self._cache.get, request)
+            if cached is not None:
+                for event in plan_events(cached):
+                    yield event
+                return
+
+        parser = IncrementalJSONParser()
+        prompt = await run_search(self._prompts.build, request)
+        stream = self._stream_text(prompt)
         try:
-            response = await asyncio.to_thread(self._model.generate_content, prompt)  # type: ignore[arg-type]
-        except GoogleAPIError as exc:  # pragma: no cover - network errors handled at runtime
-            LOGGER.error("Gemini API error: %s", exc)
-            raise GeminiPlannerError("Gemini API call failed.") from exc
+            async for text in stream:
+                try:
+                    completed = parser.feed(text)
+                except ValueError as exc:
+                    raise GeminiPlannerError("Gemini returned malformed JSON.") from exc
+                for path, value in completed:
+                    event = self._stream_event(path, value)
+                    if event is not None:
+                        yield event
+                if parser.done:
+                    break
+        finally:
+            await stream.aclose()
+        if parser.root is None:
+            raise GeminiPlannerError("Gemini stream ended before the plan was complete.")
+
+        plan = self._parse_plan(parser.root, request.currency)
+        if self._cache is not None:
+            await run_search(self._cache.put, request, plan)
+        yield "plan", plan
+
+    async def aclose(self) -> None:
+        pending = list(self._inflight.values())
+        for call in pending:
+            call.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        self._semaphore = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        payload: Dict[str, Any] = {
+            "available": self.available,
+            "max_concurrency": self.max_concurrency,
+            "in_flight": len(self._inflight),
+            "timeout_seconds": self.timeout,
+            "hedge_after_seconds": self._hedge_delay(),
+            **asdict(self.stats),
+            "breaker": self.breaker.snapshot(),
+            "latency": self.latency.snapshot(),
+        }
+        if self._cache is not None:
+            payload["cache"] = self._cache.snapshot()
+        return payload
 
+    async def _generate(self, request: ChatPlanRequest, prompt: str) -> ChatPlanResponse:
+        response = await self._call_model(prompt)
         text = self._extract_text(response)
         plan_dict = self._extract_json(text)
-        return self._parse_plan(plan_dict, request.currency)
-
-    def _build_prompt(self, request: ChatPlanRequest) -> str:
-        conversation = []
-        for message in request.messages:
-            speaker = "User" if message.role == "user" else "Assistant"
-            conversation.append(f"{speaker}: {message.content.strip()}")
-        conversation_text = "\n".join(conversation)
-
-        instructions = (
-            "You are Builda, a senior PC build consultant."
-            " Produce a balanced configuration that matches the intent, budget, and scenario"
-            " described by the user. Use only publicly available component data."
-            " Respond strictly in JSON without code fences."
-        )
-
-        schema = {
-            "plan_id": "string",
-            "currency": request.currency,
-            "total_price": "number",
-            "summary": "string",
-            "notes": "string",
-            "components": [
-                {
-                    "category": "string",
-                    "name": "string",
-                    "price": "number",
-                    "vendor": "string",
-                    "url": "string",
-                }
-            ],
-            "alternatives": [
-                {
-                    "title": "string",
-                    "description": "string",
-                    "total_price": "number",
-                    "components": "same schema as components",
-                }
-            ],
-        }
+        plan = self._parse_plan(plan_dict, request.currency)
+        if self._cache is not None:
+            await run_search(self._cache.put, request, plan)
+        return plan
+
+    async def _call_model(self, prompt: str) -> Any:
+        """Get a response within the latency budget, retrying or hedging one extra call."""
+
+        if not self.breaker.allow():
+            raise GeminiUnavailableError("Gemini is unavailable; its circuit is open.")
+        self.stats.calls += 1
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout
+        # A half-open probe is a single call: hedging it would double the load on a
+        # service that is only just recovering.
+        spare = 0 if self.breaker.state == HALF_OPEN else 1
+        attempts = {asyncio.ensure_future(self._attempt(prompt))}
+        error: Optional[BaseException] = None
+        try:
+            while attempts and loop.time() < deadline:
+                wait = deadline - loop.time()
+                if spare:
+                    wait = min(wait, self._hedge_delay())
+                done, attempts = await asyncio.wait(
+                    attempts, timeout=wait, return_when=asyncio.FIRST_COMPLETED
+                )
+                for attempt in done:
+                    if attempt.exception() is None:
+                        self.breaker.record_success()
+                        return attempt.result()
+                    error = attempt.exception()
+                # Retry a failure at once; hedge a slow call only if that needs no queueing.
+                if spare and (done or not self._limit().locked()):
+                    if done:
+                        self.stats.retries += 1
+                    else:
+                        self.stats.hedges += 1
+                    attempts.add(asyncio.ensure_future(self._attempt(prompt)))
+                    spare = 0
+        except asyncio.CancelledError:
+            self.breaker.release()
+            raise
+        finally:
+            # The model call itself cannot be interrupted; its thread finishes unobserved.
+            for attempt in attempts:
+                attempt.cancel()
+
+        self.breaker.record_failure()
+        if attempts:
+            self.stats.timeouts += 1
+            raise GeminiUnavailableError(f"Gemini did not respond within {self.timeout:g}s.")
+        self.stats.failures += 1
+        raise GeminiUnavailableError("Gemini API call failed.") from error
+
+    async def _attempt(self, prompt: str) -> Any:
+        async with self._limit():
+            loop = asyncio.get_running_loop()
+            started = loop.time()
+            try:
+                response = await loop.run_in_executor(
+                    self._pool(), self._model.generate_content, prompt  # type: ignore[union-attr]
+                )
+            except GoogleAPIError as exc:  # pragma: no cover - network errors handled at runtime
+                LOGGER.error("Gemini API error: %s", exc)
+                raise
+            except Exception as exc:
+                LOGGER.error("Gemini call failed: %s", exc)
+                raise
+        self.latency.record(loop.time() - started)
+        return response
+
+    def _hedge_delay(self) -> float:
+        # With enough history, hedge only calls slower than 19 in 20 recent ones.
+        p95 = self.latency.percentile(95) if len(self.latency) >= 20 else None
+        return max(self.hedge_after, p95 or 0.0)
+
+    async def _stream_text(self, prompt: str) -> AsyncIterator[str]:
+        """Relay the text of a streamed model response from a pool thread to the loop.
+
+        The first chunk counts as a success for the circuit breaker; an error or running
+        out of time before the stream ends counts as a failure.
+        """
+
+        if not self.breaker.allow():
+            raise GeminiUnavailableError("Gemini is unavailable; its circuit is open.")
+        self.stats.calls += 1
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout
+        queue: "asyncio.Queue[Any]" = asyncio.Queue()
+        stop = threading.Event()
+        reported = False
+
+        def relay(item: Any) -> None:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, item)
+            except RuntimeError:  # pragma: no cover - the loop closed under us
+                stop.set()
+
+        def pump() -> None:
+            try:
+                stream = self._model.generate_content(prompt, stream=True)  # type: ignore[union-attr]
+                for chunk in stream:
+                    if stop.is_set():
+                        break
+                    relay(self._extract_text(chunk))
+            except Exception as exc:  # handed to the consumer
+                relay(exc)
+            finally:
+                relay(_END)
 
-        return (
-            f"{instructions}\n\n"
-            f"Conversation history:\n{conversation_text}\n\n"
-            f"Output JSON schema (fill with actual data, omit unused optional fields):\n{json.dumps(schema)}"
-        )
+        try:
+            async with self._limit():
+                loop.run_in_executor(self._pool(), pump)
+                while True:
+                    try:
+                        item = await asyncio.wait_for(queue.get(), deadline - loop.time())
+                    except asyncio.TimeoutError:
+                        self.stats.timeouts += 1
+                        reported = True
+                        self.breaker.record_failure()
+                        raise GeminiUnavailableError(
+                            f"Gemini did not respond within {self.timeout:g}s."
+                        ) from None
+                    if item is _END:
+                        break
+                    if isinstance(item, GeminiPlannerError):
+                        raise item
+                    if isinstance(item, Exception):
+                        LOGGER.error("Gemini stream failed: %s", item)
+                        self.stats.failures += 1
+                        reported = True
+                        self.breaker.record_failure()
+                        raise GeminiUnavailableError("Gemini API call failed.") from item
+                    if not reported:
+                        reported = True
+                        self.breaker.record_success()
+                    yield item
+        finally:
+            # Stops the pump at its next chunk when the consumer goes away early.
+            stop.set()
+            if not reported:
+                self.breaker.release()
+
+    def _stream_event(self, path: Path, value: Any) -> Optional[PlanEvent]:
+        try:
+            if len(path) == 2 and path[0] == "components" and isinstance(value, dict):
+                return "component", self._parse_component(value)
+            if len(path) == 2 and path[0] == "alternatives" and isinstance(value, dict):
+                return "alternative", self._parse_alternative(value)
+        except (TypeError, ValueError, ValidationError):
+            # Left for validation of the complete plan to report.
+            LOGGER.warning("Skipping malformed %s entry in Gemini stream", path[0])
+            return None
+        if path == ("summary",) and isinstance(value, str):
+            return "summary", {"summary": value}
+        return None
+
+    def _settle(self, prompt: str, call: "asyncio.Future[ChatPlanResponse]") -> None:
+        if self._inflight.get(prompt) is call:
+            del self._inflight[prompt]
+        if not call.cancelled():
+            # Mark the error retrieved even if every caller has already gone away.
+            call.exception()
+
+    def _limit(self) -> asyncio.Semaphore:
+        # Created on first use so it belongs to the serving loop.
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    def _pool(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_concurrency, thread_name_prefix="gemini"
+            )
+        return self._executor
 
     def _extract_text(self, response: Any) -> str:
         if hasattr(response, "text"):
@@ -126,18 +406,16 @@ class GeminiPlanner:
         if not candidate:
             raise GeminiPlannerError("Gemini returned an empty response.")
 
-        if candidate.startswith("```"):
-            candidate = candidate.strip("`").strip()
-
-        match = re.search(r"\{.*\}", candidate, re.DOTALL)
-        if not match:
-            raise GeminiPlannerError("Could not locate JSON payload in Gemini response.")
-
+        # The first complete top-level object wins; fences and prose around it are skipped.
+        parser = IncrementalJSONParser(max_depth=0)
         try:
-            return json.loads(match.group(0))
-        except json.JSONDecodeError as exc:
+            parser.feed(candidate)
+        except ValueError as exc:
             LOGGER.error("Failed to decode Gemini JSON: %s", candidate)
             raise GeminiPlannerError("Gemini returned malformed JSON.") from exc
+        if parser.root is None:
+            raise GeminiPlannerError("Could not locate JSON payload in Gemini response.")
+        return parser.root
 
     def _parse_plan(self, payload: Dict[str, Any], currency: str) -> ChatPlanResponse:
         try:
@@ -183,5 +461,27 @@ class GeminiPlanner:
         )
 
 
-def get_gemini_planner(api_key: Optional[str]) -> GeminiPlanner:
-    return GeminiPlanner(api_key=api_key)
+_planner_instance: Optional[GeminiPlanner] = None
+_planner_lock = threading.Lock()
+
+
+def get_gemini_planner() -> GeminiPlanner:
+    """Return the process-wide planner, configuring the Gemini client on first use."""
+
+    global _planner_instance
+    with _planner_lock:
+        if _planner_instance is None:
+            settings = get_settings()
+            _planner_instance = GeminiPlanner(
+                api_key=settings.gemini_api_key,
+                cache=get_plan_cache(),
+                max_concurrency=settings.gemini_max_concurrency,
+                timeout=settings.gemini_timeout_seconds,
+                hedge_after=settings.gemini_hedge_after_seconds,
+                breaker=CircuitBreaker(
+                    failure_threshold=settings.gemini_breaker_failures,
+                    reset_timeout=settings.gemini_breaker_reset_seconds,
+                ),
+                prompts=get_prompt_builder(),
+            )
+        return _planner_instance
@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass
+from typing import Any, List, Optional, Tuple, Union
+
+Path = Tuple[Union[str, int], ...]
+
+_SCALAR_END = ",]} \t\r\n"
+
+
+@dataclass
+class _Frame:
+    kind: str  # "{" or "["
+    start: int
+    key: Optional[str] = None
+    index: int = -1
+    expecting_key: bool = True
+
+
+class IncrementalJSONParser:
+    """Scan a JSON object as it arrives and report values as soon as they are complete.
+
+    ``feed`` returns ``(path, value)`` for every value completed by the new text whose
+    path has at most ``max_depth`` elements, e.g. ``("components", 0)`` for the first
+    element of the root's ``components`` array, and finally ``((), root)`` for the whole
+    object. Deeper values are only scanned, never decoded. Text before the root's first
+    ``{`` (prose, a code fence) and anything after it closes are ignored.
+
+    The scanner assumes well-formed JSON; whatever it reports is decoded with
+    ``json.loads``, so malformed input surfaces as ``ValueError``.
+    """
+
+    def __init__(self, max_depth: int = 2) -> None:
+        self.max_depth = max_depth
+        self.root: Optional[Any] = None
+        self._buffer = ""
+        self._position = 0
+        self._stack: List[_Frame] = []
+        self._in_string = False
+        self._escaped = False
+        self._string_start = 0
+        self._string_is_key = False
+        self._scalar_start: Optional[int] = None
+
+    @property
+    def done(self) -> bool:
+        return self.root is not None
+
+    def feed(self, text: str) -> List[Tuple[Path, Any]]:
+        completed: List[Tuple[Path, Any]] = []
+        if self.done:
+            return completed
+        self._buffer += text
+        buffer = self._buffer
+        index = self._position
+        while index < len(buffer) and not self.done:
+            char = buffer[index]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._string_is_key:
+                        self._stack[-1].key = json.loads(buffer[self._string_start : index + 1])
+                    else:
+                        self._complete(self._string_start, index + 1, completed)
+                index += 1
+                continue
+            if self._scalar_start is not None:
+                if char not in _SCALAR_END:
+                    index += 1
+                    continue
+                self._complete(self._scalar_start, index, completed)
+                self._scalar_start = None
+            if char.isspace():
+                index += 1
+                continue
+            if not self._stack:
+                if char == "{":
+                    self._stack.append(_Frame("{", index))
+                index += 1
+                continue
+            top = self._stack[-1]
+            if char == '"':
+                self._in_string = True
+                self._string_start = index
+                self._string_is_key = top.kind == "{" and top.expecting_key
+                if not self._string_is_key:
+                    self._begin_value(top)
+            elif char == ":":
+                top.expecting_key = False
+            elif char == ",":
+                top.expecting_key = top.kind == "{"
+            elif char in "{[":
+                self._begin_value(top)
+                self._stack.append(_Frame(char, index))
+            elif char in "}]":
+                frame = self._stack.pop()
+                self._complete(frame.start, index + 1, completed)
+            else:
+                self._begin_value(top)
+                self._scalar_start = index
+            index += 1
+        self._position = index
+        return completed
+
+    @staticmethod
+    def _begin_value(parent: _Frame) -> None:
+        if parent.kind == "[":
+            parent.index += 1
+
+    def _complete(self, start: int, end: int, completed: List[Tuple[Path, Any]]) -> None:
+        if not self._stack:
+            self.root = json.loads(self._buffer[start:end])
+            completed.append(((), self.root))
+            return
+        if len(self._stack) > self.max_depth:
+            return
+        path: Path = tuple(
+            frame.index if frame.kind == "[" else frame.key or "" for frame in self._stack
+        )
+        completed.append((path, json.loads(self._buffer[start:end])))
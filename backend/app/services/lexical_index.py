@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import heapq
+import math
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+_TOKEN_PATTERN = re.compile(r"[\w-]+")
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_PATTERN.findall(text.lower())
+
+
+class _Postings:
+    """Row-sorted posting arrays for one term plus the statistics for its score bound."""
+
+    __slots__ = ("rows", "tfs", "max_tf", "min_length")
+
+    def __init__(self, entries: Dict[int, int], lengths: np.ndarray) -> None:
+        self.rows = np.fromiter(sorted(entries), dtype=np.intp, count=len(entries))
+        self.tfs = np.fromiter((entries[row] for row in self.rows.tolist()), dtype=np.float32)
+        self.max_tf = float(self.tfs.max()) if len(self.tfs) else 0.0
+        self.min_length = float(lengths[self.rows].min()) if len(self.rows) else 0.0
+
+
+class BM25Index:
+    """Inverted index with BM25 scoring and MaxScore-style early termination.
+
+    Posting lists live in dictionaries so rows can be updated in place; a sorted array
+    view per term is rebuilt lazily after it changes. ``search`` visits the query terms
+    from the highest to the lowest score bound and stops once no unseen document can
+    beat the current k-th best score, so common terms are skipped whenever the rarer
+    terms already fill the result set.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75) -> None:
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._arrays: Dict[str, _Postings] = {}
+        self._documents: Dict[int, Counter] = {}
+        self._lengths = np.zeros(64, dtype=np.float32)
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def clear(self) -> None:
+        self._postings = {}
+        self._arrays = {}
+        self._documents = {}
+        self._lengths = np.zeros(64, dtype=np.float32)
+        self._total_length = 0
+
+    def add(self, row: int, text: str) -> None:
+        """Index ``text`` under ``row``, replacing whatever the row held before."""
+
+        self._insert(row, Counter(tokenize(text)))
+
+    def _insert(self, row: int, counts: Counter) -> None:
+        self.remove(row)
+        if row >= len(self._lengths):
+            grown = np.zeros(max(row + 1, len(self._lengths) * 2), dtype=np.float32)
+            grown[: len(self._lengths)] = self._lengths
+            self._lengths = grown
+        length = sum(counts.values())
+        self._lengths[row] = length
+        self._total_length += length
+        self._documents[row] = counts
+        for term, tf in counts.items():
+            self._postings.setdefault(term, {})[row] = tf
+            self._arrays.pop(term, None)
+
+    def remove(self, row: int) -> None:
+        counts = self._documents.pop(row, None)
+        if counts is None:
+            return
+        self._total_length -= int(self._lengths[row])
+        self._lengths[row] = 0
+        for term in counts:
+            postings = self._postings[term]
+            postings.pop(row, None)
+            if not postings:
+                del self._postings[term]
+            self._arrays.pop(term, None)
+
+    def take(self, rows: Iterable[int]) -> None:
+        """Renumber after compaction: new row ``i`` is old row ``rows[i]``."""
+
+        documents = self._documents
+        self.clear()
+        for new_row, old_row in enumerate(rows):
+            counts = documents.get(int(old_row))
+            if counts is not None:
+                self._insert(new_row, counts)
+
+    def _term(self, term: str) -> _Postings:
+        postings = self._arrays.get(term)
+        if postings is None:
+            postings = _Postings(self._postings[term], self._lengths)
+            self._arrays[term] = postings
+        return postings
+
+    def search(
+        self, query: str, top_k: int, allowed: Optional[np.ndarray] = None
+    ) -> List[Tuple[int, float]]:
+        """Return up to ``top_k`` ``(row, score)`` pairs; ``allowed`` masks eligible rows."""
+
+        terms = [term for term in set(tokenize(query)) if term in self._postings]
+        if not terms or top_k <= 0:
+            return []
+
+        documents = len(self._documents)
+        average_length = self._total_length / documents if documents else 1.0
+        stats: List[Tuple[float, float, _Postings]] = []
+        for term in terms:
+            postings = self._term(term)
+            df = len(postings.rows)
+            idf = math.log(1.0 + (documents - df + 0.5) / (df + 0.5))
+            # tf saturation grows with tf and shrinks with length, so this bounds every posting.
+            bound = idf * self._saturation(postings.max_tf, postings.min_length, average_length)
+            stats.append((bound, idf, postings))
+        stats.sort(key=lambda item: item[0], reverse=True)
+
+        visited = np.zeros(len(self._lengths), dtype=bool)
+        heap: List[Tuple[float, int]] = []
+        remaining = sum(bound for bound, _, _ in stats)
+        for bound, _, postings in stats:
+            if len(heap) >= top_k and remaining <= heap[0][0]:
+                break
+            remaining -= bound
+            rows = postings.rows[~visited[postings.rows]]
+            visited[postings.rows] = True
+            if allowed is not None:
+                rows = rows[allowed[rows]]
+            if not len(rows):
+                continue
+            scores = self._score(rows, stats, average_length)
+            if len(rows) > top_k:
+                keep = np.argpartition(-scores, top_k - 1)[:top_k]
+                rows, scores = rows[keep], scores[keep]
+            for row, score in zip(rows.tolist(), scores.tolist()):
+                if len(heap) < top_k:
+                    heapq.heappush(heap, (score, -row))
+                elif (score, -row) > heap[0]:
+                    heapq.heapreplace(heap, (score, -row))
+
+        return [(-negated, score) for score, negated in sorted(heap, reverse=True)]
+
+    def _saturation(self, tf, length, average_length: float):
+        norm = self.k1 * (1.0 - self.b + self.b * length / average_length)
+        return tf * (self.k1 + 1.0) / (tf + norm)
+
+    def _score(
+        self, rows: np.ndarray, stats: List[Tuple[float, float, _Postings]], average_length: float
+    ) -> np.ndarray:
+        scores = np.zeros(len(rows), dtype=np.float64)
+        lengths = self._lengths[rows]
+        for _, idf, postings in stats:
+            positions = np.searchsorted(postings.rows, rows)
+            positions = np.minimum(positions, len(postings.rows) - 1)
+            present = postings.rows[positions] == rows
+            if not present.any():
+                continue
+            tf = postings.tfs[positions[present]]
+            scores[present] += idf * self._saturation(tf, lengths[present], average_length)
+        return scores
@@ -1,27 +1,286 @@
 from __future__ import annotations
 
-from typing import List
+import asyncio
+import logging
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
 
-from .crawlers import CanadaComputersCrawler, NeweggCrawler
-from .crawlers.base import CrawlerResult
-from .vector_store import SimpleVectorStore, get_vector_store
+import numpy as np
+
+from app.core.config import get_settings
+
+from .crawlers import (
+    CanadaComputersCrawler,
+    CanadaComputersHtmlCrawler,
+    Crawler,
+    CrawlerRuntime,
+    NeweggCrawler,
+    NeweggHtmlCrawler,
+    get_crawler_runtime,
+)
+from .executors import run_ingest
+from .price_history import PriceHistoryStore, get_price_history_store
+from .vector_store import CatalogDelta, SimpleVectorStore, get_vector_store, publish_vector_store
+
+LOGGER = logging.getLogger(__name__)
+
+# Marks the end of a stage's input.
+_DONE = None
+
+
+@dataclass
+class StageStats:
+    name: str
+    items: int = 0
+    batches: int = 0
+    busy_seconds: float = 0.0
+
+    def as_dict(self) -> Dict[str, float]:
+        return {
+            "items": self.items,
+            "batches": self.batches,
+            "busy_seconds": self.busy_seconds,
+            "items_per_second": self.items / self.busy_seconds if self.busy_seconds else 0.0,
+        }
+
+
+@dataclass
+class RefreshSummary:
+    ingested: int = 0
+    added: int = 0
+    changed: int = 0
+    unchanged: int = 0
+    removed: int = 0
+    rejected: int = 0
+    price_changes: int = 0
+    failed_vendors: List[str] = field(default_factory=list)
+    stages: Dict[str, Dict[str, float]] = field(default_factory=dict)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def normalize(metadata: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Tidy a crawled product for indexing, or return ``None`` when it is unusable."""
+
+    name = " ".join(str(metadata.get("name") or "").split())
+    sku = str(metadata.get("sku") or "").strip()
+    price = metadata.get("price")
+    if not sku or not name or not isinstance(price, (int, float)) or price < 0:
+        return None
+    metadata["sku"] = sku
+    metadata["name"] = name
+    metadata["category"] = " ".join(str(metadata.get("category") or "").split())
+    metadata["currency"] = str(metadata.get("currency") or "USD").upper()
+    return metadata
+
+
+def default_crawlers() -> List[Crawler]:
+    """Crawl vendors with configured listing pages live; the rest load the sample catalog."""
+
+    listings = get_settings().crawl_listings
+    crawlers: List[Crawler] = []
+    for sample, live in (
+        (NeweggCrawler, NeweggHtmlCrawler),
+        (CanadaComputersCrawler, CanadaComputersHtmlCrawler),
+    ):
+        pages = listings.get(sample.vendor)
+        crawlers.append(live(pages) if pages else sample())
+    return crawlers
+
+
+class _Ingest:
+    """Per-refresh write state; only ever touched from the ingest thread.
+
+    The published store is copied on the first batch that changes something, and later
+    batches are planned against that copy so they see the earlier batches' writes.
+    """
+
+    def __init__(self, store: SimpleVectorStore, history: PriceHistoryStore) -> None:
+        self.published = store
+        self.history = history
+        self.target: Optional[SimpleVectorStore] = None
+        self.counts = {"added": 0, "changed": 0, "unchanged": 0, "removed": 0}
+        self.price_changes = 0
+
+    def prepare(self, batch: List[Dict[str, Any]]) -> Tuple[CatalogDelta, Optional[np.ndarray]]:
+        # Every listing is an observation; the history keeps only the price changes.
+        self.price_changes += self.history.record(batch)
+        delta = self._current().plan_catalog(batch)
+        vectors = self.published.embed_metadata(delta.embed) if delta.embed else None
+        return delta, vectors
+
+    def write(self, delta: CatalogDelta, vectors: Optional[np.ndarray]) -> None:
+        for key, value in delta.counts().items():
+            self.counts[key] += value
+        if delta.is_empty():
+            return
+        target = self._target()
+        target.upsert_many(delta.embed, embeddings=vectors)
+        target.update_metadata(delta.update)
+
+    def finish(self, seen: Set[str], vendors: List[str]) -> Optional[SimpleVectorStore]:
+        """Tombstone unlisted products of ``vendors``, then persist and publish the new store.
+
+        Publishing here, on the ingest thread, means a reload that ``get_vector_store``
+        queued behind this refresh finds the new store already published and skips.
+        """
+
+        self.history.flush()
+        removed = self._current().unlisted(seen, vendors)
+        if removed:
+            target = self._target()
+            for identifier in removed:
+                target.delete(identifier)
+            self.counts["removed"] = len(removed)
+        if self.target is None:
+            return None
+        self.target.persist()
+        publish_vector_store(self.target)
+        return self.target
+
+    def _current(self) -> SimpleVectorStore:
+        # Not ``or``: an empty store is falsy, and would be skipped for the published one.
+        return self.target if self.target is not None else self.published
+
+    def _target(self) -> SimpleVectorStore:
+        if self.target is None:
+            self.target = self.published.fork()
+        return self.target
 
 
 class DataPipeline:
-    """Coordinate crawling and ingestion into the vector store."""
-
-    def __init__(self, store: SimpleVectorStore | None = None) -> None:
-        self.store = store or get_vector_store()
-        self.crawlers = [NeweggCrawler(), CanadaComputersCrawler()]
-
-    async def refresh_samples(self) -> List[CrawlerResult]:
-        results: List[CrawlerResult] = []
-        for crawler in self.crawlers:
-            results.extend(await crawler.fetch_latest())
-        for result in results:
-            self.store.upsert(result.to_metadata())
-        self.store.persist()
-        return results
+    """Stream crawler output into the vector store through bounded stages.
+
+    Crawlers yield result batches into a chain of ``asyncio.Queue``s: validate and
+    normalize, plan and embed, then write. Each queue holds at most ``queue_size``
+    batches, so a slow stage pauses the ones before it and memory stays bounded by
+    the queues rather than by the size of the crawl. Writes go to a copy of the store
+    that is persisted and published in one swap at the end.
+    """
+
+    batch_size = 256
+    queue_size = 4
+
+    def __init__(
+        self,
+        store: SimpleVectorStore | None = None,
+        runtime: CrawlerRuntime | None = None,
+        crawlers: Optional[List[Crawler]] = None,
+        history: Optional[PriceHistoryStore] = None,
+    ) -> None:
+        self.store = store if store is not None else get_vector_store()
+        self.runtime = runtime or get_crawler_runtime()
+        self.history = history if history is not None else get_price_history_store()
+        self.crawlers: List[Crawler] = crawlers if crawlers is not None else default_crawlers()
+
+    @property
+    def vendors(self) -> List[str]:
+        return [crawler.vendor for crawler in self.crawlers]
+
+    async def refresh_samples(self, vendors: Optional[Iterable[str]] = None) -> RefreshSummary:
+        """Crawl ``vendors`` (all when ``None``) and ingest what changed."""
+
+        selected = set(vendors) if vendors else None
+        crawlers = [c for c in self.crawlers if selected is None or c.vendor in selected]
+        stats = {name: StageStats(name) for name in ("crawl", "validate", "embed", "write")}
+        crawled: asyncio.Queue = asyncio.Queue(self.queue_size)
+        validated: asyncio.Queue = asyncio.Queue(self.queue_size)
+        embedded: asyncio.Queue = asyncio.Queue(self.queue_size)
+        ingest = _Ingest(self.store, self.history)
+        succeeded: List[str] = []
+        errors: Dict[str, str] = {}
+        seen: Set[str] = set()
+        rejected = 0
+
+        async def crawl(crawler: Crawler) -> None:
+            try:
+                batches = crawler.iter_batches(self.runtime, self.batch_size).__aiter__()
+                while True:
+                    started = time.perf_counter()
+                    try:
+                        batch = await batches.__anext__()
+                    except StopAsyncIteration:
+                        break
+                    finally:
+                        stats["crawl"].busy_seconds += time.perf_counter() - started
+                    stats["crawl"].items += len(batch)
+                    stats["crawl"].batches += 1
+                    await crawled.put(batch)
+            except Exception as exc:
+                LOGGER.error("Crawler for %s failed: %s", crawler.vendor, exc)
+                errors[crawler.vendor] = str(exc)
+            else:
+                succeeded.append(crawler.vendor)
+
+        async def crawl_all() -> None:
+            # Vendors crawl concurrently; the runtime enforces each vendor's own limits.
+            await asyncio.gather(*(crawl(crawler) for crawler in crawlers))
+            await crawled.put(_DONE)
+
+        async def validate() -> None:
+            nonlocal rejected
+            while (batch := await crawled.get()) is not _DONE:
+                started = time.perf_counter()
+                clean: List[Dict[str, Any]] = []
+                for result in batch:
+                    metadata = normalize(result.to_metadata())
+                    if metadata is None:
+                        rejected += 1
+                    elif metadata["sku"] not in seen:
+                        # The first listing of a SKU in a crawl wins.
+                        seen.add(metadata["sku"])
+                        clean.append(metadata)
+                self._record(stats["validate"], started, len(batch))
+                if clean:
+                    await validated.put(clean)
+            await validated.put(_DONE)
+
+        async def embed() -> None:
+            while (batch := await validated.get()) is not _DONE:
+                started = time.perf_counter()
+                prepared = await run_ingest(ingest.prepare, batch)
+                self._record(stats["embed"], started, len(batch))
+                await embedded.put(prepared)
+            await embedded.put(_DONE)
+
+        async def write() -> None:
+            while (prepared := await embedded.get()) is not _DONE:
+                started = time.perf_counter()
+                delta, vectors = prepared
+                await run_ingest(ingest.write, delta, vectors)
+                self._record(stats["write"], started, len(delta.embed) + len(delta.update))
+
+        stages = [
+            asyncio.create_task(stage) for stage in (crawl_all(), validate(), embed(), write())
+        ]
+        try:
+            await asyncio.gather(*stages)
+        except BaseException:
+            # Stop the other stages too, or they would wait on their queues forever.
+            for task in stages:
+                task.cancel()
+            await asyncio.gather(*stages, return_exceptions=True)
+            raise
+        next_store = await run_ingest(ingest.finish, seen, succeeded)
+        if next_store is not None:
+            self.store = next_store
+
+        return RefreshSummary(
+            ingested=stats["crawl"].items,
+            rejected=rejected,
+            price_changes=ingest.price_changes,
+            failed_vendors=sorted(errors),
+            stages={name: stage.as_dict() for name, stage in stats.items()},
+            **ingest.counts,
+        )
+
+    @staticmethod
+    def _record(stage: StageStats, started: float, items: int) -> None:
+        stage.busy_seconds += time.perf_counter() - started
+        stage.items += items
+        stage.batches += 1
 
 
 def get_pipeline() -> DataPipeline:
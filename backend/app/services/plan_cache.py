@@ -0,0 +1,273 @@
+from __future__ import annotations
+
+import hashlib
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from app.core.config import get_settings
+from app.schemas.chat import ChatMessage, ChatPlanRequest, ChatPlanResponse
+
+from .price_history import PriceHistoryStore, get_price_history_store
+from .result_cache import CacheStats
+from .vector_store import HashingVectorizer, SimpleVectorStore, get_vector_store
+
+_WORD = re.compile(r"[^\W_]+(?:\.\d+)?")
+_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+# "1,500" -> "1500", so thousands separators do not split a number into two tokens.
+_THOUSANDS = re.compile(r"(?<=\d),(?=\d{3}\b)")
+
+# Filler that says nothing about the build, dropped before comparing conversations.
+_FILLER = frozenset(
+    "a about an and any approximately around can could for hi hello i in is it like me my"
+    " need of on or please some the thanks to want would you".split()
+)
+
+_Partition = Tuple[Optional[float], str, str, Tuple[str, ...]]
+
+
+def normalize_text(text: str) -> str:
+    text = unicodedata.normalize("NFKC", text).lower()
+    return " ".join(_WORD.findall(_THOUSANDS.sub("", text)))
+
+
+def normalize_conversation(messages: Sequence[ChatMessage]) -> str:
+    return "\n".join(
+        f"{message.role.strip().lower()}: {normalize_text(message.content)}" for message in messages
+    )
+
+
+@dataclass
+class PlanCacheStats(CacheStats):
+    near_hits: int = 0
+
+
+@dataclass
+class _Entry:
+    key: str
+    partition: _Partition
+    vector: np.ndarray
+    response: ChatPlanResponse
+    stored_at: float
+    # Catalog SKU -> its price when the plan was cached, for the plan's matched components.
+    basis: Dict[str, float] = field(default_factory=dict)
+
+
+class PlanCache:
+    """Cache generated build plans, including for near-duplicate conversations.
+
+    Requests are keyed on the normalized conversation plus budget, currency and locale.
+    A miss on the exact key falls back to the most similar cached conversation in the
+    same partition (same budget, currency, locale and the same numbers in the text, so
+    "1080p" never answers "1440p"), accepted when cosine similarity reaches
+    ``similarity``. Entries expire after ``ttl_seconds`` and the least recently used go
+    first once ``max_entries`` is reached.
+
+    Plan components are matched to catalog products by URL or name when cached. A plan
+    is dropped once one of those products' price moves more than ``price_tolerance``
+    (relative) from what it was; moves are read from the shared price history, so a
+    refresh in any worker invalidates every worker's cache.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 512,
+        ttl_seconds: float = 3600.0,
+        similarity: float = 0.85,
+        price_tolerance: float = 0.05,
+        catalog: Callable[[], SimpleVectorStore] = get_vector_store,
+        history: Callable[[], PriceHistoryStore] = get_price_history_store,
+    ) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity = similarity
+        self.price_tolerance = price_tolerance
+        self.stats = PlanCacheStats()
+        self._catalog = catalog
+        self._history = history
+        self._vectorizer = HashingVectorizer()
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._partitions: Dict[_Partition, Set[str]] = {}
+        self._by_sku: Dict[str, Set[str]] = {}
+        self._cursor: Optional[int] = None
+        self._catalog_index: Optional[Tuple[Tuple[int, int], Dict[str, Tuple[str, float]]]] = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, request: ChatPlanRequest) -> Optional[ChatPlanResponse]:
+        key, partition, vector = self._describe(request)
+        with self._lock:
+            self._apply_price_changes()
+            entry = self._live(key)
+            if entry is not None:
+                self.stats.hits += 1
+            else:
+                entry = self._nearest(partition, vector)
+                if entry is None:
+                    self.stats.misses += 1
+                    return None
+                self.stats.near_hits += 1
+            self._entries.move_to_end(entry.key)
+            return entry.response.model_copy(deep=True)
+
+    def put(self, request: ChatPlanRequest, response: ChatPlanResponse) -> None:
+        key, partition, vector = self._describe(request)
+        basis = self._price_basis(response)
+        with self._lock:
+            self._apply_price_changes()
+            self._discard(key)
+            self._entries[key] = _Entry(
+                key, partition, vector, response.model_copy(deep=True), time.monotonic(), basis
+            )
+            self._partitions.setdefault(partition, set()).add(key)
+            for sku in basis:
+                self._by_sku.setdefault(sku, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._discard(next(iter(self._entries)))
+                self.stats.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._partitions.clear()
+            self._by_sku.clear()
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            payload = self.stats.as_dict()
+            served = self.stats.hits + self.stats.near_hits
+            payload["hit_rate"] = served / max(served + self.stats.misses, 1)
+            payload["entries"] = len(self._entries)
+            return payload
+
+    def _describe(self, request: ChatPlanRequest) -> Tuple[str, _Partition, np.ndarray]:
+        conversation = normalize_conversation(request.messages)
+        budget = round(request.budget, 2) if request.budget is not None else None
+        numbers = tuple(sorted(set(_NUMBER.findall(conversation))))
+        partition: _Partition = (
+            budget,
+            request.currency.strip().upper(),
+            request.locale.strip().lower(),
+            numbers,
+        )
+        digest = hashlib.blake2b(
+            repr((partition, conversation)).encode("utf-8"), digest_size=16
+        ).hexdigest()
+        # Similarity looks at what was said, not at speaker labels or filler words.
+        content = " ".join(
+            word
+            for message in request.messages
+            for word in normalize_text(message.content).split()
+            if word not in _FILLER
+        )
+        return digest, partition, self._vectorizer.embed_query(content)
+
+    def _live(self, key: str) -> Optional[_Entry]:
+        entry = self._entries.get(key)
+        if entry is not None and time.monotonic() - entry.stored_at > self.ttl_seconds:
+            self._discard(key)
+            self.stats.expirations += 1
+            return None
+        return entry
+
+    def _nearest(self, partition: _Partition, vector: np.ndarray) -> Optional[_Entry]:
+        candidates = [
+            entry
+            for entry in (self._live(key) for key in list(self._partitions.get(partition, ())))
+            if entry is not None
+        ]
+        if not candidates:
+            return None
+        scores = np.stack([entry.vector for entry in candidates]) @ vector
+        best = int(np.argmax(scores))
+        return candidates[best] if scores[best] >= self.similarity else None
+
+    def _discard(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        keys = self._partitions.get(entry.partition)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._partitions[entry.partition]
+        for sku in entry.basis:
+            owners = self._by_sku.get(sku)
+            if owners is not None:
+                owners.discard(key)
+                if not owners:
+                    del self._by_sku[sku]
+
+    def _apply_price_changes(self) -> None:
+        changes, self._cursor = self._history().changes_since(self._cursor)
+        if changes is None:
+            # Too many changes to inspect one by one.
+            self.stats.invalidations += len(self._entries)
+            self._entries.clear()
+            self._partitions.clear()
+            self._by_sku.clear()
+            return
+        for change in changes:
+            for key in list(self._by_sku.get(change.sku, ())):
+                basis = self._entries[key].basis[change.sku]
+                if basis > 0 and abs(change.price - basis) / basis > self.price_tolerance:
+                    self._discard(key)
+                    self.stats.invalidations += 1
+
+    def _price_basis(self, response: ChatPlanResponse) -> Dict[str, float]:
+        index = self._index()
+        basis: Dict[str, float] = {}
+        components = [
+            *response.components,
+            *(item for alternative in response.alternatives for item in alternative.components),
+        ]
+        for component in components:
+            match = (component.url and index.get(component.url)) or index.get(
+                "name:" + normalize_text(component.name)
+            )
+            if match is not None:
+                basis[match[0]] = match[1]
+        return basis
+
+    def _index(self) -> Dict[str, Tuple[str, float]]:
+        """Catalog products by URL and by normalized name, rebuilt when the catalog changes."""
+
+        store = self._catalog()
+        version = (id(store), store.generation)
+        if self._catalog_index is None or self._catalog_index[0] != version:
+            index: Dict[str, Tuple[str, float]] = {}
+            for metadata in store.all():
+                price = metadata.get("price")
+                if not isinstance(price, (int, float)):
+                    continue
+                entry = (metadata["sku"], float(price))
+                if metadata.get("url"):
+                    index[metadata["url"]] = entry
+                index["name:" + normalize_text(str(metadata.get("name") or ""))] = entry
+            self._catalog_index = (version, index)
+        return self._catalog_index[1]
+
+
+_plan_cache_instance: Optional[PlanCache] = None
+
+
+def get_plan_cache() -> PlanCache:
+    global _plan_cache_instance
+    if _plan_cache_instance is None:
+        settings = get_settings()
+        _plan_cache_instance = PlanCache(
+            max_entries=settings.plan_cache_max_entries,
+            ttl_seconds=settings.plan_cache_ttl_seconds,
+            similarity=settings.plan_cache_similarity,
+            price_tolerance=settings.plan_cache_price_tolerance,
+        )
+    return _plan_cache_instance
+
@@ -0,0 +1,516 @@
+from __future__ import annotations
+
+import json
+import logging
+import math
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Deque, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.schemas.product import PricePoint, PriceRollup
+
+from .vector_storage import file_lock
+
+LOGGER = logging.getLogger(__name__)
+
+_HISTORY_PATH = Path(__file__).resolve().parents[1] / "data" / "price_history"
+
+_DAY = 86_400
+# 1970-01-01 was a Thursday; weeks start on Monday, four days later.
+RESOLUTIONS: Dict[str, Tuple[int, int]] = {"day": (_DAY, 0), "week": (7 * _DAY, 4 * _DAY)}
+
+_POINT = np.dtype([("series", "<u4"), ("ts", "<i8"), ("price", "<f8")])
+
+
+@dataclass(frozen=True)
+class _Series:
+    sku: str
+    vendor: str
+    currency: str
+
+
+@dataclass(frozen=True)
+class PriceChange:
+    sku: str
+    vendor: str
+    # ``None`` for the first point of a series.
+    previous: Optional[float]
+    price: float
+
+
+@dataclass
+class _Rollups:
+    """Buckets of every series for one resolution, stored CSR-style by series."""
+
+    offsets: np.ndarray
+    starts: np.ndarray
+    mins: np.ndarray
+    maxs: np.ndarray
+    weighted: np.ndarray
+    covered: np.ndarray
+
+    def slice(self, series: int) -> Tuple[np.ndarray, ...]:
+        lo, hi = self.offsets[series], self.offsets[series + 1]
+        return (
+            self.starts[lo:hi],
+            self.mins[lo:hi],
+            self.maxs[lo:hi],
+            self.weighted[lo:hi],
+            self.covered[lo:hi],
+        )
+
+
+def _bucket(ts: np.ndarray, width: int, offset: int) -> np.ndarray:
+    return (ts - offset) // width * width + offset
+
+
+def _rollup(
+    series: np.ndarray, ts: np.ndarray, prices: np.ndarray, count: int, width: int, offset: int
+) -> _Rollups:
+    """Aggregate the step function each series' points describe into fixed buckets.
+
+    A price holds from its point until the series' next point, so every closed segment
+    is spread over the buckets it overlaps and weighted by the seconds it covers there.
+    Points must be sorted by series, then time. The open segment after a series' last
+    point depends on the current time and is added at query time.
+    """
+
+    closed = np.flatnonzero((series[1:] == series[:-1]) & (ts[1:] > ts[:-1]))
+    if not len(closed):
+        empty = np.zeros(0, dtype=np.float64)
+        return _Rollups(
+            offsets=np.zeros(count + 1, dtype=np.int64),
+            starts=np.zeros(0, dtype=np.int64),
+            mins=empty,
+            maxs=empty,
+            weighted=empty,
+            covered=empty,
+        )
+    start, stop, price = ts[closed], ts[closed + 1], prices[closed]
+    first = _bucket(start, width, offset)
+    spans = (_bucket(stop - 1, width, offset) - first) // width + 1
+    rows = np.repeat(np.arange(len(closed)), spans)
+    step = np.arange(len(rows)) - np.repeat(np.cumsum(spans) - spans, spans)
+    buckets = first[rows] + step * width
+    overlap = (
+        np.minimum(stop[rows], buckets + width) - np.maximum(start[rows], buckets)
+    ).astype(np.float64)
+    owner = series[closed][rows]
+    # Rows are already ordered by (series, bucket); each run of equal keys is one bucket.
+    heads = np.flatnonzero(
+        np.r_[True, (owner[1:] != owner[:-1]) | (buckets[1:] != buckets[:-1])]
+    )
+    values = price[rows]
+    return _Rollups(
+        offsets=np.searchsorted(owner[heads], np.arange(count + 1)),
+        starts=buckets[heads],
+        mins=np.minimum.reduceat(values, heads),
+        maxs=np.maximum.reduceat(values, heads),
+        weighted=np.add.reduceat(values * overlap, heads),
+        covered=np.add.reduceat(overlap, heads),
+    )
+
+
+def _to_datetime(ts: int) -> datetime:
+    return datetime.fromtimestamp(int(ts), tz=timezone.utc)
+
+
+def _to_seconds(moment: Optional[datetime]) -> Optional[int]:
+    if moment is None:
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return int(moment.timestamp())
+
+
+class PriceHistoryStore:
+    """Append-only price history, one series per (SKU, vendor).
+
+    ``record`` appends a point only when a series' price differs from its last one, so
+    a price holds from its point until the next. Points are appended to a binary log of
+    fixed-width records (``.points``) and series to a JSON-lines dictionary
+    (``.series.jsonl``); writers serialize through a ``.lock`` file, and other processes
+    pick up appended records on their next read.
+
+    In memory the points are columnar: ``ts`` and ``price`` arrays sorted by series and
+    then time, with ``offsets`` giving each series' slice, so a range query is two
+    binary searches. Daily and weekly min/max/time-weighted-average rollups are computed
+    for all series whenever pending points are folded in by ``flush``.
+    """
+
+    pending_limit = 65_536
+    # Recent changes kept for ``changes_since``; a reader further behind sees a gap.
+    change_log_size = 65_536
+
+    def __init__(self, path: Path = _HISTORY_PATH) -> None:
+        self.points_path = path.with_suffix(".points")
+        self.series_path = path.with_suffix(".series.jsonl")
+        self.lock_path = path.with_suffix(".lock")
+        self._lock = threading.RLock()
+        self._series: List[_Series] = []
+        self._ids: Dict[Tuple[str, str], int] = {}
+        self._by_sku: Dict[str, List[int]] = {}
+        self._last_ts: List[int] = []
+        self._last_price: List[float] = []
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._ts = np.zeros(0, dtype=np.int64)
+        self._prices = np.zeros(0, dtype=np.float64)
+        self._rollups: Dict[str, _Rollups] = {}
+        # Points read or written since the last flush, per series, in time order.
+        self._pending: Dict[int, List[Tuple[int, float]]] = {}
+        self._pending_count = 0
+        self._points_offset = 0
+        self._series_offset = 0
+        # Points seen so far, in log order, and the latest of them as changes.
+        self._sequence = 0
+        self._changes: Deque[PriceChange] = deque(maxlen=self.change_log_size)
+        with self._lock:
+            self._catch_up()
+            self.flush()
+
+    def __len__(self) -> int:
+        return len(self._ts) + self._pending_count
+
+    def record(self, items: Iterable[Dict[str, Any]], at: Optional[datetime] = None) -> int:
+        """Append a point for every item whose price changed; returns how many were added.
+
+        ``items`` are product metadata dicts with ``sku``, ``vendor``, ``price`` and
+        ``currency``; ``at`` defaults to now.
+        """
+
+        now = _to_seconds(at) or int(time.time())
+        with self._lock, file_lock(self.lock_path):
+            # Another process may have recorded since our last read.
+            self._catch_up()
+            self._repair()
+            series_lines: List[str] = []
+            points: List[Tuple[int, int, float]] = []
+            for item in items:
+                sku, price = item.get("sku"), item.get("price")
+                if not sku or not isinstance(price, (int, float)):
+                    continue
+                key = (str(sku), str(item.get("vendor") or ""))
+                series = self._ids.get(key)
+                if series is None:
+                    currency = str(item.get("currency") or "USD")
+                    series = self._add_series(_Series(key[0], key[1], currency))
+                    series_lines.append(
+                        json.dumps({"sku": key[0], "vendor": key[1], "currency": currency})
+                    )
+                elif self._last_price[series] == float(price):
+                    continue
+                # Keep every series in time order even if another writer's clock runs ahead.
+                points.append((series, max(now, self._last_ts[series]), float(price)))
+                self._append(*points[-1])
+            if series_lines:
+                # Series go first, so a reader never sees a point for an unknown series.
+                self._series_offset += self._write(
+                    self.series_path, "".join(line + "\n" for line in series_lines).encode()
+                )
+            if points:
+                self._points_offset += self._write(
+                    self.points_path, np.array(points, dtype=_POINT).tobytes()
+                )
+            if self._pending_count >= self.pending_limit:
+                self.flush()
+            return len(points)
+
+    def changes_since(self, cursor: Optional[int]) -> Tuple[Optional[List[PriceChange]], int]:
+        """Price changes logged after ``cursor``, by any process, and the new cursor.
+
+        Pass ``None`` to start from now. Returns ``None`` instead of a list when more
+        changes happened than are kept, so the caller must assume anything changed.
+        """
+
+        with self._lock:
+            self._refresh()
+            if cursor is None:
+                return [], self._sequence
+            missed = self._sequence - cursor
+            if missed > len(self._changes):
+                return None, self._sequence
+            changes = list(self._changes)[len(self._changes) - missed :] if missed > 0 else []
+            return changes, self._sequence
+
+    def flush(self) -> None:
+        """Fold pending points into the columnar arrays and recompute the rollups."""
+
+        with self._lock:
+            if not self._pending and self._rollups and len(self._offsets) == len(self._series) + 1:
+                return
+            pending = list(self._pending.items())
+            points = np.array(
+                [point for _, series_points in pending for point in series_points],
+                dtype=np.float64,
+            ).reshape(-1, 2)
+            self._pending = {}
+            self._pending_count = 0
+            self._merge(
+                np.repeat([series for series, _ in pending], [len(p) for _, p in pending]),
+                points[:, 0].astype(np.int64),
+                points[:, 1],
+            )
+
+    def _merge(self, series: np.ndarray, ts: np.ndarray, prices: np.ndarray) -> None:
+        count = len(self._series)
+        owners = np.concatenate(
+            [np.repeat(np.arange(len(self._offsets) - 1), np.diff(self._offsets)), series]
+        ).astype(np.int64)
+        ts = np.concatenate([self._ts, ts])
+        prices = np.concatenate([self._prices, prices])
+        # Within a series, stored points precede newer ones, so a stable sort on the
+        # series alone keeps every series in time order.
+        order = np.argsort(owners, kind="stable")
+        owners, self._ts, self._prices = owners[order], ts[order], prices[order]
+        self._offsets = np.searchsorted(owners, np.arange(count + 1))
+        self._rollups = {
+            name: _rollup(owners, self._ts, self._prices, count, width, offset)
+            for name, (width, offset) in RESOLUTIONS.items()
+        }
+
+    def history(
+        self, sku: str, start: Optional[datetime] = None, end: Optional[datetime] = None
+    ) -> List[PricePoint]:
+        """Points of every vendor's series for ``sku`` between ``start`` and ``end``.
+
+        When ``start`` is given, the point in effect at ``start`` is included too, so a
+        chart of a quiet period still has a price to draw.
+        """
+
+        return self.histories([sku], start, end)[sku]
+
+    def histories(
+        self, skus: Sequence[str], start: Optional[datetime] = None, end: Optional[datetime] = None
+    ) -> Dict[str, List[PricePoint]]:
+        low, high = _to_seconds(start), _to_seconds(end)
+        with self._lock:
+            self._refresh()
+            result: Dict[str, List[PricePoint]] = {}
+            for sku in skus:
+                points: List[PricePoint] = []
+                for series in self._by_sku.get(sku, []):
+                    info = self._series[series]
+                    ts, prices = self._points(series)
+                    lo = 0 if low is None else max(int(np.searchsorted(ts, low, "right")) - 1, 0)
+                    hi = len(ts) if high is None else int(np.searchsorted(ts, high, "right"))
+                    points.extend(
+                        PricePoint(
+                            timestamp=_to_datetime(ts[index]),
+                            price=float(prices[index]),
+                            currency=info.currency,
+                            vendor=info.vendor,
+                        )
+                        for index in range(lo, hi)
+                    )
+                points.sort(key=lambda point: point.timestamp)
+                result[sku] = points
+            return result
+
+    def rollups(
+        self,
+        sku: str,
+        resolution: str = "day",
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> List[PriceRollup]:
+        """Per-vendor min/max/average for each day or week overlapping ``start``..``end``.
+
+        The current price counts up to now, so the latest period is still filling in.
+        """
+
+        if resolution not in RESOLUTIONS:
+            raise ValueError(f"Unknown resolution {resolution!r}")
+        width, offset = RESOLUTIONS[resolution]
+        now = int(time.time())
+        high = min(_to_seconds(end) or now, now)
+        low = _to_seconds(start)
+        with self._lock:
+            self._refresh()
+            rollups: List[PriceRollup] = []
+            for series in self._by_sku.get(sku, []):
+                info = self._series[series]
+                if math.isnan(self._last_price[series]):
+                    continue
+                if series in self._pending:
+                    ts, prices = self._points(series)
+                    owners = np.zeros(len(ts), dtype=np.int64)
+                    buckets = _rollup(owners, ts, prices, 1, width, offset).slice(0)
+                else:
+                    buckets = self._rollups[resolution].slice(series)
+                starts, mins, maxs, weighted, covered = (column.copy() for column in buckets)
+                starts, mins, maxs, weighted, covered = self._extend_open(
+                    series, starts, mins, maxs, weighted, covered, now, width, offset
+                )
+                lo = 0 if low is None else int(np.searchsorted(starts, _bucket(low, width, offset)))
+                hi = int(np.searchsorted(starts, high, "right"))
+                rollups.extend(
+                    PriceRollup(
+                        period_start=_to_datetime(starts[index]),
+                        min_price=float(mins[index]),
+                        max_price=float(maxs[index]),
+                        avg_price=float(weighted[index] / covered[index])
+                        if covered[index]
+                        else float(mins[index]),
+                        currency=info.currency,
+                        vendor=info.vendor,
+                    )
+                    for index in range(lo, hi)
+                )
+            rollups.sort(key=lambda rollup: (rollup.period_start, rollup.vendor))
+            return rollups
+
+    def _extend_open(
+        self,
+        series: int,
+        starts: np.ndarray,
+        mins: np.ndarray,
+        maxs: np.ndarray,
+        weighted: np.ndarray,
+        covered: np.ndarray,
+        until: int,
+        width: int,
+        offset: int,
+    ) -> Tuple[np.ndarray, ...]:
+        """Add the last price, which holds from the series' last point until ``until``."""
+
+        since, price = self._last_ts[series], self._last_price[series]
+        first = int(_bucket(since, width, offset))
+        last = int(_bucket(max(until - 1, since), width, offset))
+        buckets = np.arange(first, last + 1, width, dtype=np.int64)
+        overlap = np.clip(
+            np.minimum(until, buckets + width) - np.maximum(since, buckets), 0, None
+        ).astype(np.float64)
+        if len(starts) and starts[-1] == first:
+            mins[-1] = min(mins[-1], price)
+            maxs[-1] = max(maxs[-1], price)
+            weighted[-1] += price * overlap[0]
+            covered[-1] += overlap[0]
+            buckets, overlap = buckets[1:], overlap[1:]
+        return (
+            np.concatenate([starts, buckets]),
+            np.concatenate([mins, np.full(len(buckets), price)]),
+            np.concatenate([maxs, np.full(len(buckets), price)]),
+            np.concatenate([weighted, price * overlap]),
+            np.concatenate([covered, overlap]),
+        )
+
+    def _points(self, series: int) -> Tuple[np.ndarray, np.ndarray]:
+        lo = hi = 0
+        if series + 1 < len(self._offsets):
+            lo, hi = self._offsets[series], self._offsets[series + 1]
+        ts, prices = self._ts[lo:hi], self._prices[lo:hi]
+        pending = self._pending.get(series)
+        if pending:
+            extra = np.array(pending, dtype=np.float64)
+            ts = np.concatenate([ts, extra[:, 0].astype(np.int64)])
+            prices = np.concatenate([prices, extra[:, 1]])
+        return ts, prices
+
+    def _add_series(self, info: _Series) -> int:
+        series = len(self._series)
+        self._series.append(info)
+        self._ids[(info.sku, info.vendor)] = series
+        self._by_sku.setdefault(info.sku, []).append(series)
+        self._last_ts.append(0)
+        self._last_price.append(float("nan"))
+        return series
+
+    def _append(self, series: int, ts: int, price: float) -> None:
+        info, previous = self._series[series], self._last_price[series]
+        self._changes.append(
+            PriceChange(info.sku, info.vendor, None if math.isnan(previous) else previous, price)
+        )
+        self._sequence += 1
+        self._pending.setdefault(series, []).append((ts, price))
+        self._pending_count += 1
+        self._last_ts[series] = ts
+        self._last_price[series] = price
+
+    def _refresh(self) -> None:
+        """Pick up records appended by other processes since the last read."""
+
+        if self._size(self.points_path) > self._points_offset:
+            self._catch_up()
+
+    def _catch_up(self) -> None:
+        # Points are read before series: any point read has its series written already.
+        payload = self._read(self.points_path, self._points_offset)
+        whole = len(payload) - len(payload) % _POINT.itemsize
+        records = np.frombuffer(payload[:whole], dtype=_POINT)
+        self._points_offset += whole
+        payload = self._read(self.series_path, self._series_offset)
+        complete = payload.rfind(b"\n") + 1
+        for line in payload[:complete].splitlines():
+            entry = json.loads(line)
+            self._add_series(_Series(entry["sku"], entry["vendor"], entry["currency"]))
+        self._series_offset += complete
+        if len(records) < self.pending_limit:
+            for series, ts, price in records.tolist():
+                self._append(series, ts, price)
+            return
+        # A long tail (typically the whole log on startup) is merged in one vectorized pass.
+        order = records["series"][::-1]
+        owners, index = np.unique(order, return_index=True)
+        for series, row in zip(owners.tolist(), (len(records) - 1 - index).tolist()):
+            self._last_ts[series] = int(records["ts"][row])
+            self._last_price[series] = float(records["price"][row])
+        self._sequence += len(records)
+        self._changes.clear()
+        self.flush()
+        self._merge(records["series"].astype(np.int64), records["ts"], records["price"])
+
+    def _repair(self) -> None:
+        """Drop a torn trailing record left by a writer that died mid-append."""
+
+        for path, offset in (
+            (self.points_path, self._points_offset),
+            (self.series_path, self._series_offset),
+        ):
+            if self._size(path) > offset:
+                LOGGER.warning("Truncating incomplete records at the end of %s", path)
+                with path.open("r+b") as handle:
+                    handle.truncate(offset)
+
+    @staticmethod
+    def _write(path: Path, payload: bytes) -> int:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("ab") as handle:
+            handle.write(payload)
+            handle.flush()
+            os.fsync(handle.fileno())
+        return len(payload)
+
+    @staticmethod
+    def _read(path: Path, start: int) -> bytes:
+        try:
+            with path.open("rb") as handle:
+                handle.seek(start)
+                return handle.read()
+        except FileNotFoundError:
+            return b""
+
+    @staticmethod
+    def _size(path: Path) -> int:
+        try:
+            return path.stat().st_size
+        except FileNotFoundError:
+            return 0
+
+
+_history_instance: Optional[PriceHistoryStore] = None
+_history_lock = threading.Lock()
+
+
+def get_price_history_store() -> PriceHistoryStore:
+    global _history_instance
+    with _history_lock:
+        if _history_instance is None:
+            _history_instance = PriceHistoryStore()
+        return _history_instance
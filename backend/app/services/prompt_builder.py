@@ -0,0 +1,233 @@
+from __future__ import annotations
+
+import json
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from app.core.config import get_settings
+from app.schemas.chat import ChatMessage, ChatPlanRequest
+
+from .vector_store import SimpleVectorStore, get_vector_store
+
+# Categories a complete build needs; the shortlist offers candidates for each.
+BUILD_CATEGORIES: Tuple[str, ...] = (
+    "CPU",
+    "GPU",
+    "Motherboard",
+    "Memory",
+    "SSD",
+    "Power Supply",
+    "Case",
+)
+
+# The most of the whole budget one part of a balanced build takes; caps its candidates.
+BUDGET_SHARES: Dict[str, float] = {
+    "CPU": 0.35,
+    "GPU": 0.5,
+    "Motherboard": 0.25,
+    "Memory": 0.15,
+    "SSD": 0.15,
+    "Power Supply": 0.15,
+    "Case": 0.15,
+}
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count: about four characters per token for English and JSON."""
+
+    return (len(text) + 3) // 4
+
+
+def _clip(text: str, tokens: int) -> str:
+    limit = max(tokens, 1) * 4
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[: limit - 1].rstrip() + "…"
+
+
+@lru_cache(maxsize=16)
+def _prefix(currency: str) -> str:
+    """Instructions and output schema, which only vary with the currency."""
+
+    instructions = (
+        "You are Builda, a senior PC build consultant."
+        " Produce a balanced configuration that matches the intent, budget, and scenario"
+        " described by the user. Pick components from the catalog candidates below"
+        " whenever one fits, copying its name, price, vendor and URL exactly; only"
+        " suggest a part outside the list when none fits, and then leave its URL out."
+        " Respond strictly in JSON without code fences."
+    )
+
+    # Components come first so a streamed response can show them while the rest arrives.
+    schema = {
+        "plan_id": "string",
+        "currency": currency,
+        "components": [
+            {
+                "category": "string",
+                "name": "string",
+                "price": "number",
+                "vendor": "string",
+                "url": "string",
+            }
+        ],
+        "total_price": "number",
+        "summary": "string",
+        "notes": "string",
+        "alternatives": [
+            {
+                "title": "string",
+                "description": "string",
+                "total_price": "number",
+                "components": "same schema as components",
+            }
+        ],
+    }
+    return (
+        f"{instructions}\n\n"
+        f"Output JSON schema (fill with actual data, omit unused optional fields):\n"
+        f"{json.dumps(schema)}"
+    )
+
+
+class PromptBuilder:
+    """Assemble Gemini prompts that fit ``token_budget`` and are grounded in the catalog.
+
+    A prompt is the cached instruction and schema prefix, a shortlist of up to
+    ``shortlist_size`` real catalog products per build category (ranked by the
+    conversation, and priced under that category's ``BUDGET_SHARES`` of the user's
+    budget when they are in the budget's currency), and as much of the conversation
+    as the remaining budget allows. The newest turns are kept verbatim; older user
+    turns are condensed to a line each and assistant turns dropped, and whatever still
+    does not fit is only counted.
+    """
+
+    def __init__(
+        self,
+        token_budget: int = 3000,
+        shortlist_size: int = 3,
+        catalog: Callable[[], SimpleVectorStore] = get_vector_store,
+        categories: Sequence[str] = BUILD_CATEGORIES,
+    ) -> None:
+        self.token_budget = token_budget
+        self.shortlist_size = shortlist_size
+        self.categories = tuple(categories)
+        self._catalog = catalog
+
+    def build(self, request: ChatPlanRequest) -> str:
+        """Return the prompt for ``request``; searches the catalog, so keep it off the loop."""
+
+        prefix = _prefix(request.currency)
+        shortlist = self.shortlist(request)
+        budget_line = (
+            f"Budget: {request.budget:g} {request.currency}"
+            if request.budget is not None
+            else f"Budget: not stated (currency {request.currency})"
+        )
+        fixed = f"{prefix}\n\n{budget_line}\n\n{shortlist}\n\nConversation history:\n"
+        remaining = self.token_budget - estimate_tokens(fixed)
+        return fixed + self.conversation(request.messages, remaining)
+
+    def shortlist(self, request: ChatPlanRequest) -> str:
+        query = " ".join(
+            message.content for message in request.messages[-6:] if message.role == "user"
+        ).strip()
+        if not query:
+            # Without a query the ranking would be arbitrary; better no candidates at all.
+            return "Catalog candidates: none until the user describes the build."
+        store = self._catalog()
+        sections: List[str] = []
+        for category in self.categories:
+            # Over-fetch, since candidates above the category's cap are dropped afterwards.
+            hits = store.search(query, top_k=self.shortlist_size * 4, category=category)
+            hits = [hit for hit in hits if self._affordable(hit, category, request)]
+            hits = hits[: self.shortlist_size]
+            if not hits:
+                continue
+            lines = [f"{category}:"]
+            for hit in hits:
+                currency = hit.get("currency") or request.currency
+                fields = [
+                    str(hit.get("name", "")),
+                    f"{float(hit.get('price', 0.0)):.2f} {currency}",
+                    str(hit.get("vendor", "")),
+                ]
+                if hit.get("url"):
+                    fields.append(str(hit["url"]))
+                lines.append("- " + " | ".join(fields))
+            sections.append("\n".join(lines))
+        if not sections:
+            return "Catalog candidates: none available."
+        return "Catalog candidates (name | price | vendor | url):\n" + "\n".join(sections)
+
+    @staticmethod
+    def _affordable(hit: Dict[str, Any], category: str, request: ChatPlanRequest) -> bool:
+        if request.budget is None:
+            return True
+        currency = str(hit.get("currency") or request.currency).upper()
+        if currency != request.currency.upper():
+            # Prices in another currency cannot be compared with the budget.
+            return True
+        cap = request.budget * BUDGET_SHARES.get(category, 1.0)
+        return float(hit.get("price", 0.0)) <= cap
+
+    def conversation(self, messages: Sequence[ChatMessage], tokens: int) -> str:
+        """Render ``messages`` in at most about ``tokens`` tokens, favouring the newest."""
+
+        tokens = max(tokens, 64)
+        rendered = [
+            f"{'User' if message.role == 'user' else 'Assistant'}: {message.content.strip()}"
+            for message in messages
+        ]
+        recent: List[str] = []
+        used = 0
+        position = len(rendered)
+        while position > 0:
+            cost = estimate_tokens(rendered[position - 1]) + 1
+            if recent and used + cost > tokens:
+                break
+            if not recent and cost > tokens:
+                # The latest message alone is over budget; keep its beginning.
+                recent.append(_clip(rendered[position - 1], tokens))
+                used = tokens
+            else:
+                recent.append(rendered[position - 1])
+                used += cost
+            position -= 1
+        recent.reverse()
+
+        earlier: List[str] = []
+        omitted = 0
+        for message in reversed(messages[:position]):
+            if message.role != "user":
+                omitted += 1
+                continue
+            line = "- " + _clip(message.content, 30)
+            cost = estimate_tokens(line) + 1
+            if used + cost > tokens:
+                omitted += 1
+                continue
+            earlier.append(line)
+            used += cost
+        earlier.reverse()
+
+        parts: List[str] = []
+        if omitted:
+            parts.append(f"({omitted} earlier messages omitted)")
+        if earlier:
+            parts.append("Earlier, the user said:\n" + "\n".join(earlier))
+        parts.append("\n".join(recent))
+        return "\n".join(parts)
+
+
+_prompt_builder_instance: Optional[PromptBuilder] = None
+
+
+def get_prompt_builder() -> PromptBuilder:
+    global _prompt_builder_instance
+    if _prompt_builder_instance is None:
+        settings = get_settings()
+        _prompt_builder_instance = PromptBuilder(
+            token_budget=settings.gemini_prompt_token_budget,
+            shortlist_size=settings.gemini_shortlist_size,
+        )
+    return _prompt_builder_instance
@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+MODES = ("float32", "float16", "int8")
+
+# Codes are widened to float32 a block at a time so the scan stays on BLAS without ever
+# materializing the full-precision matrix.
+_BLOCK_ROWS = 1024
+
+
+def quantize(vectors: np.ndarray, mode: str) -> Tuple[np.ndarray, np.ndarray]:
+    """Encode float32 rows as ``(codes, scales)``; ``scales`` is all ones for float16."""
+
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if mode == "float16":
+        return vectors.astype(np.float16), np.ones(len(vectors), dtype=np.float32)
+    if mode != "int8":
+        raise ValueError(f"Unsupported quantization mode: {mode}")
+    peaks = np.abs(vectors).max(axis=1) if vectors.size else np.zeros(len(vectors), np.float32)
+    scales = (peaks / 127.0).astype(np.float32)
+    safe = np.where(scales > 0, scales, 1.0).astype(np.float32)
+    codes = np.rint(vectors / safe[:, np.newaxis]).astype(np.int8)
+    return codes, scales
+
+
+class QuantizedMatrix:
+    """Embedding rows kept as float16 or per-row-scaled int8 codes for scanning.
+
+    Full-precision vectors are not held in memory: rows loaded from a snapshot are read
+    back from its memory-mapped float32 file (``base``) and rows written since then are
+    kept in a small overlay, so ``scores(..., exact=True)`` only faults in the pages of
+    the rows being re-ranked. It mirrors ``EmbeddingMatrix``'s mutation interface.
+    """
+
+    quantized = True
+
+    def __init__(self, dimensions: int, mode: str = "int8", capacity: int = 64) -> None:
+        if mode not in MODES[1:]:
+            raise ValueError(f"Unsupported quantization mode: {mode}")
+        self.dimensions = dimensions
+        self.mode = mode
+        self._codes_dtype = np.float16 if mode == "float16" else np.int8
+        self._size = 0
+        self._allocate(capacity)
+
+    def _allocate(self, capacity: int) -> None:
+        self._codes = np.zeros((capacity, self.dimensions), dtype=self._codes_dtype)
+        self._scales = np.zeros(capacity, dtype=np.float32)
+        # Row of ``_base`` holding the exact vector, or -1 when it lives in ``_overlay``.
+        self._source = np.full(capacity, -1, dtype=np.intp)
+        self._base: Optional[np.ndarray] = None
+        self._overlay: Dict[int, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def nbytes(self) -> int:
+        """Resident bytes: codes, scales and overlay (the mapped base is page cache)."""
+
+        size = self._size
+        overlay = sum(vector.nbytes for vector in self._overlay.values())
+        return self._codes[:size].nbytes + self._scales[:size].nbytes + overlay
+
+    def _reserve(self, size: int) -> None:
+        capacity = self._codes.shape[0]
+        if size <= capacity:
+            return
+        capacity = max(size, capacity * 2)
+        codes = np.zeros((capacity, self.dimensions), dtype=self._codes_dtype)
+        codes[: self._size] = self._codes[: self._size]
+        scales = np.zeros(capacity, dtype=np.float32)
+        scales[: self._size] = self._scales[: self._size]
+        source = np.full(capacity, -1, dtype=np.intp)
+        source[: self._size] = self._source[: self._size]
+        self._codes, self._scales, self._source = codes, scales, source
+
+    def append(self, vector: Iterable[float]) -> int:
+        return self.extend(np.asarray(vector, dtype=np.float32)[np.newaxis, :])[0]
+
+    def extend(self, vectors: np.ndarray) -> range:
+        """Append a block of rows and return the row numbers they occupy."""
+
+        vectors = np.asarray(vectors, dtype=np.float32)
+        start = self._size
+        self._reserve(start + len(vectors))
+        rows = range(start, start + len(vectors))
+        codes, scales = quantize(vectors, self.mode)
+        self._codes[start : rows.stop] = codes
+        self._scales[start : rows.stop] = scales
+        self._source[start : rows.stop] = -1
+        for row, vector in zip(rows, vectors):
+            self._overlay[row] = vector.copy()
+        self._size = rows.stop
+        return rows
+
+    def assign(self, row: int, vector: Iterable[float]) -> None:
+        vector = np.asarray(vector, dtype=np.float32)
+        codes, scales = quantize(vector[np.newaxis, :], self.mode)
+        self._codes[row] = codes[0]
+        self._scales[row] = scales[0]
+        self._source[row] = -1
+        self._overlay[row] = vector.copy()
+
+    def take(self, rows: np.ndarray) -> None:
+        """Keep only ``rows`` (in the given order), releasing the remaining capacity."""
+
+        rows = np.asarray(rows, dtype=np.intp)
+        positions = {int(old): new for new, old in enumerate(rows.tolist())}
+        self._codes = np.ascontiguousarray(self._codes[rows])
+        self._scales = self._scales[rows].copy()
+        self._source = self._source[rows].copy()
+        self._overlay = {
+            positions[old]: vector for old, vector in self._overlay.items() if old in positions
+        }
+        self._size = len(rows)
+
+    def clear(self) -> None:
+        self._size = 0
+        self._allocate(64)
+
+    def load(self, data: np.ndarray) -> None:
+        """Quantize ``data`` and keep it (typically a memory map) as the exact base."""
+
+        self._size = 0
+        self._allocate(max(len(data), 64))
+        for start in range(0, len(data), _BLOCK_ROWS * 8):
+            block = np.asarray(data[start : start + _BLOCK_ROWS * 8], dtype=np.float32)
+            codes, scales = quantize(block, self.mode)
+            self._codes[start : start + len(block)] = codes
+            self._scales[start : start + len(block)] = scales
+        self._base = data
+        self._source[: len(data)] = np.arange(len(data))
+        self._size = len(data)
+
+    def rebase(self, data: np.ndarray) -> None:
+        """Point exact lookups at a freshly written snapshot holding the current rows."""
+
+        if len(data) != self._size:
+            raise ValueError(f"Snapshot has {len(data)} rows, matrix has {self._size}")
+        self._base = data
+        self._source[: self._size] = np.arange(self._size)
+        self._overlay = {}
+
+    def exact(self, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Full-precision vectors for ``rows`` (every row when ``None``)."""
+
+        if rows is None:
+            rows = np.arange(self._size, dtype=np.intp)
+        rows = np.asarray(rows, dtype=np.intp)
+        result = np.empty((len(rows), self.dimensions), dtype=np.float32)
+        source = self._source[rows]
+        mapped = source >= 0
+        if mapped.any():
+            order = np.argsort(source[mapped], kind="stable")
+            # Read the base in file order so the page cache sees a forward scan.
+            targets = np.flatnonzero(mapped)[order]
+            result[targets] = self._base[source[mapped][order]]
+        for position in np.flatnonzero(~mapped).tolist():
+            result[position] = self._overlay[int(rows[position])]
+        return result
+
+    def scores(
+        self, query: np.ndarray, rows: Optional[np.ndarray] = None, exact: bool = False
+    ) -> np.ndarray:
+        """Inner products with ``query``; approximate from the codes unless ``exact``."""
+
+        count = self._size if rows is None else len(rows)
+        scores = np.empty(count, dtype=np.float32)
+        for start in range(0, count, _BLOCK_ROWS):
+            stop = min(count, start + _BLOCK_ROWS)
+            if exact:
+                block_rows = np.arange(start, stop) if rows is None else rows[start:stop]
+                scores[start:stop] = self.exact(block_rows) @ query
+                continue
+            if rows is None:
+                codes, scales = self._codes[start:stop], self._scales[start:stop]
+            else:
+                codes, scales = self._codes[rows[start:stop]], self._scales[rows[start:stop]]
+            scores[start:stop] = (codes.astype(np.float32) @ query) * scales
+        return scores
@@ -0,0 +1,119 @@
+"""Compare embedding storage modes on the product catalog.
+
+Run from ``backend/`` with ``python -m app.services.quantization_report``. For each mode
+the catalog is copied into a scratch store and product names are used as queries; the
+report lists resident embedding bytes, recall@k against the float32 ranking with and
+without exact re-ranking, and mean query latency.
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Sequence, Tuple
+
+from .quantization import MODES
+from .vector_store import _STORE_PATH, SimpleVectorStore, _load_samples
+from .vector_storage import VectorStoreFiles
+
+
+def _catalog(path: Path) -> List[Dict[str, Any]]:
+    """Read the products of the store at ``path`` without opening it in place.
+
+    Opening a store can rewrite it (migrations, re-embedding), so its files are copied
+    into a scratch directory under the writer lock and the copy is opened instead.
+    """
+
+    files = VectorStoreFiles(path)
+    if not files.exists() and not files.legacy_path.exists():
+        return _load_samples()
+    with tempfile.TemporaryDirectory() as scratch, files.lock():
+        for source in path.parent.glob(f"{path.stem}.*"):
+            if source.is_file() and source != files.lock_path:
+                shutil.copy2(source, Path(scratch) / source.name)
+        store = SimpleVectorStore(path=Path(scratch) / path.name, quantization="float32")
+        return store.all() or _load_samples()
+
+
+def _scratch_store(items: Sequence[Dict[str, Any]], mode: str, directory: Path) -> SimpleVectorStore:
+    store = SimpleVectorStore(path=directory / mode, quantization=mode)
+    store.upsert_many(items)
+    store.persist()
+    # Isolate the vector ranking: no BM25 fusion and no approximate index.
+    store.hybrid = False
+    store.ann_min_rows = len(items) + 1
+    return store
+
+
+def _run(
+    store: SimpleVectorStore, queries: Sequence[str], top_k: int
+) -> Tuple[List[List[str]], float]:
+    store.cache.clear()
+    started = time.perf_counter()
+    rankings = [[hit["sku"] for hit in store.search(query, top_k=top_k)] for query in queries]
+    return rankings, (time.perf_counter() - started) / max(len(queries), 1)
+
+
+def _recall(rankings: List[List[str]], reference: List[List[str]]) -> float:
+    found = sum(len(set(ranking) & set(expected)) for ranking, expected in zip(rankings, reference))
+    total = sum(len(expected) for expected in reference)
+    return found / total if total else 1.0
+
+
+def build_report(
+    items: Sequence[Dict[str, Any]], queries: Sequence[str], top_k: int = 10
+) -> List[Dict[str, Any]]:
+    rows: List[Dict[str, Any]] = []
+    with tempfile.TemporaryDirectory() as scratch:
+        reference: List[List[str]] = []
+        for mode in MODES:
+            store = _scratch_store(items, mode, Path(scratch))
+            rankings, latency = _run(store, queries, top_k)
+            if mode == "float32":
+                reference = rankings
+                plain = rankings
+            else:
+                rerank_factor = store.rerank_factor
+                store.rerank_factor = 1
+                plain, _ = _run(store, queries, top_k)
+                store.rerank_factor = rerank_factor
+            rows.append(
+                {
+                    "mode": mode,
+                    "embedding_bytes": store.embeddings.nbytes,
+                    "recall_no_rerank": _recall(plain, reference),
+                    "recall": _recall(rankings, reference),
+                    "latency_ms": latency * 1000.0,
+                }
+            )
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--path", type=Path, default=_STORE_PATH, help="vector store base path")
+    parser.add_argument("--queries", type=int, default=200, help="number of sampled queries")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    items = _catalog(args.path)
+    rng = random.Random(args.seed)
+    sample = rng.sample(items, min(args.queries, len(items)))
+    queries = [item["name"] for item in sample]
+
+    print(f"{len(items)} products, {len(queries)} queries, top_k={args.top_k}")
+    print(f"{'mode':<8} {'embeddings':>12} {'recall@k raw':>13} {'recall@k':>9} {'latency':>10}")
+    for row in build_report(items, queries, args.top_k):
+        print(
+            f"{row['mode']:<8} {row['embedding_bytes'] / 1024:>10.1f}KB"
+            f" {row['recall_no_rerank']:>13.3f} {row['recall']:>9.3f} {row['latency_ms']:>8.2f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
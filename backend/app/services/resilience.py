@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional, Sequence
+
+import numpy as np
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Stop calling a dependency that keeps failing, and probe it until it recovers.
+
+    ``failure_threshold`` consecutive failures (timeouts included) open the circuit:
+    ``allow`` then refuses every call for ``reset_timeout`` seconds, so callers fail
+    over at once instead of waiting out another failure. After that the circuit is
+    half-open and admits up to ``half_open_probes`` calls at a time; a probe that
+    succeeds closes it again, one that fails reopens it for another ``reset_timeout``.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        half_open_probes: int = 1,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.half_open_probes = max(1, half_open_probes)
+        self._clock = clock
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        self._times_opened = 0
+        self._rejected = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def allow(self) -> bool:
+        """Whether a call may go ahead; every allowed call must report its outcome."""
+
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and self._probes < self.half_open_probes:
+                self._state = HALF_OPEN
+                self._probes += 1
+                return True
+            self._rejected += 1
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+            self._probes = 0
+
+    def release(self) -> None:
+        """Hand back an allowed call that ended without an outcome, e.g. by cancellation."""
+
+        with self._lock:
+            if self._state == HALF_OPEN and self._probes:
+                self._probes -= 1
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state == OPEN:
+                return
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = OPEN
+                self._opened_at = self._clock()
+                self._probes = 0
+                self._times_opened += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            state = self._current_state()
+            retry_in = self._opened_at + self.reset_timeout - self._clock()
+            return {
+                "state": state,
+                "consecutive_failures": self._failures,
+                "times_opened": self._times_opened,
+                "rejected": self._rejected,
+                "retry_in_seconds": max(retry_in, 0.0) if state == OPEN else 0.0,
+            }
+
+    def _current_state(self) -> str:
+        if self._state == OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+            return HALF_OPEN
+        return self._state
+
+
+class LatencyWindow:
+    """The most recent ``size`` latencies, in seconds, for percentile estimates."""
+
+    def __init__(self, size: int = 512) -> None:
+        self._samples: Deque[float] = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        with self._lock:
+            if not self._samples:
+                return None
+            return float(np.percentile(np.fromiter(self._samples, dtype=float), q))
+
+    def snapshot(self, quantiles: Sequence[float] = (50, 90, 95, 99)) -> Dict[str, Any]:
+        with self._lock:
+            samples = np.fromiter(self._samples, dtype=float)
+        payload: Dict[str, Any] = {"samples": int(samples.size)}
+        for q in quantiles:
+            value = float(np.percentile(samples, q)) if samples.size else None
+            payload[f"p{q:g}_ms"] = value * 1000.0 if value is not None else None
+        return payload
@@ -9,7 +9,7 @@ from app.schemas.chat import (
     BuildComponent,
     ChatPlanResponse,
 )
-from app.schemas.product import PricePoint, Product
+from app.schemas.product import Product
 
 
 def generate_sample_plan() -> ChatPlanResponse:
@@ -128,18 +128,6 @@ def generate_sample_products() -> List[Product]:
     ]
 
 
-def generate_price_history(sku: str) -> List[PricePoint]:
-    base_time = datetime.utcnow()
-    return [
-        PricePoint(
-            timestamp=base_time - timedelta(days=offset),
-            price=4999.0 - offset * 120,
-            vendor="bestbuy",
-        )
-        for offset in range(5)
-    ]
-
-
 def validate_build() -> BuildValidationResult:
     return BuildValidationResult(
         is_valid=True,
@@ -0,0 +1,208 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import IO, Callable, Dict, Iterable, List, Optional, Tuple
+from uuid import uuid4
+
+from app.core.config import get_settings
+from app.schemas.product import RefreshJob
+
+from .executors import run_ingest
+from .pipeline import DataPipeline, get_pipeline
+from .vector_storage import try_lock_file
+
+LOGGER = logging.getLogger(__name__)
+
+_Scope = Tuple[str, ...]
+
+_LEADER_LOCK = Path(__file__).resolve().parents[1] / "data" / "scheduler.lock"
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class RefreshScheduler:
+    """Run catalog refreshes as background jobs, one at a time.
+
+    ``submit`` returns immediately with a queued job. A request whose vendor scope matches
+    a job that is already queued or running gets that job back instead of a duplicate.
+    ``start`` also launches one periodic loop per vendor in ``intervals`` (seconds).
+
+    Every uvicorn worker has a scheduler, but only the one holding the advisory
+    ``leader_lock`` file runs the periodic loops, so each vendor is crawled once per
+    interval rather than once per worker. The others retry every ``election_interval``
+    seconds and take over if the leader exits. Manual jobs run in whichever worker
+    received them, and each worker only knows its own jobs.
+    """
+
+    history_limit = 100
+    election_interval = 30.0
+
+    def __init__(
+        self,
+        pipeline_factory: Callable[[], DataPipeline] = get_pipeline,
+        intervals: Optional[Dict[str, float]] = None,
+        leader_lock: Optional[Path] = None,
+    ) -> None:
+        self._pipeline_factory = pipeline_factory
+        self.intervals = {
+            vendor: seconds for vendor, seconds in (intervals or {}).items() if seconds > 0
+        }
+        self._jobs: "OrderedDict[str, RefreshJob]" = OrderedDict()
+        self._inflight: Dict[_Scope, RefreshJob] = {}
+        self._queue: Optional["asyncio.Queue[Tuple[_Scope, RefreshJob]]"] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._schedules: List[asyncio.Task] = []
+        self._leader_lock = leader_lock
+        self._leader_handle: Optional[IO[str]] = None
+        self._leading = False
+
+    @property
+    def is_leader(self) -> bool:
+        """Whether this process is running the periodic loops."""
+
+        return self._leading
+
+    async def start(self) -> None:
+        self._ensure_worker()
+        if self.intervals:
+            self._schedules.append(asyncio.create_task(self._lead()))
+
+    async def stop(self) -> None:
+        tasks = [*self._schedules, *([self._worker] if self._worker else [])]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._schedules = []
+        self._worker = None
+        self._leading = False
+        if self._leader_handle is not None:
+            self._leader_handle.close()
+            self._leader_handle = None
+
+    def submit(
+        self, vendors: Optional[Iterable[str]] = None, trigger: str = "manual"
+    ) -> RefreshJob:
+        scope: _Scope = tuple(sorted(set(vendors))) if vendors else ()
+        job = self._inflight.get(scope)
+        if job is not None:
+            return job
+        job = RefreshJob(
+            job_id=uuid4().hex,
+            trigger=trigger,
+            vendors=list(scope) or None,
+            created_at=_now(),
+        )
+        self._jobs[job.job_id] = job
+        while len(self._jobs) > self.history_limit:
+            oldest = next(iter(self._jobs.values()))
+            if oldest.status in ("queued", "running"):
+                break
+            self._jobs.popitem(last=False)
+        self._inflight[scope] = job
+        self._ensure_worker().put_nowait((scope, job))
+        return job
+
+    def get(self, job_id: str) -> Optional[RefreshJob]:
+        return self._jobs.get(job_id)
+
+    def jobs(self) -> List[RefreshJob]:
+        """Known jobs, newest first."""
+
+        return list(reversed(self._jobs.values()))
+
+    def _ensure_worker(self) -> "asyncio.Queue[Tuple[_Scope, RefreshJob]]":
+        worker = self._worker
+        if (
+            self._queue is None
+            or worker is None
+            or worker.done()
+            or worker.get_loop() is not asyncio.get_running_loop()
+        ):
+            # First use, or the loop that owned the previous worker has gone away.
+            self._queue = asyncio.Queue()
+            for scope, job in list(self._inflight.items()):
+                if job.status == "queued":
+                    self._queue.put_nowait((scope, job))
+                else:
+                    job.status = "failed"
+                    job.error = "Interrupted before completion"
+                    job.finished_at = _now()
+                    del self._inflight[scope]
+            self._worker = asyncio.create_task(self._work(self._queue))
+        return self._queue
+
+    async def _work(self, queue: "asyncio.Queue[Tuple[_Scope, RefreshJob]]") -> None:
+        while True:
+            scope, job = await queue.get()
+            if job.status != "queued":
+                continue
+            await self._run(scope, job)
+
+    async def _run(self, scope: _Scope, job: RefreshJob) -> None:
+        job.status = "running"
+        job.started_at = _now()
+        started = time.perf_counter()
+        try:
+            # Building the pipeline may load the store, so keep it off the event loop too.
+            pipeline = await run_ingest(self._pipeline_factory)
+            summary = await pipeline.refresh_samples(vendors=scope or None)
+        except Exception as exc:
+            LOGGER.exception("Refresh job %s failed", job.job_id)
+            job.status = "failed"
+            job.error = str(exc)
+        else:
+            job.ingested = summary.ingested
+            job.added = summary.added
+            job.changed = summary.changed
+            job.unchanged = summary.unchanged
+            job.removed = summary.removed
+            job.rejected = summary.rejected
+            job.price_changes = summary.price_changes
+            job.stages = summary.stages
+            job.failed_vendors = summary.failed_vendors
+            job.status = "done"
+        finally:
+            job.finished_at = _now()
+            job.duration_seconds = time.perf_counter() - started
+            if self._inflight.get(scope) is job:
+                del self._inflight[scope]
+
+    async def _lead(self) -> None:
+        """Run the periodic loops once this process holds the leader lock."""
+
+        if self._leader_lock is not None:
+            self._leader_handle = try_lock_file(self._leader_lock)
+            if self._leader_handle is None:
+                LOGGER.info("Another worker runs scheduled refreshes; standing by")
+            while self._leader_handle is None:
+                await asyncio.sleep(self.election_interval)
+                self._leader_handle = try_lock_file(self._leader_lock)
+        self._leading = True
+        LOGGER.info("Scheduled refreshes: %s", self.intervals)
+        await asyncio.gather(
+            *(self._every(vendor, seconds) for vendor, seconds in self.intervals.items())
+        )
+
+    async def _every(self, vendor: str, seconds: float) -> None:
+        while True:
+            await asyncio.sleep(seconds)
+            self.submit([vendor], trigger="schedule")
+
+
+_scheduler_instance: Optional[RefreshScheduler] = None
+
+
+def get_refresh_scheduler() -> RefreshScheduler:
+    global _scheduler_instance
+    if _scheduler_instance is None:
+        _scheduler_instance = RefreshScheduler(
+            intervals=get_settings().refresh_intervals, leader_lock=_LEADER_LOCK
+        )
+    return _scheduler_instance
@@ -0,0 +1,312 @@
+from __future__ import annotations
+
+import base64
+import json
+import logging
+import os
+import re
+from contextlib import contextmanager
+from pathlib import Path
+from typing import (
+    IO,
+    Any,
+    Collection,
+    ContextManager,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+
+import numpy as np
+
+try:  # pragma: no cover - POSIX only; Windows development runs a single worker
+    import fcntl
+except ModuleNotFoundError:  # pragma: no cover
+    fcntl = None  # type: ignore[assignment]
+
+LOGGER = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+
+
+def encode_vector(vector: np.ndarray) -> str:
+    return base64.b64encode(np.asarray(vector, dtype=np.float32).tobytes()).decode("ascii")
+
+
+def decode_vector(payload: str) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(payload), dtype=np.float32)
+
+
+@contextmanager
+def file_lock(path: Path) -> Iterator[None]:
+    """Hold an exclusive advisory lock on ``path`` (a no-op where ``fcntl`` is unavailable)."""
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("a") as handle:
+        if fcntl is not None:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+
+
+def try_lock_file(path: Path) -> Optional[IO[str]]:
+    """Take an exclusive advisory lock on ``path`` without waiting for it.
+
+    Returns the open handle that holds the lock (closing it releases the lock), or
+    ``None`` if another process holds it. Where ``fcntl`` is unavailable the lock
+    always succeeds.
+    """
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    handle = path.open("a")
+    if fcntl is not None:
+        try:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            handle.close()
+            return None
+    return handle
+
+
+class VectorStoreFiles:
+    """On-disk layout of the vector store.
+
+    A snapshot is an ``.npy`` float32 embedding matrix (memory-mapped on load), a
+    compact ``.meta.json`` sidecar holding identifiers and metadata in row order, and
+    optional auxiliary ``.npz`` array bundles (the IVF index). Each snapshot's files are
+    named after its ``sequence`` and never modified; a ``.manifest.json`` names the
+    published set and is replaced atomically, so a reader sees one whole snapshot or
+    the previous one, never a mix. Writes between snapshots are appended to a ``.wal``
+    journal of JSON lines, which is replayed on load and truncated whenever a new
+    snapshot is written. Every journal entry is stamped with the sequence of the
+    snapshot it extends, so entries that outlive their snapshot (a crash between
+    publishing a snapshot and truncating the journal) are recognizably stale.
+
+    Several processes (uvicorn workers) can share one layout: every worker maps the same
+    embedding file, writers serialize through an advisory ``.lock`` file, and readers
+    notice a new snapshot through ``snapshot_signature`` or new journal entries through
+    ``journal_size``. The files of the previous snapshot are kept until the next one is
+    published, for readers that picked up its manifest just before it was replaced.
+    """
+
+    # Attempts at reading a consistent snapshot while writers keep publishing new ones.
+    read_attempts = 5
+
+    def __init__(self, base: Path) -> None:
+        self.base = base
+        self.manifest_path = base.with_suffix(".manifest.json")
+        self.journal_path = base.with_suffix(".wal")
+        self.legacy_path = base.with_suffix(".json")
+        self.lock_path = base.with_suffix(".lock")
+
+    def exists(self) -> bool:
+        return self.manifest_path.exists()
+
+    def lock(self) -> ContextManager[None]:
+        """Hold the cross-process writer lock (a no-op where ``fcntl`` is unavailable)."""
+
+        return file_lock(self.lock_path)
+
+    def snapshot_signature(self) -> Optional[Tuple[int, int, int]]:
+        """Identify the published snapshot; it changes whenever the manifest is replaced."""
+
+        try:
+            stat = self.manifest_path.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def journal_size(self) -> int:
+        try:
+            return self.journal_path.stat().st_size
+        except FileNotFoundError:
+            return 0
+
+    def read_snapshot(
+        self,
+    ) -> Tuple[
+        Dict[str, Any],
+        List[Tuple[str, Dict[str, Any]]],
+        np.ndarray,
+        Dict[str, Dict[str, np.ndarray]],
+    ]:
+        """Read the published snapshot: header, records, embeddings and array bundles.
+
+        A snapshot replaced while it is being read is read again from the new manifest.
+        ``ValueError`` means the published files themselves are inconsistent; it is never
+        a reason to treat the store as empty.
+        """
+
+        for attempt in range(self.read_attempts):
+            manifest = self._read_manifest()
+            try:
+                return self._read_files(manifest)
+            except (FileNotFoundError, ValueError):
+                if attempt + 1 == self.read_attempts or self._read_manifest() == manifest:
+                    raise
+                LOGGER.info("Snapshot replaced while reading %s; retrying", self.base)
+        raise AssertionError("unreachable")  # pragma: no cover
+
+    def map_embeddings(self) -> np.ndarray:
+        return np.load(self._path(self._read_manifest()["embeddings"]), mmap_mode="c")
+
+    def write_snapshot(
+        self,
+        header: Dict[str, Any],
+        records: Iterable[Tuple[str, Dict[str, Any]]],
+        embeddings: np.ndarray,
+        arrays: Optional[Dict[str, Dict[str, np.ndarray]]] = None,
+    ) -> None:
+        """Write the snapshot numbered ``header["sequence"]`` and publish it atomically."""
+
+        self.base.parent.mkdir(parents=True, exist_ok=True)
+        sequence = int(header["sequence"])
+        payload = {"format": FORMAT_VERSION, **header, "records": [list(item) for item in records]}
+        manifest: Dict[str, Any] = {
+            "format": FORMAT_VERSION,
+            "sequence": sequence,
+            "embeddings": self._versioned(sequence, "npy").name,
+            "metadata": self._versioned(sequence, "meta.json").name,
+            "arrays": {},
+        }
+
+        with self._path(manifest["embeddings"]).open("wb") as handle:
+            np.save(handle, np.ascontiguousarray(embeddings, dtype=np.float32))
+            handle.flush()
+            os.fsync(handle.fileno())
+        with self._path(manifest["metadata"]).open("w", encoding="utf-8") as handle:
+            json.dump(payload, handle, ensure_ascii=False, separators=(",", ":"))
+            handle.flush()
+            os.fsync(handle.fileno())
+        for name, bundle in (arrays or {}).items():
+            if not bundle:
+                continue
+            path = self._versioned(sequence, f"{name}.npz")
+            with path.open("wb") as handle:
+                np.savez(handle, **bundle)
+                handle.flush()
+                os.fsync(handle.fileno())
+            manifest["arrays"][name] = path.name
+
+        manifest_tmp = self.manifest_path.with_name(self.manifest_path.name + ".tmp")
+        with manifest_tmp.open("w", encoding="utf-8") as handle:
+            json.dump(manifest, handle)
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(manifest_tmp, self.manifest_path)
+        # Entries still here after a crash carry the previous sequence and are skipped.
+        self.journal_path.unlink(missing_ok=True)
+        self._prune(keep={sequence, sequence - 1})
+
+    def _read_manifest(self) -> Dict[str, Any]:
+        with self.manifest_path.open("r", encoding="utf-8") as handle:
+            return json.load(handle)
+
+    def _read_files(
+        self, manifest: Dict[str, Any]
+    ) -> Tuple[
+        Dict[str, Any],
+        List[Tuple[str, Dict[str, Any]]],
+        np.ndarray,
+        Dict[str, Dict[str, np.ndarray]],
+    ]:
+        metadata_path = self._path(manifest["metadata"])
+        embeddings_path = self._path(manifest["embeddings"])
+        array_paths = {name: self._path(file) for name, file in manifest["arrays"].items()}
+
+        with metadata_path.open("r", encoding="utf-8") as handle:
+            payload = json.load(handle)
+        if payload.get("sequence") != manifest["sequence"]:
+            raise ValueError(
+                f"Snapshot mismatch: metadata {payload.get('sequence')}"
+                f" for manifest {manifest['sequence']}"
+            )
+        records = [(identifier, metadata) for identifier, metadata in payload.pop("records")]
+        if records:
+            # Copy-on-write mapping: pages are shared with the file until a row is modified.
+            embeddings = np.load(embeddings_path, mmap_mode="c")
+        else:
+            embeddings = np.load(embeddings_path)
+        if len(embeddings) != len(records):
+            raise ValueError(
+                f"Snapshot mismatch: {len(embeddings)} embeddings for {len(records)} records"
+            )
+        arrays: Dict[str, Dict[str, np.ndarray]] = {}
+        for name, path in array_paths.items():
+            with np.load(path) as bundle:
+                arrays[name] = {key: bundle[key] for key in bundle.files}
+        return payload, records, embeddings, arrays
+
+    def _path(self, name: str) -> Path:
+        return self.base.with_name(name)
+
+    def _versioned(self, sequence: int, suffix: str) -> Path:
+        return self.base.with_name(f"{self.base.stem}.{sequence}.{suffix}")
+
+    def _prune(self, keep: Collection[int]) -> None:
+        """Remove snapshot files other than those numbered in ``keep``."""
+
+        pattern = re.compile(rf"{re.escape(self.base.stem)}\.(\d+)\..+")
+        for path in self.base.parent.glob(f"{self.base.stem}.*"):
+            match = pattern.fullmatch(path.name)
+            if match is not None and int(match.group(1)) not in keep:
+                path.unlink(missing_ok=True)
+
+    def append_journal(self, entries: Iterable[Dict[str, Any]], sequence: int) -> int:
+        """Append ``entries`` as extending the snapshot numbered ``sequence``."""
+
+        self.base.parent.mkdir(parents=True, exist_ok=True)
+        written = 0
+        with self.journal_path.open("a", encoding="utf-8") as handle:
+            for entry in entries:
+                stamped = {"seq": sequence, **entry}
+                handle.write(json.dumps(stamped, ensure_ascii=False, separators=(",", ":")))
+                handle.write("\n")
+                written += 1
+            handle.flush()
+            os.fsync(handle.fileno())
+        return written
+
+    def read_journal(self, start: int = 0) -> Tuple[List[Dict[str, Any]], int]:
+        """Read complete entries from byte offset ``start``; return them and the end offset.
+
+        A trailing line without a newline is still being appended by another process, so it
+        is left for the next read.
+        """
+
+        try:
+            with self.journal_path.open("rb") as handle:
+                handle.seek(start)
+                payload = handle.read()
+        except FileNotFoundError:
+            return [], 0
+        complete = payload.rfind(b"\n") + 1
+        entries: List[Dict[str, Any]] = []
+        for line in payload[:complete].splitlines():
+            if not line.strip():
+                continue
+            try:
+                entries.append(json.loads(line))
+            except json.JSONDecodeError:
+                LOGGER.warning("Skipping corrupt journal entry in %s", self.journal_path)
+        return entries, start + complete
+
+    def read_legacy(self) -> Optional[List[Dict[str, Any]]]:
+        if not self.legacy_path.exists():
+            return None
+        try:
+            with self.legacy_path.open("r", encoding="utf-8") as handle:
+                return json.load(handle)
+        except json.JSONDecodeError as exc:  # pragma: no cover - defensive
+            LOGGER.error("Failed to load legacy vector store: %s", exc)
+            return []
+
+    def retire_legacy(self) -> None:
+        if self.legacy_path.exists():
+            self.legacy_path.replace(self.legacy_path.with_name(self.legacy_path.name + ".migrated"))
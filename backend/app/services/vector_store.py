@@ -1,100 +1,682 @@
 from __future__ import annotations
 
+import hashlib
 import json
 import logging
 import math
 import re
-from dataclasses import dataclass
+import threading
+import zlib
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from functools import lru_cache
 from pathlib import Path
-from typing import Any, Dict, Iterable, List, Optional
+from typing import (
+    Any,
+    Collection,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
+
+import numpy as np
+
+from .ann_index import IVFIndex
+from .browse_index import BrowseIndex, decode_cursor, encode_cursor
+from .crawlers.source import get_source_cache
+from .executors import submit_ingest
+from .filter_index import FilterIndex
+from .lexical_index import BM25Index
+from .quantization import QuantizedMatrix
+from .result_cache import QueryCache
+from .vector_storage import VectorStoreFiles, decode_vector, encode_vector
 
 LOGGER = logging.getLogger(__name__)
 
 _DATA_DIR = Path(__file__).resolve().parents[1] / "data"
-_STORE_PATH = _DATA_DIR / "vector_store.json"
+_STORE_PATH = _DATA_DIR / "vector_store"
 _SAMPLE_PATH = _DATA_DIR / "sample_products.json"
 
 
 @dataclass
 class VectorRecord:
     identifier: str
-    embedding: List[float]
     metadata: Dict[str, Any]
 
 
+# Fields that change on every capture without the product itself changing.
+_VOLATILE_FIELDS = frozenset({"updated_at"})
+
+
+def _digest(payload: Any) -> str:
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.blake2b(encoded.encode("utf-8"), digest_size=16).hexdigest()
+
+
+@dataclass
+class CatalogDelta:
+    """Differences between a crawled catalog and the store, as planned by ``plan_catalog``.
+
+    ``embed`` holds new products and products whose embedded text changed; ``update``
+    holds products where only other fields (price, stock, ...) changed.
+    """
+
+    added: int = 0
+    embed: List[Dict[str, Any]] = field(default_factory=list)
+    update: List[Dict[str, Any]] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    unchanged: int = 0
+
+    @property
+    def changed(self) -> int:
+        return len(self.embed) - self.added + len(self.update)
+
+    def is_empty(self) -> bool:
+        return not (self.embed or self.update or self.removed)
+
+    def counts(self) -> Dict[str, int]:
+        return {
+            "added": self.added,
+            "changed": self.changed,
+            "unchanged": self.unchanged,
+            "removed": len(self.removed),
+        }
+
+
+class EmbeddingMatrix:
+    """Contiguous float32 row storage that grows geometrically on append."""
+
+    quantized = False
+
+    def __init__(self, dimensions: int, capacity: int = 64) -> None:
+        self.dimensions = dimensions
+        self._data = np.zeros((capacity, dimensions), dtype=np.float32)
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def view(self) -> np.ndarray:
+        return self._data[: self._size]
+
+    @property
+    def nbytes(self) -> int:
+        return self.view.nbytes
+
+    def _reserve(self, size: int) -> None:
+        if size <= self._data.shape[0]:
+            return
+        capacity = max(size, self._data.shape[0] * 2)
+        grown = np.zeros((capacity, self.dimensions), dtype=np.float32)
+        grown[: self._size] = self._data[: self._size]
+        self._data = grown
+
+    def append(self, vector: Iterable[float]) -> int:
+        self._reserve(self._size + 1)
+        self._data[self._size] = np.asarray(vector, dtype=np.float32)
+        self._size += 1
+        return self._size - 1
+
+    def extend(self, vectors: np.ndarray) -> range:
+        """Append a block of rows and return the row numbers they occupy."""
+
+        start = self._size
+        self._reserve(start + len(vectors))
+        self._data[start : start + len(vectors)] = vectors
+        self._size += len(vectors)
+        return range(start, self._size)
+
+    def take(self, rows: np.ndarray) -> None:
+        """Keep only ``rows`` (in the given order), releasing the remaining capacity."""
+
+        self._data = np.ascontiguousarray(self._data[rows])
+        self._size = len(rows)
+
+    def assign(self, row: int, vector: Iterable[float]) -> None:
+        self._data[row] = np.asarray(vector, dtype=np.float32)
+
+    def clear(self) -> None:
+        self._data = np.zeros((64, self.dimensions), dtype=np.float32)
+        self._size = 0
+
+    def load(self, data: np.ndarray) -> None:
+        """Adopt ``data`` (typically a memory map) as the backing buffer without copying."""
+
+        self._data = data
+        self._size = len(data)
+
+    def rebase(self, data: np.ndarray) -> None:
+        """Nothing to do: this matrix already holds every row at full precision."""
+
+    def exact(self, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        return self.view if rows is None else self.view[rows]
+
+    def scores(
+        self, query: np.ndarray, rows: Optional[np.ndarray] = None, exact: bool = False
+    ) -> np.ndarray:
+        return self.exact(rows) @ query
+
+
+_TOKEN_PATTERN = re.compile(r"[\w-]+")
+
+
+@lru_cache(maxsize=65536)
+def _token_hash(token: str) -> int:
+    # crc32 is stable across processes, unlike the salted built-in ``hash()``.
+    return zlib.crc32(token.encode("utf-8"))
+
+
 class HashingVectorizer:
-    def __init__(self, dimensions: int = 256) -> None:
+    # Bump whenever tokenization or hashing changes so stored vectors get re-embedded.
+    version = "crc32-v1"
+
+    def __init__(self, dimensions: int = 256, cache_size: int = 1024) -> None:
         self.dimensions = dimensions
+        self._embed_query = lru_cache(maxsize=cache_size)(self._embed_readonly)
+
+    def _buckets(self, text: str) -> List[int]:
+        return [_token_hash(token) % self.dimensions for token in _TOKEN_PATTERN.findall(text.lower())]
 
     def embed(self, text: str) -> List[float]:
-        vector = [0.0] * self.dimensions
-        tokens = re.findall(r"[\w-]+", text.lower())
-        for token in tokens:
-            index = hash(token) % self.dimensions
-            vector[index] += 1.0
-        norm = math.sqrt(sum(value * value for value in vector))
-        if norm:
-            vector = [value / norm for value in vector]
+        return self.embed_batch([text])[0].tolist()
+
+    def embed_batch(self, texts: Iterable[str]) -> np.ndarray:
+        """Embed many documents into an L2-normalized ``(n, dimensions)`` float32 matrix."""
+
+        buckets = [self._buckets(text) for text in texts]
+        counts = np.fromiter((len(item) for item in buckets), dtype=np.intp, count=len(buckets))
+        flat = np.fromiter(
+            (bucket for item in buckets for bucket in item), dtype=np.intp, count=int(counts.sum())
+        )
+        rows = np.repeat(np.arange(len(buckets), dtype=np.intp), counts)
+        matrix = np.bincount(
+            rows * self.dimensions + flat, minlength=len(buckets) * self.dimensions
+        ).reshape(len(buckets), self.dimensions).astype(np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        np.divide(matrix, norms, out=matrix, where=norms > 0)
+        return matrix
+
+    def embed_query(self, text: str) -> np.ndarray:
+        """Embed a search query, memoizing repeated strings. The result is read-only."""
+
+        return self._embed_query(text)
+
+    def _embed_readonly(self, text: str) -> np.ndarray:
+        vector = self.embed_batch([text])[0]
+        vector.setflags(write=False)
         return vector
 
 
 class SimpleVectorStore:
-    def __init__(self, path: Path = _STORE_PATH, dimensions: int = 256) -> None:
+    # Fraction of tombstoned rows that triggers a compaction on ``persist``.
+    compaction_ratio = 0.25
+    # Journal entries tolerated before ``persist`` rewrites the snapshot instead of appending.
+    journal_limit = 5000
+    # Catalogs smaller than this are always searched exactly.
+    ann_min_rows = 20000
+    # Keyword queries fuse BM25 and vector rankings with reciprocal-rank fusion.
+    hybrid = True
+    fusion_depth = 50
+    rrf_k = 60
+    # With quantized embeddings, this many candidates per result are re-ranked exactly.
+    rerank_factor = 4
+    # ``iter_search`` ranks the tail of a keyword export this many rows per pass.
+    export_batch_rows = 4096
+
+    def __init__(
+        self, path: Path = _STORE_PATH, dimensions: int = 256, quantization: str = "int8"
+    ) -> None:
         self.path = path
+        self.files = VectorStoreFiles(path)
         self.vectorizer = HashingVectorizer(dimensions=dimensions)
         self.records: List[VectorRecord] = []
+        self.quantization = quantization
+        self.embeddings: Union[EmbeddingMatrix, QuantizedMatrix] = (
+            EmbeddingMatrix(dimensions)
+            if quantization == "float32"
+            else QuantizedMatrix(dimensions, quantization)
+        )
+        self.filters = FilterIndex()
+        self.ann = IVFIndex(dimensions)
+        self.lexical = BM25Index()
+        self.cache = QueryCache()
+        self.browse_index = BrowseIndex()
+        # Bumped on every write; cached search results from older generations are ignored.
+        self.generation = 0
+        self._rows: Dict[str, int] = {}
+        self._tombstones: Set[int] = set()
+        self._pending: List[Dict[str, Any]] = []
+        self._journal_entries = 0
+        # On-disk state this instance reflects, used to pick up other workers' writes.
+        self._snapshot_signature: Optional[Tuple[int, int, int]] = None
+        self._journal_offset = 0
+        # Sequence number of the snapshot this instance was loaded from or last wrote.
+        self._sequence = 0
+        self._locked = False
+        # sku -> (metadata it was computed from, (content hash, embedded-text hash)).
+        self._fingerprints: Dict[str, Tuple[Dict[str, Any], Tuple[str, str]]] = {}
         self._load()
 
+    def _reset(self) -> None:
+        self.generation += 1
+        self.records = []
+        self.embeddings.clear()
+        self.filters.clear()
+        self.ann.reset()
+        self.lexical.clear()
+        self._rows = {}
+        self._tombstones = set()
+        self._pending = []
+        self._journal_entries = 0
+        self._snapshot_signature = None
+        self._journal_offset = 0
+        self._sequence = 0
+        self._fingerprints = {}
+
+    @contextmanager
+    def _exclusive(self) -> Iterator[None]:
+        """Hold the cross-process writer lock; re-entrant within this instance."""
+
+        if self._locked:
+            yield
+            return
+        with self.files.lock():
+            self._locked = True
+            try:
+                yield
+            finally:
+                self._locked = False
+
     def _load(self) -> None:
-        if not self.path.exists():
-            self.records = []
+        self._reset()
+        if self.files.exists():
+            # A snapshot that cannot be read is an error, never an empty catalog: treating
+            # it as empty would let the next write replace the real one.
+            self._load_snapshot()
             return
-        try:
-            with self.path.open("r", encoding="utf-8") as handle:
-                payload = json.load(handle)
-        except json.JSONDecodeError as exc:  # pragma: no cover - defensive
-            LOGGER.error("Failed to load vector store: %s", exc)
-            payload = []
-        self.records = [
-            VectorRecord(
-                identifier=item["identifier"],
-                embedding=item["embedding"],
-                metadata=item["metadata"],
+
+        legacy = self.files.read_legacy()
+        if legacy is None:
+            return
+        LOGGER.info("Migrating %d records from %s", len(legacy), self.files.legacy_path)
+        # Legacy vectors were bucketed with the salted built-in hash, so they are re-embedded.
+        metadata = [item["metadata"] for item in legacy]
+        self._apply_upserts(metadata, self.embed_metadata(metadata))
+        with self._exclusive():
+            self._write_snapshot()
+            self.files.retire_legacy()
+
+    def embed_metadata(self, items: Iterable[Dict[str, Any]]) -> np.ndarray:
+        """Embed products the way ``upsert_many`` would, without writing them."""
+
+        return self.vectorizer.embed_batch(self._build_corpus(metadata) for metadata in items)
+
+    def _reembed(self) -> None:
+        """Recompute every stored vector with the current vectorizer."""
+
+        self.compact()
+        self.ann.reset()
+        if self.records:
+            self.embeddings.load(self.embed_metadata(record.metadata for record in self.records))
+
+    def _load_snapshot(self) -> None:
+        # Taken before reading so a snapshot published mid-load is still detected later.
+        self._snapshot_signature = self.files.snapshot_signature()
+        header, records, embeddings, arrays = self.files.read_snapshot()
+        self._sequence = int(header.get("sequence", 0))
+        if embeddings.ndim != 2 or embeddings.shape[1] != self.embeddings.dimensions:
+            raise ValueError(f"Snapshot embeddings have shape {embeddings.shape}")
+        if records:
+            self.embeddings.load(embeddings)
+        for row, (identifier, metadata) in enumerate(records):
+            self.records.append(VectorRecord(identifier=identifier, metadata=metadata))
+            self.filters.add(row, metadata)
+            self.lexical.add(row, self._build_corpus(metadata))
+            self._rows[identifier] = row
+        ann_state = arrays.get("ivf")
+        if ann_state is not None and len(ann_state["assignments"]) >= len(records):
+            self.ann.load_state(
+                ann_state["centroids"],
+                ann_state["assignments"][: len(records)],
+                int(ann_state["built_size"]),
             )
-            for item in payload
-        ]
 
-    def persist(self) -> None:
-        self.path.parent.mkdir(parents=True, exist_ok=True)
-        with self.path.open("w", encoding="utf-8") as handle:
-            json.dump(
-                [
-                    {
-                        "identifier": record.identifier,
-                        "embedding": record.embedding,
-                        "metadata": record.metadata,
-                    }
-                    for record in self.records
-                ],
-                handle,
-                ensure_ascii=False,
-                indent=2,
+        self._follow_journal()
+
+        if header.get("vectorizer") != self.vectorizer.version:
+            LOGGER.info(
+                "Vectorizer changed from %s to %s; re-embedding %d records",
+                header.get("vectorizer"),
+                self.vectorizer.version,
+                len(self),
             )
+            self._reembed()
+            with self._exclusive():
+                self._write_snapshot()
+
+    def _replay(self, entries: Iterable[Dict[str, Any]]) -> int:
+        applied = 0
+        for entry in entries:
+            if entry.get("op") == "upsert":
+                vector = decode_vector(entry["embedding"])
+                self._apply_upserts([entry["metadata"]], vector[np.newaxis, :])
+            elif entry.get("op") == "update":
+                self._apply_updates([entry["metadata"]])
+            elif entry.get("op") == "delete":
+                self._tombstone(entry["identifier"])
+            applied += 1
+        return applied
+
+    def _follow_journal(self) -> int:
+        entries, self._journal_offset = self.files.read_journal(self._journal_offset)
+        # Entries written against an older snapshot are already part of the loaded one.
+        applied = self._replay(
+            entry for entry in entries if entry.get("seq", 0) == self._sequence
+        )
+        self._journal_entries += applied
+        return applied
+
+    def snapshot_changed(self) -> bool:
+        """Whether another process has published a snapshot newer than the one loaded."""
+
+        return self.files.snapshot_signature() != self._snapshot_signature
+
+    def is_stale(self) -> bool:
+        """Whether another process wrote a snapshot or journal entries this instance lacks.
+
+        Cheap enough to call per request: two ``stat`` calls.
+        """
+
+        return self.snapshot_changed() or self.files.journal_size() > self._journal_offset
+
+    def fork(self) -> "SimpleVectorStore":
+        """Return an independent copy of the published state to build the next version on.
+
+        Unsaved writes are persisted first. The copy loads the snapshot from disk, so it
+        shares the mapped embedding pages with this instance until it modifies a row, and
+        nothing done to it is visible to readers of this instance.
+        """
+
+        if self._pending:
+            self.persist()
+        return SimpleVectorStore(
+            path=self.path, dimensions=self.embeddings.dimensions, quantization=self.quantization
+        )
+
+    def _catch_up(self) -> None:
+        """Bring this instance up to date with the disk before writing (lock held)."""
+
+        pending = self._pending
+        if self.snapshot_changed():
+            LOGGER.info("Reloading vector store: another worker published a new snapshot")
+            self._load()
+        else:
+            self._follow_journal()
+        # Re-apply our own unsaved writes so they land after everything already on disk.
+        self._replay(pending)
+        self._pending = pending
+
+    def persist(self) -> None:
+        self.generation += 1
+        with self._exclusive():
+            self._catch_up()
+            if len(self._tombstones) > len(self.records) * self.compaction_ratio:
+                self.compact()
+            journal_entries = self._journal_entries + len(self._pending)
+            if (
+                not self.files.exists()
+                or self._ann_stale()
+                or journal_entries > max(self.journal_limit, len(self) * self.compaction_ratio)
+            ):
+                self._write_snapshot()
+            elif self._pending:
+                self._journal_entries += self.files.append_journal(
+                    self._pending, self._sequence
+                )
+                self._journal_offset = self.files.journal_size()
+            self._pending = []
+
+    def _write_snapshot(self) -> None:
+        self.compact()
+        if self._ann_stale():
+            self.build_ann()
+        sequence = self._sequence + 1
+        self.files.write_snapshot(
+            {
+                "dimensions": self.embeddings.dimensions,
+                "vectorizer": self.vectorizer.version,
+                "sequence": sequence,
+            },
+            ((record.identifier, record.metadata) for record in self.records),
+            self.embeddings.exact(),
+            {"ivf": self.ann.state()},
+        )
+        if self.embeddings.quantized and self.records:
+            # Serve exact re-ranking from the new file and drop the in-memory overlay.
+            self.embeddings.rebase(self.files.map_embeddings())
+        self._pending = []
+        self._journal_entries = 0
+        self._journal_offset = 0
+        self._sequence = sequence
+        self._snapshot_signature = self.files.snapshot_signature()
+
+    def _ann_stale(self) -> bool:
+        """Whether the catalog is large enough for ANN and the index is missing or outgrown."""
+
+        size = len(self)
+        if size < self.ann_min_rows:
+            return False
+        return not self.ann.ready or size > 2 * self.ann.built_size or 2 * size < self.ann.built_size
+
+    def build_ann(self) -> None:
+        """(Re)train the IVF index over the live rows."""
+
+        self.compact()
+        self.ann.build(self.embeddings.exact(), np.arange(len(self.records), dtype=np.intp))
+        LOGGER.info("Built IVF index with %d lists over %d records", self.ann.nlist, len(self))
+
+    def __len__(self) -> int:
+        return len(self._rows)
 
     def is_empty(self) -> bool:
-        return not self.records
+        return not self._rows
 
     def upsert(self, metadata: Dict[str, Any]) -> None:
-        identifier = metadata["sku"]
-        embedding = self.vectorizer.embed(self._build_corpus(metadata))
-        payload = VectorRecord(identifier=identifier, embedding=embedding, metadata=metadata)
-
-        for index, record in enumerate(self.records):
-            if record.identifier == identifier:
-                self.records[index] = payload
-                break
-        else:
-            self.records.append(payload)
+        self.upsert_many([metadata])
+
+    def upsert_many(
+        self, items: Iterable[Dict[str, Any]], embeddings: Optional[np.ndarray] = None
+    ) -> int:
+        """Embed and write a batch of products in one pass, returning how many were written.
+
+        ``embeddings`` may carry vectors already computed with ``embed_metadata``.
+        """
+
+        batch = list(items)
+        if not batch:
+            return 0
+        if embeddings is None:
+            embeddings = self.embed_metadata(batch)
+        self._apply_upserts(batch, embeddings)
+        self._pending.extend(
+            {
+                "op": "upsert",
+                "identifier": metadata["sku"],
+                "metadata": metadata,
+                "embedding": encode_vector(embedding),
+            }
+            for metadata, embedding in zip(batch, embeddings)
+        )
+        return len(batch)
+
+    def update_metadata(self, items: Iterable[Dict[str, Any]]) -> int:
+        """Replace the metadata of existing products whose embedded text is unchanged.
+
+        Nothing is re-embedded; the caller guarantees ``_build_corpus`` yields the same text.
+        """
+
+        batch = [metadata for metadata in items if metadata["sku"] in self._rows]
+        if not batch:
+            return 0
+        self._apply_updates(batch)
+        self._pending.extend(
+            {"op": "update", "identifier": metadata["sku"], "metadata": metadata} for metadata in batch
+        )
+        return len(batch)
+
+    def _apply_updates(self, batch: List[Dict[str, Any]]) -> None:
+        self.generation += 1
+        for metadata in batch:
+            identifier = metadata["sku"]
+            row = self._rows.get(identifier)
+            if row is None:
+                continue
+            self.filters.remove(row, self.records[row].metadata)
+            self.records[row] = VectorRecord(identifier=identifier, metadata=metadata)
+            self.filters.add(row, metadata)
+
+    def _fingerprint(self, metadata: Dict[str, Any]) -> Tuple[str, str]:
+        content = {key: value for key, value in metadata.items() if key not in _VOLATILE_FIELDS}
+        return _digest(content), _digest(self._build_corpus(metadata))
+
+    def _stored_fingerprint(self, identifier: str) -> Tuple[str, str]:
+        metadata = self.records[self._rows[identifier]].metadata
+        cached = self._fingerprints.get(identifier)
+        if cached is not None and cached[0] is metadata:
+            return cached[1]
+        fingerprint = self._fingerprint(metadata)
+        self._fingerprints[identifier] = (metadata, fingerprint)
+        return fingerprint
+
+    def plan_catalog(
+        self, items: Iterable[Dict[str, Any]], vendors: Optional[Iterable[str]] = None
+    ) -> CatalogDelta:
+        """Compare a crawled catalog against the store without modifying it.
+
+        Products are matched by SKU and compared by content hash, ignoring volatile fields
+        such as ``updated_at``. Stored products of the given ``vendors`` that are missing
+        from ``items`` are planned for removal; pass only vendors that crawled successfully.
+        """
+
+        delta = CatalogDelta()
+        latest: Dict[str, Dict[str, Any]] = {}
+        for metadata in items:
+            latest[metadata["sku"]] = metadata
+        for identifier, metadata in latest.items():
+            if identifier not in self._rows:
+                delta.added += 1
+                delta.embed.append(metadata)
+                continue
+            content, text = self._fingerprint(metadata)
+            stored_content, stored_text = self._stored_fingerprint(identifier)
+            if content == stored_content:
+                delta.unchanged += 1
+            elif text == stored_text:
+                delta.update.append(metadata)
+            else:
+                delta.embed.append(metadata)
+
+        delta.removed = self.unlisted(latest, vendors or ())
+        return delta
+
+    def unlisted(self, listed: Collection[str], vendors: Iterable[str]) -> List[str]:
+        """SKUs stored for ``vendors`` that are not in ``listed``."""
+
+        scope = set(vendors)
+        if not scope:
+            return []
+        return [
+            identifier
+            for identifier, row in self._rows.items()
+            if identifier not in listed and self.records[row].metadata.get("vendor") in scope
+        ]
+
+    def apply_catalog(self, delta: CatalogDelta) -> None:
+        """Write a planned delta: embed new or re-worded products, patch the rest."""
+
+        self.upsert_many(delta.embed)
+        self.update_metadata(delta.update)
+        for identifier in delta.removed:
+            self.delete(identifier)
+
+    def _apply_upserts(self, batch: List[Dict[str, Any]], embeddings: np.ndarray) -> None:
+        self.generation += 1
+        appended: List[int] = []
+        replaced: Dict[int, int] = {}
+        for position, metadata in enumerate(batch):
+            identifier = metadata["sku"]
+            row = self._rows.get(identifier)
+            if row is None:
+                appended.append(position)
+                # Reserve the row now so duplicates later in the batch overwrite it.
+                self._rows[identifier] = len(self.records) + len(appended) - 1
+                continue
+            if row >= len(self.records):
+                appended[row - len(self.records)] = position
+                continue
+            self.filters.remove(row, self.records[row].metadata)
+            self.records[row] = VectorRecord(identifier=identifier, metadata=metadata)
+            self.embeddings.assign(row, embeddings[position])
+            self.filters.add(row, metadata)
+            self.lexical.add(row, self._build_corpus(metadata))
+            replaced[row] = position
+
+        if appended:
+            rows = self.embeddings.extend(embeddings[appended])
+            for row, position in zip(rows, appended):
+                metadata = batch[position]
+                self.records.append(VectorRecord(identifier=metadata["sku"], metadata=metadata))
+                self.filters.add(row, metadata)
+                self.lexical.add(row, self._build_corpus(metadata))
+                replaced[row] = position
+
+        if self.ann.ready and replaced:
+            self.ann.assign(np.fromiter(replaced, dtype=np.intp), embeddings[list(replaced.values())])
+
+    def delete(self, identifier: str) -> bool:
+        """Tombstone the row for ``identifier``; storage is reclaimed by ``compact``."""
+
+        if not self._tombstone(identifier):
+            return False
+        self._pending.append({"op": "delete", "identifier": identifier})
+        return True
+
+    def _tombstone(self, identifier: str) -> bool:
+        row = self._rows.pop(identifier, None)
+        if row is None:
+            return False
+        self.generation += 1
+        self.filters.remove(row, self.records[row].metadata)
+        self.ann.discard(row)
+        self.lexical.remove(row)
+        self._tombstones.add(row)
+        return True
+
+    def compact(self) -> None:
+        """Drop tombstoned rows and renumber the survivors."""
+
+        if not self._tombstones:
+            return
+        live = np.asarray(
+            [row for row in range(len(self.records)) if row not in self._tombstones], dtype=np.intp
+        )
+        records = [self.records[row] for row in live]
+        self.embeddings.take(live)
+        self.ann.take(live)
+        self.lexical.take(live.tolist())
+        self.records = records
+        self._tombstones = set()
+        self.filters.clear()
+        self._rows = {}
+        for row, record in enumerate(records):
+            self.filters.add(row, record.metadata)
+            self._rows[record.identifier] = row
 
     def _build_corpus(self, metadata: Dict[str, Any]) -> str:
         specs = metadata.get("specs", {})
@@ -120,69 +702,457 @@ class SimpleVectorStore:
         min_price: Optional[float] = None,
         max_price: Optional[float] = None,
         tags: Optional[List[str]] = None,
+        nprobe: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """Rank products by similarity to ``query`` and apply the optional filters.
+
+        Keyword queries are ranked by both the vector index and BM25 and the two lists
+        are merged with reciprocal-rank fusion. ``nprobe`` sets how many IVF lists to
+        visit once the catalog is large enough for approximate search; larger values
+        improve recall at the cost of latency. Results are served from ``cache`` until
+        the store's generation changes.
+        """
+
+        key = (
+            " ".join((query or "").lower().split()),
+            (category or "").lower(),
+            min_price,
+            max_price,
+            tuple(sorted(set(tag.lower() for tag in (tags or [])))),
+            top_k,
+            nprobe,
+        )
+        generation = self.generation
+        cached = self.cache.get(key, generation)
+        if cached is None:
+            cached = self._search(query, top_k, category, min_price, max_price, tags, nprobe)
+            self.cache.put(key, generation, cached)
+        return [hit.copy() for hit in cached]
+
+    def _search(
+        self,
+        query: Optional[str],
+        top_k: int,
+        category: Optional[str],
+        min_price: Optional[float],
+        max_price: Optional[float],
+        tags: Optional[List[str]],
+        nprobe: Optional[int],
     ) -> List[Dict[str, Any]]:
-        if not self.records:
+        if not self._rows:
             return []
 
         if query:
-            query_vector = self.vectorizer.embed(query)
+            query_vector = self.vectorizer.embed_query(query)
         else:
             uniform_value = 1.0 / math.sqrt(self.vectorizer.dimensions)
-            query_vector = [uniform_value] * self.vectorizer.dimensions
+            query_vector = np.full(self.vectorizer.dimensions, uniform_value, dtype=np.float32)
 
-        scored: List[tuple[float, VectorRecord]] = []
-        for record in self.records:
-            score = sum(q * v for q, v in zip(query_vector, record.embedding))
-            scored.append((float(score), record))
-        scored.sort(key=lambda item: item[0], reverse=True)
+        requested_tags = set(tag.lower() for tag in (tags or []))
+        filters = (category, min_price, max_price, requested_tags)
+        if not (query and self.hybrid):
+            ranked = self._vector_rank(query_vector, top_k, filters, nprobe)
+            return [self._hit(row, score) for row, score in ranked]
+
+        depth = max(top_k, self.fusion_depth)
+        ranked = self._vector_rank(query_vector, depth, filters, nprobe)
+        lexical = self.lexical.search(query, depth, allowed=self._allowed_mask(filters))
+        return self._fuse(query_vector, ranked, lexical, top_k)
+
+    def _vector_rank(
+        self,
+        query_vector: np.ndarray,
+        top_k: int,
+        filters: tuple,
+        nprobe: Optional[int],
+    ) -> List[Tuple[int, float]]:
+        category, min_price, max_price, requested_tags = filters
+        candidates = self.filters.candidates(
+            len(self._rows),
+            category=category,
+            min_price=min_price,
+            max_price=max_price,
+            tags=requested_tags,
+        )
+        if candidates is not None:
+            # Selective filters: score only the rows the secondary indexes let through.
+            candidate_scores = self.embeddings.scores(query_vector, candidates)
+            depth = self._depth(top_k)
+            ranked = [
+                (int(candidates[position]), float(candidate_scores[position]))
+                for position in self._top_rows(candidate_scores, depth)[:depth]
+            ]
+            return self._rerank(query_vector, ranked, top_k)
+
+        if self.ann.ready and len(self) >= self.ann_min_rows:
+            probes = nprobe or self.ann.default_nprobe
+            while probes < self.ann.nlist:
+                results = self._scan(query_vector, top_k, self.ann.probe(query_vector, probes), filters)
+                if len(results) >= top_k:
+                    return results
+                # Too few survivors in the probed lists; widen the search.
+                probes *= 2
+        return self._scan(query_vector, top_k, None, filters)
+
+    def _allowed_mask(self, filters: tuple) -> Optional[np.ndarray]:
+        category, min_price, max_price, requested_tags = filters
+        rows = self.filters.candidates(
+            len(self._rows),
+            category=category,
+            min_price=min_price,
+            max_price=max_price,
+            tags=requested_tags,
+            plan=False,
+        )
+        if rows is None:
+            return None
+        mask = np.zeros(len(self.records), dtype=bool)
+        mask[rows] = True
+        return mask
+
+    def _fuse(
+        self,
+        query_vector: np.ndarray,
+        ranked: List[Tuple[int, float]],
+        lexical: List[Tuple[int, float]],
+        top_k: int,
+    ) -> List[Dict[str, Any]]:
+        """Merge the vector and BM25 rankings with reciprocal-rank fusion."""
+
+        fused: Dict[int, float] = {}
+        for ranking in (ranked, lexical):
+            for rank, (row, _) in enumerate(ranking, start=1):
+                fused[row] = fused.get(row, 0.0) + 1.0 / (self.rrf_k + rank)
+        similarities = dict(ranked)
+        lexical_scores = dict(lexical)
 
         results: List[Dict[str, Any]] = []
+        for row in sorted(fused, key=lambda item: (-fused[item], item))[:top_k]:
+            similarity = similarities.get(row)
+            if similarity is None:
+                similarity = float(self.embeddings.exact(np.asarray([row]))[0] @ query_vector)
+            hit = self._hit(row, similarity)
+            hit["lexical_score"] = lexical_scores.get(row, 0.0)
+            hit["relevance"] = fused[row]
+            results.append(hit)
+        return results
+
+    def _scan(
+        self,
+        query_vector: np.ndarray,
+        top_k: int,
+        rows: Optional[np.ndarray],
+        filters: tuple,
+    ) -> List[Tuple[int, float]]:
+        """Rank ``rows`` (every row when ``None``) and filter them lazily in score order."""
+
+        category, min_price, max_price, requested_tags = filters
+        scores = self.embeddings.scores(query_vector, rows)
+        wanted = self._depth(top_k)
+        results: List[Tuple[int, float]] = []
+        seen = 0
+        limit = wanted
+        while len(results) < wanted and seen < len(scores):
+            # Widen the partial selection until enough rows survive the filters.
+            for position in self._top_rows(scores, limit)[seen:]:
+                seen += 1
+                row = int(position) if rows is None else int(rows[position])
+                if row in self._tombstones:
+                    continue
+                metadata = self.records[row].metadata
+                if not self._matches(metadata, category, min_price, max_price, requested_tags):
+                    continue
+                results.append((row, float(scores[position])))
+                if len(results) >= wanted:
+                    break
+            limit *= 2
+
+        return self._rerank(query_vector, results, top_k)
+
+    def _depth(self, top_k: int) -> int:
+        """Candidates to collect for ``top_k`` results: extra ones when scores are approximate."""
+
+        return top_k * self.rerank_factor if self.embeddings.quantized else top_k
+
+    def _rerank(
+        self, query_vector: np.ndarray, ranked: List[Tuple[int, float]], top_k: int
+    ) -> List[Tuple[int, float]]:
+        """Re-score quantized candidates at full precision and keep the best ``top_k``."""
+
+        if not self.embeddings.quantized or not ranked:
+            return ranked[:top_k]
+        rows = np.fromiter((row for row, _ in ranked), dtype=np.intp, count=len(ranked))
+        exact = self.embeddings.scores(query_vector, rows, exact=True)
+        order = np.lexsort((rows, -exact))[:top_k]
+        return [(int(rows[position]), float(exact[position])) for position in order.tolist()]
+
+    def browse(
+        self,
+        *,
+        sort: str = "updated_at",
+        cursor: Optional[str] = None,
+        limit: int = 10,
+        category: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        tags: Optional[List[str]] = None,
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Page through products in a precomputed sort order without scoring them.
+
+        Returns the page and an opaque cursor for the next one (``None`` on the last page).
+        Raises ``InvalidCursorError`` for cursors that do not belong to ``sort``.
+        """
+
+        if not self._rows:
+            return [], None
+        view = self.browse_index.view(sort, self.generation, self._browse_source, len(self.records))
+        start = 0 if cursor is None else view.seek(*decode_cursor(cursor, sort))
+
         requested_tags = set(tag.lower() for tag in (tags or []))
+        candidates = self.filters.candidates(
+            len(self._rows),
+            category=category,
+            min_price=min_price,
+            max_price=max_price,
+            tags=requested_tags,
+        )
+        positions = self.browse_index.page(
+            view,
+            start,
+            limit,
+            candidates,
+            lambda row: self._matches(
+                self.records[row].metadata, category, min_price, max_price, requested_tags
+            ),
+        )
+        page = positions[:limit]
+        items = [self.records[int(view.rows[position])].metadata.copy() for position in page]
+        next_cursor = None
+        if len(positions) > limit and page:
+            last = page[-1]
+            next_cursor = encode_cursor(sort, float(view.keys[last]), view.identifiers[last])
+        return items, next_cursor
 
-        for score, record in scored:
-            if len(results) >= top_k:
-                break
-            metadata = record.metadata
-            if category and metadata.get("category", "").lower() != category.lower():
-                continue
-            price = float(metadata.get("price", 0))
-            if min_price is not None and price < min_price:
-                continue
-            if max_price is not None and price > max_price:
+    def iter_search(
+        self,
+        query: Optional[str],
+        *,
+        category: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        tags: Optional[List[str]] = None,
+        sort: str = "updated_at",
+    ) -> Iterator[Dict[str, Any]]:
+        """Yield every matching product in rank order without building the full result list.
+
+        Keyword queries start with the fused ``search`` head and continue in vector-score
+        order; keyword-less queries follow the browse view for ``sort``.
+        """
+
+        if not self._rows:
+            return
+        requested_tags = set(tag.lower() for tag in (tags or []))
+        records = self.records
+
+        if not (query and query.strip()):
+            view = self.browse_index.view(sort, self.generation, self._browse_source, len(records))
+            candidates = self.filters.candidates(
+                len(self._rows),
+                category=category,
+                min_price=min_price,
+                max_price=max_price,
+                tags=requested_tags,
+            )
+            if candidates is not None:
+                positions = view.positions[candidates]
+                # Rows outside the view (deleted ones) map to -1, which would index the end.
+                for position in np.sort(positions[positions >= 0]).tolist():
+                    yield records[int(view.rows[position])].metadata.copy()
+                return
+            for row in view.rows.tolist():
+                metadata = records[row].metadata
+                if self._matches(metadata, category, min_price, max_price, requested_tags):
+                    yield metadata.copy()
+            return
+
+        head = self.search(
+            query,
+            top_k=self.fusion_depth,
+            category=category,
+            min_price=min_price,
+            max_price=max_price,
+            tags=tags,
+        )
+        emitted = {hit["sku"] for hit in head}
+        yield from head
+
+        rows = self.filters.candidates(
+            len(self._rows),
+            category=category,
+            min_price=min_price,
+            max_price=max_price,
+            tags=requested_tags,
+            plan=False,
+        )
+        if rows is None:
+            rows = np.fromiter(sorted(self._rows.values()), dtype=np.intp, count=len(self._rows))
+        for row, score in self._ranked_rows(self.vectorizer.embed_query(query), rows):
+            if records[row].identifier in emitted:
                 continue
-            if requested_tags:
-                product_tags = set(
-                    str(tag).lower()
-                    for tag in metadata.get("specs", {}).get("scene_tags", [])
-                )
-                if not requested_tags.issubset(product_tags):
-                    continue
-            enriched = metadata.copy()
-            enriched["similarity"] = score
-            results.append(enriched)
+            hit = records[row].metadata.copy()
+            hit["similarity"] = score
+            yield hit
 
-        return results
+    def _ranked_rows(
+        self, query_vector: np.ndarray, rows: Optional[np.ndarray]
+    ) -> Iterator[Tuple[int, float]]:
+        """Yield live ``rows`` (every row when ``None``) by descending exact score.
+
+        Each pass scores the rows a chunk at a time and keeps only the best
+        ``export_batch_rows`` ranked after the last row yielded, so memory is bounded by
+        the batch rather than the catalog at the cost of one scan per batch. Chunks are
+        the same on every pass, so a row's score, and thus its place, never changes.
+        """
+
+        batch = self.export_batch_rows
+        total = len(self.records) if rows is None else len(rows)
+        dead = np.fromiter(self._tombstones, dtype=np.intp, count=len(self._tombstones))
+        last: Optional[Tuple[np.float32, int]] = None
+        while True:
+            best_rows = np.empty(0, dtype=np.intp)
+            best_scores = np.empty(0, dtype=np.float32)
+            for start in range(0, total, batch):
+                if rows is None:
+                    chunk = np.arange(start, min(total, start + batch), dtype=np.intp)
+                else:
+                    chunk = rows[start : start + batch]
+                scores = self.embeddings.scores(query_vector, chunk, exact=True)
+                keep = ~np.isin(chunk, dead)
+                if last is not None:
+                    keep &= (scores < last[0]) | ((scores == last[0]) & (chunk > last[1]))
+                best_rows = np.concatenate((best_rows, chunk[keep]))
+                best_scores = np.concatenate((best_scores, scores[keep]))
+                if len(best_rows) > batch:
+                    order = np.lexsort((best_rows, -best_scores))[:batch]
+                    best_rows, best_scores = best_rows[order], best_scores[order]
+            order = np.lexsort((best_rows, -best_scores))
+            for position in order.tolist():
+                yield int(best_rows[position]), float(best_scores[position])
+            if len(order) < batch:
+                return
+            last = (best_scores[order[-1]], int(best_rows[order[-1]]))
+
+    def _browse_source(self) -> Tuple[np.ndarray, List[str], List[Dict[str, Any]]]:
+        rows = np.fromiter(sorted(self._rows.values()), dtype=np.intp, count=len(self._rows))
+        records = [self.records[row] for row in rows.tolist()]
+        return rows, [record.identifier for record in records], [record.metadata for record in records]
+
+    def _hit(self, row: int, score: float) -> Dict[str, Any]:
+        enriched = self.records[row].metadata.copy()
+        enriched["similarity"] = score
+        return enriched
+
+    @staticmethod
+    def _top_rows(scores: np.ndarray, limit: int) -> np.ndarray:
+        """Return the best ``limit`` rows by descending score, ties kept in insertion order."""
+
+        if limit <= 0:
+            return np.empty(0, dtype=np.intp)
+        if limit < len(scores):
+            threshold = scores[np.argpartition(-scores, limit - 1)[limit - 1]]
+            candidates = np.flatnonzero(scores >= threshold)
+        else:
+            candidates = np.arange(len(scores))
+        order = np.lexsort((candidates, -scores[candidates]))
+        return candidates[order]
+
+    @staticmethod
+    def _matches(
+        metadata: Dict[str, Any],
+        category: Optional[str],
+        min_price: Optional[float],
+        max_price: Optional[float],
+        requested_tags: set,
+    ) -> bool:
+        if category and metadata.get("category", "").lower() != category.lower():
+            return False
+        price = float(metadata.get("price", 0))
+        if min_price is not None and price < min_price:
+            return False
+        if max_price is not None and price > max_price:
+            return False
+        if requested_tags:
+            product_tags = set(
+                str(tag).lower() for tag in metadata.get("specs", {}).get("scene_tags", [])
+            )
+            if not requested_tags.issubset(product_tags):
+                return False
+        return True
 
     def all(self) -> List[Dict[str, Any]]:
-        return [record.metadata.copy() for record in self.records]
+        return [
+            record.metadata.copy()
+            for row, record in enumerate(self.records)
+            if row not in self._tombstones
+        ]
 
 
 def _load_samples() -> List[Dict[str, Any]]:
-    if not _SAMPLE_PATH.exists():
-        return []
-    with _SAMPLE_PATH.open("r", encoding="utf-8") as handle:
-        return json.load(handle)
+    # Copies, because the store keeps the dicts it ingests and the source cache is shared.
+    return [dict(record) for record in get_source_cache().records(_SAMPLE_PATH)]
 
 
 _store_instance: Optional[SimpleVectorStore] = None
+_store_lock = threading.Lock()
+# The published store a background reload is queued for, if any.
+_reloading: Optional[SimpleVectorStore] = None
 
 
-def get_vector_store() -> SimpleVectorStore:
+def publish_vector_store(store: SimpleVectorStore) -> None:
+    """Hand ``store`` to new requests; requests already holding the old one keep it."""
+
     global _store_instance
-    if _store_instance is None:
-        _store_instance = SimpleVectorStore(path=_STORE_PATH)
-        if _store_instance.is_empty():
-            for item in _load_samples():
-                _store_instance.upsert(item)
-            _store_instance.persist()
-    return _store_instance
+    with _store_lock:
+        _store_instance = store
+
+
+def _reload(stale: SimpleVectorStore) -> None:
+    """Load the state another worker wrote into a new instance, and publish it."""
+
+    global _store_instance, _reloading
+    try:
+        with _store_lock:
+            current = _store_instance
+        # A refresh in this process may have published the new state in the meantime.
+        if current is not stale or not stale.is_stale():
+            return
+        try:
+            fresh = stale.fork()
+        except (OSError, ValueError) as exc:
+            LOGGER.error("Keeping the loaded vector store; reload failed: %s", exc)
+            return
+        with _store_lock:
+            if _store_instance is stale:
+                _store_instance = fresh
+    finally:
+        with _store_lock:
+            _reloading = None
+
+
+def get_vector_store() -> SimpleVectorStore:
+    global _store_instance, _reloading
+    with _store_lock:
+        store = _store_instance
+        if store is None:
+            store = SimpleVectorStore(path=_STORE_PATH)
+            if store.is_empty() and not store.files.exists():
+                store.upsert_many(_load_samples())
+                store.persist()
+            _store_instance = store
+        elif _reloading is None and store.is_stale():
+            # Another worker wrote. Keep serving this instance while a new one loads on the
+            # ingest thread; refreshes run there too and publish before it gets its turn,
+            # so a snapshot this process wrote itself is never loaded a second time.
+            _reloading = store
+            submit_ingest(_reload, store)
+    return store
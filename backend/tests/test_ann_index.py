@@ -0,0 +1,134 @@
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pytest
+
+from app.services.ann_index import IVFIndex
+from app.services.vector_store import SimpleVectorStore
+
+TOP_K = 10
+
+
+def _normalized(vectors: np.ndarray) -> np.ndarray:
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+@pytest.fixture(scope="module")
+def vectors() -> np.ndarray:
+    # Clustered like real embeddings: 5000 rows around 60 random centres in 32 dimensions.
+    rng = np.random.default_rng(3)
+    centres = rng.normal(size=(60, 32))
+    labels = rng.integers(0, len(centres), size=5000)
+    return _normalized(centres[labels] + 0.6 * rng.normal(size=(5000, 32)))
+
+
+@pytest.fixture(scope="module")
+def queries(vectors: np.ndarray) -> np.ndarray:
+    rng = np.random.default_rng(4)
+    picked = vectors[rng.choice(len(vectors), size=100, replace=False)]
+    return _normalized(picked + 0.3 * rng.normal(size=picked.shape))
+
+
+@pytest.fixture(scope="module")
+def index(vectors: np.ndarray) -> IVFIndex:
+    index = IVFIndex(vectors.shape[1])
+    index.build(vectors, np.arange(len(vectors), dtype=np.intp))
+    return index
+
+
+def _top(vectors: np.ndarray, query: np.ndarray, rows: Any = None) -> set:
+    rows = np.arange(len(vectors)) if rows is None else rows
+    scores = vectors[rows] @ query
+    return set(rows[np.argsort(-scores, kind="stable")[:TOP_K]].tolist())
+
+
+def _recall(index: IVFIndex, vectors: np.ndarray, queries: np.ndarray, nprobe: int) -> float:
+    found = 0
+    for query in queries:
+        found += len(_top(vectors, query, index.probe(query, nprobe)) & _top(vectors, query))
+    return found / (TOP_K * len(queries))
+
+
+def test_recall_against_brute_force_grows_with_nprobe(
+    index: IVFIndex, vectors: np.ndarray, queries: np.ndarray
+) -> None:
+    assert index.nlist == int(np.sqrt(len(vectors)))
+
+    recalls = [_recall(index, vectors, queries, nprobe) for nprobe in (1, 4, 16)]
+
+    assert recalls == sorted(recalls)
+    assert recalls[-1] >= 0.95
+    assert _recall(index, vectors, queries, index.default_nprobe) >= 0.95
+    # Probing every list is an exact scan.
+    assert _recall(index, vectors, queries, index.nlist) == 1.0
+
+
+def test_every_row_is_filed_exactly_once(index: IVFIndex, vectors: np.ndarray) -> None:
+    rows = index.probe(vectors[0], index.nlist)
+
+    assert rows.tolist() == list(range(len(vectors)))
+
+
+def _catalog(count: int) -> list:
+    return [
+        {
+            "sku": f"s{index}",
+            "name": f"part {index} model {index % 37} series {index % 11}",
+            "category": "GPU" if index % 2 else "CPU",
+            "price": float(index),
+            "vendor": "newegg",
+        }
+        for index in range(count)
+    ]
+
+
+def _probes(store: SimpleVectorStore, monkeypatch: pytest.MonkeyPatch) -> list:
+    calls = []
+    probe = store.ann.probe
+
+    def counting(query: np.ndarray, nprobe: Any = None) -> np.ndarray:
+        calls.append(nprobe)
+        return probe(query, nprobe)
+
+    monkeypatch.setattr(store.ann, "probe", counting)
+    return calls
+
+
+def test_small_catalog_is_searched_exactly(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    store = SimpleVectorStore(path=tmp_path / "vector_store.json", quantization="float32")
+    store.hybrid = False
+    store.upsert_many(_catalog(500))
+    store.persist()
+    # Below ``ann_min_rows`` no index is trained for the snapshot...
+    assert not store.ann.ready
+    # ...and even a trained one is not consulted.
+    store.build_ann()
+    assert store.ann.ready
+    calls = _probes(store, monkeypatch)
+
+    results = store.search("part model 5 series 3", top_k=TOP_K)
+
+    assert calls == []
+    query = store.vectorizer.embed_query("part model 5 series 3")
+    expected = _top(store.embeddings.exact(), query)
+    assert {int(hit["sku"][1:]) for hit in results} == expected
+
+
+def test_catalog_at_the_threshold_is_searched_through_the_index(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(SimpleVectorStore, "ann_min_rows", 500)
+    store = SimpleVectorStore(path=tmp_path / "vector_store.json", quantization="float32")
+    store.hybrid = False
+    store.upsert_many(_catalog(500))
+    store.persist()
+    assert store.ann.ready
+    calls = _probes(store, monkeypatch)
+
+    results = store.search("part model 5 series 3", top_k=TOP_K, nprobe=store.ann.nlist - 1)
+
+    assert calls == [store.ann.nlist - 1]
+    assert len(results) == TOP_K
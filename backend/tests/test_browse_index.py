@@ -0,0 +1,134 @@
+import base64
+import json
+from pathlib import Path
+from typing import List, Optional
+
+import pytest
+
+from app.services.browse_index import InvalidCursorError, encode_cursor
+from app.services.vector_store import SimpleVectorStore
+
+
+def _item(index: int, price: Optional[float] = None) -> dict:
+    return {
+        "sku": f"s{index:02d}",
+        "name": f"widget {index}",
+        "category": "GPU" if index % 2 else "CPU",
+        # Three rows share each price, so pages also break ties on the identifier.
+        "price": float(index // 3) if price is None else price,
+        "vendor": "newegg",
+    }
+
+
+@pytest.fixture
+def store(tmp_path: Path) -> SimpleVectorStore:
+    store = SimpleVectorStore(path=tmp_path / "vector_store.json")
+    store.upsert_many([_item(index) for index in range(30)])
+    return store
+
+
+def _skus(items: List[dict]) -> List[str]:
+    return [item["sku"] for item in items]
+
+
+def _rest(store: SimpleVectorStore, cursor: Optional[str], **filters) -> List[str]:
+    skus: List[str] = []
+    while cursor is not None:
+        items, cursor = store.browse(sort="price_asc", cursor=cursor, limit=4, **filters)
+        skus.extend(_skus(items))
+    return skus
+
+
+def test_pages_cover_the_listing_once_in_order(store: SimpleVectorStore) -> None:
+    first, cursor = store.browse(sort="price_asc", limit=4)
+
+    skus = _skus(first) + _rest(store, cursor)
+
+    assert skus == [f"s{index:02d}" for index in range(30)]
+    gpus, cursor = store.browse(sort="price_asc", limit=4, category="GPU")
+    assert _skus(gpus) + _rest(store, cursor, category="GPU") == [
+        f"s{index:02d}" for index in range(1, 30, 2)
+    ]
+
+
+def test_writes_between_pages_neither_repeat_nor_skip_rows(store: SimpleVectorStore) -> None:
+    first, cursor = store.browse(sort="price_asc", limit=10)
+    assert _skus(first)[-1] == "s09"
+
+    # Around the cursor at (3.0, "s09"): delete rows on both sides, add a row on each
+    # side, and move an unseen row behind the cursor and a seen row ahead of it.
+    store.delete("s02")
+    store.delete("s20")
+    store.upsert_many(
+        [
+            _item(40, price=1.0),
+            _item(41, price=3.0),
+            _item(25, price=0.5),
+            _item(4, price=8.5),
+        ]
+    )
+
+    rest = _rest(store, cursor)
+
+    assert rest == [
+        "s10", "s11", "s41", "s12", "s13", "s14", "s15", "s16", "s17", "s18", "s19",
+        "s21", "s22", "s23", "s24", "s26", "s04", "s27", "s28", "s29",
+    ]
+    # Rows placed behind the cursor (s25, s40) are not shown; a shown row moved ahead of
+    # it (s04) is shown again. Every row left alone appears exactly once.
+    untouched = {f"s{index:02d}" for index in range(30)} - {"s02", "s04", "s20", "s25"}
+    shown = _skus(first) + rest
+    assert sorted(sku for sku in shown if sku in untouched) == sorted(untouched)
+
+
+def test_cursor_survives_deleting_the_row_it_points_at(store: SimpleVectorStore) -> None:
+    first, cursor = store.browse(sort="price_asc", limit=5)
+    store.delete(_skus(first)[-1])
+
+    assert _rest(store, cursor) == [f"s{index:02d}" for index in range(5, 30)]
+
+
+def test_cursor_for_another_sort_is_rejected(store: SimpleVectorStore) -> None:
+    _, cursor = store.browse(sort="price_asc", limit=5)
+
+    with pytest.raises(InvalidCursorError, match="different sort"):
+        store.browse(sort="price_desc", cursor=cursor)
+
+
+def _forge(cursor: str, **changes) -> str:
+    encoded_payload, signature = cursor.split(".")
+    padding = "=" * (-len(encoded_payload) % 4)
+    payload = json.loads(base64.urlsafe_b64decode(encoded_payload + padding))
+    forged = json.dumps({**payload, **changes}, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(forged).decode("ascii").rstrip("=") + "." + signature
+
+
+@pytest.mark.parametrize(
+    "tamper",
+    [
+        lambda cursor: _forge(cursor, k=-1.0),
+        lambda cursor: _forge(cursor, id="s00"),
+        lambda cursor: cursor[:-2] + ("AA" if not cursor.endswith("AA") else "BB"),
+        # The unsigned encoding cursors used to have.
+        lambda cursor: cursor.split(".")[0],
+        lambda cursor: "not a cursor",
+        lambda cursor: "",
+    ],
+    ids=["key", "identifier", "signature", "unsigned", "garbage", "empty"],
+)
+def test_tampered_cursor_is_rejected(store: SimpleVectorStore, tamper) -> None:
+    _, cursor = store.browse(sort="price_asc", limit=5)
+
+    with pytest.raises(InvalidCursorError):
+        store.browse(sort="price_asc", cursor=tamper(cursor))
+
+
+def test_cursor_signed_with_another_key_is_rejected(
+    store: SimpleVectorStore, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr("app.services.browse_index._cursor_key", lambda: b"another worker")
+    cursor = encode_cursor("price_asc", 3.0, "s09")
+    monkeypatch.undo()
+
+    with pytest.raises(InvalidCursorError, match="verification"):
+        store.browse(sort="price_asc", cursor=cursor)
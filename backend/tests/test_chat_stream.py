@@ -0,0 +1,193 @@
+import json
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List, Sequence, Tuple
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.routes import chat
+from app.schemas.chat import ChatPlanRequest
+from app.services.gemini import GeminiPlanner
+from app.services.resilience import CircuitBreaker
+
+PLAN = {
+    "plan_id": "gemini-test",
+    "currency": "USD",
+    "components": [
+        {"category": "CPU", "name": "Chip {8 cores}", "price": 300, "vendor": "shop"},
+        {"category": "GPU", "name": 'Card "OC"', "price": 500, "vendor": "shop"},
+    ],
+    "total_price": 800,
+    "summary": "A balanced build.",
+    "alternatives": [
+        {"title": "Cheaper", "description": "Smaller GPU", "total_price": 600, "components": []}
+    ],
+}
+REQUEST = {"messages": [{"role": "user", "content": "A gaming PC"}], "budget": 1000}
+
+
+class StaticPrompts:
+    """Stands in for the prompt builder so tests never open the catalog."""
+
+    def build(self, request: ChatPlanRequest) -> str:
+        return "prompt"
+
+
+class FakeModel:
+    def __init__(self, chunks: Sequence[str]) -> None:
+        self.chunks = list(chunks)
+        self.calls: List[bool] = []
+
+    def generate_content(self, prompt: str, stream: bool = False) -> Any:
+        self.calls.append(stream)
+        if stream:
+            return (SimpleNamespace(text=chunk) for chunk in self.chunks)
+        return SimpleNamespace(text="".join(self.chunks))
+
+
+def _chunks(text: str, size: int) -> List[str]:
+    return [text[start : start + size] for start in range(0, len(text), size)]
+
+
+def _planner(model: Any = None, **kwargs: Any) -> GeminiPlanner:
+    planner = GeminiPlanner(None, timeout=5.0, prompts=StaticPrompts(), **kwargs)
+    planner._model = model
+    return planner
+
+
+@pytest.fixture
+def client_for() -> Iterator[Any]:
+    planners: List[GeminiPlanner] = []
+    app = FastAPI()
+    app.include_router(chat.router)
+
+    def make(planner: GeminiPlanner) -> TestClient:
+        planners.append(planner)
+        app.dependency_overrides[chat.get_gemini_planner] = lambda: planner
+        return TestClient(app)
+
+    yield make
+    for planner in planners:
+        if planner._executor is not None:
+            planner._executor.shutdown(wait=True)
+
+
+def _events(client: TestClient) -> List[Tuple[str, Dict[str, Any]]]:
+    response = client.post("/chat/plan/stream", json=REQUEST)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = []
+    for frame in response.text.split("\n\n"):
+        if not frame:
+            continue
+        event, data = frame.split("\n")
+        assert event.startswith("event: ") and data.startswith("data: ")
+        events.append((event[len("event: ") :], json.loads(data[len("data: ") :])))
+    return events
+
+
+def test_stream_emits_parts_in_order_then_the_plan(client_for: Any) -> None:
+    text = "```json\n" + json.dumps(PLAN) + "\n```"
+    model = FakeModel(_chunks(text, 7))
+
+    events = _events(client_for(_planner(model)))
+
+    assert [event for event, _ in events] == [
+        "component",
+        "component",
+        "summary",
+        "alternative",
+        "plan",
+    ]
+    assert [data["name"] for _, data in events[:2]] == ["Chip {8 cores}", 'Card "OC"']
+    assert events[2][1] == {"summary": "A balanced build."}
+    assert events[3][1]["title"] == "Cheaper"
+    plan = events[-1][1]
+    assert plan["plan_id"] == "gemini-test"
+    assert [item["name"] for item in plan["components"]] == ["Chip {8 cores}", 'Card "OC"']
+    assert model.calls == [True]
+
+
+def test_stream_ignores_text_after_the_plan(client_for: Any) -> None:
+    model = FakeModel([json.dumps(PLAN), ' {"trailing": "ignored"}'])
+
+    events = _events(client_for(_planner(model)))
+
+    assert events[-1][0] == "plan"
+    assert [event for event, _ in events].count("plan") == 1
+
+
+def test_truncated_stream_ends_with_an_error_event(client_for: Any) -> None:
+    text = json.dumps(PLAN)
+    model = FakeModel(_chunks(text[: text.index('"summary"')], 5))
+
+    events = _events(client_for(_planner(model)))
+
+    assert [event for event, _ in events] == ["component", "component", "error"]
+    assert "ended before the plan was complete" in events[-1][1]["detail"]
+
+
+def test_unconfigured_planner_streams_the_sample_plan(client_for: Any) -> None:
+    events = _events(client_for(_planner()))
+
+    names = [event for event, _ in events]
+    assert names[-1] == "plan" and names.count("plan") == 1
+    assert "summary" in names and names.index("summary") > names.index("component")
+    assert events[-1][1]["plan_id"] == "demo-plan-001"
+
+
+def test_stream_failing_before_any_output_streams_the_sample_plan(client_for: Any) -> None:
+    class BrokenModel:
+        def generate_content(self, prompt: str, stream: bool = False) -> Any:
+            raise RuntimeError("boom")
+
+    planner = _planner(BrokenModel())
+
+    events = _events(client_for(planner))
+
+    assert events[-1][0] == "plan"
+    assert events[-1][1]["plan_id"] == "demo-plan-001"
+    assert planner.stats.failures == 1
+
+
+def test_plan_returns_the_model_plan(client_for: Any) -> None:
+    model = FakeModel([json.dumps(PLAN)])
+
+    response = client_for(_planner(model)).post("/chat/plan", json=REQUEST)
+
+    assert response.status_code == 200
+    assert response.json()["plan_id"] == "gemini-test"
+    assert model.calls == [False]
+
+
+def test_plan_falls_back_to_the_sample_plan_when_unconfigured(client_for: Any) -> None:
+    response = client_for(_planner()).post("/chat/plan", json=REQUEST)
+
+    assert response.status_code == 200
+    assert response.json()["plan_id"] == "demo-plan-001"
+
+
+def test_plan_falls_back_without_calling_the_model_while_the_circuit_is_open(
+    client_for: Any,
+) -> None:
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60.0)
+    breaker.record_failure()
+    model = FakeModel([json.dumps(PLAN)])
+
+    client = client_for(_planner(model, breaker=breaker))
+    plan = client.post("/chat/plan", json=REQUEST)
+    events = _events(client)
+
+    assert plan.json()["plan_id"] == "demo-plan-001"
+    assert events[-1][1]["plan_id"] == "demo-plan-001"
+    assert model.calls == []
+    assert breaker.snapshot()["rejected"] == 2
+
+
+def test_malformed_model_output_is_a_bad_request(client_for: Any) -> None:
+    model = FakeModel(["I cannot help with that."])
+
+    response = client_for(_planner(model)).post("/chat/plan", json=REQUEST)
+
+    assert response.status_code == 400
@@ -0,0 +1,105 @@
+import asyncio
+from pathlib import Path
+from typing import List
+
+import httpx
+
+from app.services.crawlers.http_cache import HttpCache
+from app.services.crawlers.runtime import CrawlerRuntime, RateLimiter, VendorLimits
+
+
+class FakeClock:
+    """A clock that only moves when the limiter sleeps."""
+
+    def __init__(self) -> None:
+        self.now = 0.0
+        self.sleeps: List[float] = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    async def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def test_rate_limiter_allows_a_burst_then_spaces_requests() -> None:
+    clock = FakeClock()
+    limiter = RateLimiter(rate=2.0, burst=2, clock=clock, sleep=clock.sleep)
+
+    async def scenario() -> List[float]:
+        granted = []
+        for _ in range(5):
+            await limiter.acquire()
+            granted.append(clock.now)
+        return granted
+
+    assert asyncio.run(scenario()) == [0.0, 0.0, 0.5, 1.0, 1.5]
+    assert clock.sleeps == [0.5, 0.5, 0.5]
+
+
+def test_rate_limiter_refills_while_idle() -> None:
+    clock = FakeClock()
+    limiter = RateLimiter(rate=1.0, burst=3, clock=clock, sleep=clock.sleep)
+
+    async def scenario() -> None:
+        for _ in range(3):
+            await limiter.acquire()
+        clock.now += 10.0
+        # Idle time refills the bucket, but never beyond ``burst``.
+        for _ in range(4):
+            await limiter.acquire()
+
+    asyncio.run(scenario())
+    assert clock.sleeps == [1.0]
+
+
+def test_vendor_concurrency_is_capped() -> None:
+    active = 0
+    peak = 0
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+        return httpx.Response(200, text="ok")
+
+    limits = VendorLimits(max_concurrency=2, requests_per_second=0, base_url="https://shop.test")
+    runtime = CrawlerRuntime({"shop": limits}, transport=httpx.MockTransport(handler))
+
+    async def scenario() -> None:
+        async with runtime:
+            await asyncio.gather(*(runtime.fetch("shop", f"/item/{n}") for n in range(8)))
+
+    asyncio.run(scenario())
+    assert peak == 2
+
+
+def test_fetch_page_revalidates_and_serves_304_from_cache(tmp_path: Path) -> None:
+    seen_headers: List[httpx.Headers] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen_headers.append(request.headers)
+        if request.headers.get("if-none-match") == '"v1"':
+            return httpx.Response(304)
+        return httpx.Response(200, text="<html>v1</html>", headers={"ETag": '"v1"'})
+
+    limits = VendorLimits(requests_per_second=0, base_url="https://shop.test")
+    runtime = CrawlerRuntime(
+        {"shop": limits}, transport=httpx.MockTransport(handler), cache=HttpCache(tmp_path)
+    )
+
+    async def scenario():
+        async with runtime:
+            return [await runtime.fetch_page("shop", "/item/1") for _ in range(2)]
+
+    first, second = asyncio.run(scenario())
+
+    assert first.url == "https://shop.test/item/1"
+    assert (first.text, first.not_modified) == ("<html>v1</html>", False)
+    assert (second.text, second.not_modified) == ("<html>v1</html>", True)
+    assert "if-none-match" not in seen_headers[0]
+    assert seen_headers[1]["if-none-match"] == '"v1"'
+    assert runtime.page_stats == {"fetched": 1, "not_modified": 1}
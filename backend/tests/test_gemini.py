@@ -0,0 +1,215 @@
+import asyncio
+import json
+import threading
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Callable, List
+
+import pytest
+
+from app.schemas.chat import ChatMessage, ChatPlanRequest
+from app.services.gemini import GeminiPlanner, GeminiUnavailableError
+from app.services.plan_cache import PlanCache
+from app.services.price_history import PriceHistoryStore
+from app.services.vector_store import SimpleVectorStore
+
+PLAN = {
+    "plan_id": "gemini-test",
+    "total_price": 300,
+    "components": [{"category": "CPU", "name": "Chip", "price": 300, "vendor": "shop"}],
+    "summary": "A build.",
+}
+REQUEST = ChatPlanRequest(messages=[ChatMessage(role="user", content="A gaming PC")])
+
+
+class StaticPrompts:
+    def build(self, request: ChatPlanRequest) -> str:
+        return "prompt"
+
+
+class StubModel:
+    """Answers ``generate_content`` with ``behave(call_number)``, counting the calls."""
+
+    def __init__(self, behave: Callable[[int], Any]) -> None:
+        self.behave = behave
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt: str) -> Any:
+        with self._lock:
+            self.calls += 1
+            call = self.calls
+        return self.behave(call)
+
+
+def _response(plan_id: str = "gemini-test") -> Any:
+    return SimpleNamespace(text=json.dumps({**PLAN, "plan_id": plan_id}))
+
+
+def _planner(model: StubModel, **kwargs: Any) -> GeminiPlanner:
+    options = {"timeout": 5.0, "hedge_after": 5.0, **kwargs}
+    planner = GeminiPlanner(None, prompts=StaticPrompts(), **options)
+    planner._model = model
+    return planner
+
+
+@pytest.fixture
+def planners() -> Any:
+    created: List[GeminiPlanner] = []
+    yield created
+    for planner in created:
+        asyncio.run(planner.aclose())
+
+
+def test_concurrent_identical_requests_share_one_call(planners: List[GeminiPlanner]) -> None:
+    release = threading.Event()
+
+    def slow(call: int) -> Any:
+        release.wait(5)
+        return _response()
+
+    model = StubModel(slow)
+    planner = _planner(model)
+    planners.append(planner)
+
+    async def scenario():
+        waiters = [asyncio.ensure_future(planner.generate_plan(REQUEST)) for _ in range(5)]
+        await asyncio.sleep(0.05)
+        in_flight = len(planner._inflight)
+        release.set()
+        return in_flight, await asyncio.gather(*waiters)
+
+    in_flight, plans = asyncio.run(scenario())
+
+    assert in_flight == 1
+    assert model.calls == 1
+    assert {plan.plan_id for plan in plans} == {"gemini-test"}
+    assert planner._inflight == {}
+
+
+def test_shared_failure_reaches_every_waiter_and_is_not_cached(
+    tmp_path: Path, planners: List[GeminiPlanner]
+) -> None:
+    release = threading.Event()
+    failing = True
+
+    def flaky(call: int) -> Any:
+        release.wait(5)
+        if failing:
+            raise RuntimeError("upstream error")
+        return _response()
+
+    store = SimpleVectorStore(path=tmp_path / "vector_store")
+    history = PriceHistoryStore(tmp_path / "price_history")
+    cache = PlanCache(catalog=lambda: store, history=lambda: history)
+    model = StubModel(flaky)
+    planner = _planner(model, cache=cache)
+    planners.append(planner)
+
+    async def scenario():
+        waiters = [asyncio.ensure_future(planner.generate_plan(REQUEST)) for _ in range(4)]
+        await asyncio.sleep(0.05)
+        release.set()
+        return await asyncio.gather(*waiters, return_exceptions=True)
+
+    outcomes = asyncio.run(scenario())
+
+    assert all(isinstance(outcome, GeminiUnavailableError) for outcome in outcomes)
+    # One shared call and its single retry, not one per waiter.
+    assert model.calls == 2
+    assert len(cache) == 0 and planner._inflight == {}
+
+    failing = False
+    plan = asyncio.run(planner.generate_plan(REQUEST))
+    assert plan.plan_id == "gemini-test"
+    assert model.calls == 3
+    assert len(cache) == 1
+
+
+def _seed_latency(planner: GeminiPlanner, seconds: float, count: int = 20) -> None:
+    for _ in range(count):
+        planner.latency.record(seconds)
+
+
+def test_hedge_delay_follows_the_latency_percentile() -> None:
+    planner = _planner(StubModel(lambda call: _response()), hedge_after=0.5)
+
+    _seed_latency(planner, 2.0, count=19)
+    # Too few samples to trust a percentile yet.
+    assert planner._hedge_delay() == 0.5
+    _seed_latency(planner, 2.0, count=1)
+    assert planner._hedge_delay() == pytest.approx(2.0)
+    _seed_latency(planner, 0.1, count=500)
+    # Never hedge sooner than ``hedge_after``.
+    assert planner._hedge_delay() == 0.5
+
+
+def test_slow_call_is_hedged_after_the_percentile_and_the_loser_cancelled(
+    planners: List[GeminiPlanner],
+) -> None:
+    release = threading.Event()
+    started: List[float] = []
+
+    def first_stalls(call: int) -> Any:
+        started.append(time.monotonic())
+        if call == 1:
+            release.wait(5)
+            return _response("slow")
+        return _response("hedge")
+
+    model = StubModel(first_stalls)
+    planner = _planner(model, hedge_after=0.01, max_concurrency=2)
+    planners.append(planner)
+    _seed_latency(planner, 0.1)
+
+    async def scenario():
+        plan = await planner.generate_plan(REQUEST)
+        # The losing attempt was cancelled, so it no longer holds a concurrency slot even
+        # though its thread is still blocked in the model call.
+        limit = planner._limit()
+        await asyncio.wait_for(asyncio.gather(limit.acquire(), limit.acquire()), 1.0)
+        release.set()
+        return plan
+
+    plan = asyncio.run(scenario())
+
+    assert plan.plan_id == "hedge"
+    assert model.calls == 2 and planner.stats.hedges == 1
+    assert started[1] - started[0] >= 0.09
+    # Only the winner's latency was recorded.
+    assert len(planner.latency) == 21
+    assert planner.breaker.snapshot()["consecutive_failures"] == 0
+
+
+def test_failed_call_is_retried_once(planners: List[GeminiPlanner]) -> None:
+    def fails_first(call: int) -> Any:
+        if call == 1:
+            raise RuntimeError("503 from upstream")
+        return _response()
+
+    model = StubModel(fails_first)
+    planner = _planner(model)
+    planners.append(planner)
+
+    plan = asyncio.run(planner.generate_plan(REQUEST))
+
+    assert plan.plan_id == "gemini-test"
+    assert model.calls == 2
+    assert (planner.stats.retries, planner.stats.failures) == (1, 0)
+
+
+def test_retries_are_bounded(planners: List[GeminiPlanner]) -> None:
+    def always_fails(call: int) -> Any:
+        raise RuntimeError("503 from upstream")
+
+    model = StubModel(always_fails)
+    planner = _planner(model)
+    planners.append(planner)
+
+    with pytest.raises(GeminiUnavailableError):
+        asyncio.run(planner.generate_plan(REQUEST))
+
+    assert model.calls == 2
+    assert (planner.stats.retries, planner.stats.failures) == (1, 1)
+    assert planner.breaker.snapshot()["consecutive_failures"] == 1
@@ -0,0 +1,135 @@
+import asyncio
+import json
+from pathlib import Path
+from typing import Dict, Iterator, List
+
+import httpx
+import pytest
+
+from app.services.crawlers.html import HtmlCrawler, parse_listing, parse_product
+from app.services.crawlers.http_cache import HttpCache
+from app.services.crawlers.runtime import CrawlerRuntime, VendorLimits
+from app.services.executors import shutdown_parse_pool
+
+BASE = "https://shop.test"
+
+
+def _product_page(sku: str, name: str, price: str) -> str:
+    product = {
+        "@context": "https://schema.org",
+        "@type": "Product",
+        "sku": sku,
+        "name": name,
+        "category": "Components > Graphics Cards",
+        "brand": {"@type": "Brand", "name": "MSI"},
+        "offers": {
+            "@type": "Offer",
+            "price": price,
+            "priceCurrency": "USD",
+            "availability": "https://schema.org/InStock",
+        },
+        "aggregateRating": {"ratingValue": "4.5"},
+    }
+    return (
+        "<html><head>"
+        f'<script type="application/ld+json">{json.dumps(product)}</script>'
+        "</head><body></body></html>"
+    )
+
+
+def _listing_page(links: List[str], next_url: str = "") -> str:
+    anchors = "".join(f'<a href="{link}">item</a>' for link in links)
+    rel_next = f'<link rel="next" href="{next_url}">' if next_url else ""
+    return f"<html><head>{rel_next}</head><body>{anchors}<a href='/about'>x</a></body></html>"
+
+
+PAGES: Dict[str, str] = {
+    "/gpus": _listing_page(["/p/A1", "/p/A2#reviews", "/p/A1"], next_url="/gpus?page=2"),
+    "/gpus?page=2": _listing_page(["/p/A3", "/p/GONE"]),
+    "/p/A1": _product_page("A1", "Card One", "$499.99"),
+    "/p/A2": _product_page("A2", "Card Two", "549"),
+    "/p/A3": _product_page("A3", "Card Three", "1,099.00"),
+}
+
+
+class ShopCrawler(HtmlCrawler):
+    vendor = "shop"
+    product_pattern = r"/p/[A-Z0-9]+"
+
+
+@pytest.fixture(scope="module", autouse=True)
+def parse_pool() -> Iterator[None]:
+    yield
+    shutdown_parse_pool()
+
+
+def test_parse_listing_returns_unique_product_links_and_next_page() -> None:
+    links, next_url = parse_listing(PAGES["/gpus"], f"{BASE}/gpus", ShopCrawler.product_pattern)
+
+    assert links == [f"{BASE}/p/A1", f"{BASE}/p/A2"]
+    assert next_url == f"{BASE}/gpus?page=2"
+
+
+def test_parse_product_reads_json_ld() -> None:
+    data = parse_product(PAGES["/p/A3"], f"{BASE}/p/A3")
+
+    assert data is not None
+    assert data["sku"] == "A3"
+    assert data["price"] == 1099.0
+    assert data["category"] == "Graphics Cards"
+    assert data["stock_status"] == "in_stock"
+    assert data["specs"] == {"brand": "MSI"}
+    assert data["url"] == f"{BASE}/p/A3"
+
+
+def test_parse_product_falls_back_to_open_graph() -> None:
+    html = (
+        '<html><head><meta property="og:title" content="Case">'
+        '<meta property="product:price:amount" content="89.5">'
+        '<meta property="product:retailer_item_id" content="C9"></head></html>'
+    )
+
+    data = parse_product(html, f"{BASE}/p/C9")
+
+    assert data is not None
+    assert (data["sku"], data["name"], data["price"]) == ("C9", "Case", 89.5)
+
+
+def test_crawl_follows_listings_skips_delisted_and_revalidates(tmp_path: Path) -> None:
+    statuses: List[int] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        path = request.url.raw_path.decode()
+        if path not in PAGES:
+            response = httpx.Response(404)
+        elif request.headers.get("if-none-match") == f'"{path}"':
+            response = httpx.Response(304)
+        else:
+            response = httpx.Response(200, text=PAGES[path], headers={"ETag": f'"{path}"'})
+        statuses.append(response.status_code)
+        return response
+
+    runtime = CrawlerRuntime(
+        {"shop": VendorLimits(requests_per_second=0, base_url=BASE)},
+        transport=httpx.MockTransport(handler),
+        cache=HttpCache(tmp_path),
+    )
+    crawler = ShopCrawler({"/gpus": "GPU"})
+
+    async def crawl_twice():
+        async with runtime:
+            first = await crawler.fetch_latest(runtime)
+            second = await crawler.fetch_latest(runtime)
+        return first, second
+
+    first, second = asyncio.run(crawl_twice())
+
+    assert sorted(result.sku for result in first) == ["shop-A1", "shop-A2", "shop-A3"]
+    assert {result.category for result in first} == {"Graphics Cards"}
+    assert [result.model_dump(exclude={"updated_at"}) for result in second] == [
+        result.model_dump(exclude={"updated_at"}) for result in first
+    ]
+    # Five pages and one 404 on the first crawl; the second is all revalidations.
+    assert sorted(statuses[:6]) == [200] * 5 + [404]
+    assert sorted(statuses[6:]) == [304] * 5 + [404]
+    assert runtime.page_stats == {"fetched": 5, "not_modified": 5}
@@ -0,0 +1,114 @@
+import json
+from typing import Any, List, Sequence, Tuple
+
+import pytest
+
+from app.services.json_stream import IncrementalJSONParser
+
+PLAN = {
+    "plan_id": "p-1",
+    "components": [
+        {"category": "GPU", "name": 'Card "Ultra" {OC}', "price": 499.99, "vendor": "shop"},
+        {"category": "CPU", "name": "Chip \\ 8 cores é中", "price": 3.5e2, "vendor": "x"},
+    ],
+    "summary": "Brackets ] and } inside strings, plus \n a newline and \"quotes\".",
+    "nested": {"deep": {"deeper": [1, [2, {"three": 3}]]}, "empty": {}},
+    "alternatives": [],
+    "flags": [True, False, None, -1.25e-3],
+}
+# ``ensure_ascii`` writes \u escapes, so the text also has escape sequences to split.
+TEXT = json.dumps(PLAN, indent=1, ensure_ascii=True)
+
+
+def _feed(parser: IncrementalJSONParser, chunks: Sequence[str]) -> List[Tuple[Any, Any]]:
+    completed: List[Tuple[Any, Any]] = []
+    for chunk in chunks:
+        completed.extend(parser.feed(chunk))
+    return completed
+
+
+EXPECTED = _feed(IncrementalJSONParser(), [TEXT])
+
+
+def test_whole_document_reports_values_in_document_order() -> None:
+    assert [path for path, _ in EXPECTED] == [
+        ("plan_id",),
+        ("components", 0),
+        ("components", 1),
+        ("components",),
+        ("summary",),
+        ("nested", "deep"),
+        ("nested", "empty"),
+        ("nested",),
+        ("alternatives",),
+        ("flags", 0),
+        ("flags", 1),
+        ("flags", 2),
+        ("flags", 3),
+        ("flags",),
+        (),
+    ]
+    values = dict(EXPECTED)
+    assert values[("components", 0)] == PLAN["components"][0]
+    assert values[("components", 1)] == PLAN["components"][1]
+    assert values[("summary",)] == PLAN["summary"]
+    assert values[()] == PLAN
+
+
+def test_any_split_point_gives_the_same_values() -> None:
+    # Covers splits inside keys, strings, escapes, numbers and literals.
+    for split in range(1, len(TEXT)):
+        parser = IncrementalJSONParser()
+
+        assert _feed(parser, [TEXT[:split], TEXT[split:]]) == EXPECTED, split
+        assert parser.done and parser.root == PLAN
+
+
+def test_character_by_character_feed_gives_the_same_values() -> None:
+    parser = IncrementalJSONParser()
+
+    assert _feed(parser, list(TEXT)) == EXPECTED
+
+
+def test_values_are_reported_as_soon_as_they_complete() -> None:
+    parser = IncrementalJSONParser()
+    end_of_first = TEXT.index("}", TEXT.index('"vendor": "shop"')) + 1
+
+    assert [path for path, _ in _feed(parser, [TEXT[:end_of_first]])] == [
+        ("plan_id",),
+        ("components", 0),
+    ]
+    assert not parser.done
+
+
+def test_prose_and_code_fence_around_the_object_are_ignored() -> None:
+    parser = IncrementalJSONParser(max_depth=0)
+    text = f"Here is your build:\n```json\n{TEXT}\n```\nAnything else? {{\"late\": 1}}"
+
+    completed = _feed(parser, [text[:15], text[15:40], text[40:]])
+
+    assert completed == [((), PLAN)]
+    assert parser.feed('{"more": true}') == []
+
+
+def test_max_depth_limits_the_reported_paths() -> None:
+    parser = IncrementalJSONParser(max_depth=1)
+
+    paths = [path for path, _ in _feed(parser, [TEXT])]
+
+    assert all(len(path) <= 1 for path in paths)
+    assert ("components",) in paths and ("components", 0) not in paths
+
+
+def test_truncated_document_is_not_done() -> None:
+    parser = IncrementalJSONParser()
+    _feed(parser, [TEXT[:-1]])
+
+    assert not parser.done and parser.root is None
+
+
+def test_malformed_value_raises_value_error() -> None:
+    parser = IncrementalJSONParser()
+
+    with pytest.raises(ValueError):
+        _feed(parser, ['{"price": 12.3.4', ", "])
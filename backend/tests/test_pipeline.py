@@ -0,0 +1,203 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import AsyncIterator, List, Optional
+
+import pytest
+
+from app.services import pipeline as pipeline_module
+from app.services import vector_store
+from app.services.crawlers import CrawlerRuntime
+from app.services.crawlers.base import CrawlerResult
+from app.services.pipeline import DataPipeline
+from app.services.price_history import PriceHistoryStore
+from app.services.vector_store import SimpleVectorStore
+
+
+def _result(sku: str, price: float, vendor: str = "shop", name: str = "") -> CrawlerResult:
+    return CrawlerResult(
+        sku=sku,
+        name=name or f"Widget {sku}",
+        category="GPU",
+        price=price,
+        vendor=vendor,
+        updated_at=datetime(2024, 1, 1, tzinfo=timezone.utc),
+    )
+
+
+class ListCrawler:
+    """Yields a fixed catalog in batches, or fails part-way when ``error`` is set."""
+
+    def __init__(
+        self, vendor: str, results: List[CrawlerResult], error: Optional[str] = None
+    ) -> None:
+        self.vendor = vendor
+        self.results = results
+        self.error = error
+
+    async def fetch_latest(self, runtime: Optional[CrawlerRuntime] = None) -> List[CrawlerResult]:
+        return [result async for batch in self.iter_batches(runtime) for result in batch]
+
+    async def iter_batches(
+        self, runtime: Optional[CrawlerRuntime] = None, batch_size: int = 256
+    ) -> AsyncIterator[List[CrawlerResult]]:
+        for start in range(0, len(self.results), batch_size):
+            yield self.results[start : start + batch_size]
+        if self.error:
+            raise RuntimeError(self.error)
+
+
+@pytest.fixture(autouse=True)
+def published(monkeypatch: pytest.MonkeyPatch) -> None:
+    # Refreshes publish their store process-wide; keep that from leaking between tests.
+    monkeypatch.setattr(vector_store, "_store_instance", None)
+
+
+def _pipeline(tmp_path: Path, store: SimpleVectorStore, *crawlers: ListCrawler) -> DataPipeline:
+    return DataPipeline(
+        store=store,
+        runtime=CrawlerRuntime(),
+        crawlers=list(crawlers),
+        history=PriceHistoryStore(tmp_path / "price_history"),
+    )
+
+
+def test_empty_store_is_used_rather_than_the_global_one(tmp_path: Path) -> None:
+    store = SimpleVectorStore(path=tmp_path / "vector_store")
+    assert len(store) == 0
+
+    pipeline = _pipeline(tmp_path, store, ListCrawler("shop", [_result("a", 10.0)]))
+    assert pipeline.store is store
+
+    summary = asyncio.run(pipeline.refresh_samples())
+
+    assert summary.added == 1
+    assert pipeline.store is not store
+    assert pipeline.store.path == store.path
+    assert [item["sku"] for item in pipeline.store.all()] == ["a"]
+    assert store.files.manifest_path.exists()
+
+
+def _skus(store: SimpleVectorStore) -> List[str]:
+    return sorted(item["sku"] for item in store.all())
+
+
+def _seeded(tmp_path: Path) -> SimpleVectorStore:
+    store = SimpleVectorStore(path=tmp_path / "vector_store")
+    seed = _pipeline(
+        tmp_path,
+        store,
+        ListCrawler("shop", [_result(sku, 10.0) for sku in ("a", "b", "d", "e")]),
+        ListCrawler("mart", [_result(sku, 20.0, vendor="mart") for sku in ("m1", "m2")]),
+    )
+    asyncio.run(seed.refresh_samples())
+    return seed.store
+
+
+def test_refresh_counts_changes_and_removes_only_for_vendors_that_crawled(
+    tmp_path: Path,
+) -> None:
+    store = _seeded(tmp_path)
+    shop = ListCrawler(
+        "shop",
+        [
+            _result("a", 12.0),
+            _result("b", 10.0),
+            _result("c", 30.0),
+            _result("e", 10.0, name="Widget e, renamed"),
+        ],
+    )
+    # The mart crawl breaks after its first product, so m2 is not known to be gone.
+    mart = ListCrawler("mart", [_result("m1", 20.0, vendor="mart")], error="timed out")
+    pipeline = _pipeline(tmp_path, store, shop, mart)
+
+    summary = asyncio.run(pipeline.refresh_samples())
+
+    assert (summary.added, summary.changed, summary.unchanged, summary.removed) == (1, 2, 2, 1)
+    assert summary.failed_vendors == ["mart"]
+    assert summary.price_changes == 2
+    assert _skus(pipeline.store) == ["a", "b", "c", "e", "m1", "m2"]
+
+
+def test_refresh_publishes_a_new_store_and_leaves_the_old_one_intact(tmp_path: Path) -> None:
+    store = _seeded(tmp_path)
+    assert vector_store._store_instance is store
+    pipeline = _pipeline(tmp_path, store, ListCrawler("shop", [_result("a", 11.0)]))
+
+    summary = asyncio.run(pipeline.refresh_samples(["shop"]))
+
+    assert summary.removed == 3
+    assert vector_store._store_instance is pipeline.store
+    assert pipeline.store is not store
+    assert _skus(pipeline.store) == ["a", "m1", "m2"]
+    assert _skus(SimpleVectorStore(path=store.path)) == ["a", "m1", "m2"]
+    # Requests still holding the old store keep a consistent view of it.
+    assert _skus(store) == ["a", "b", "d", "e", "m1", "m2"]
+    assert store.search("Widget a", top_k=1)[0]["price"] == 10.0
+
+
+def test_refresh_without_changes_keeps_the_published_store(tmp_path: Path) -> None:
+    store = _seeded(tmp_path)
+    crawlers = [
+        ListCrawler("shop", [_result(sku, 10.0) for sku in ("a", "b", "d", "e")]),
+        ListCrawler("mart", [_result(sku, 20.0, vendor="mart") for sku in ("m1", "m2")]),
+    ]
+    pipeline = _pipeline(tmp_path, store, *crawlers)
+
+    summary = asyncio.run(pipeline.refresh_samples())
+
+    assert (summary.added, summary.changed, summary.unchanged, summary.removed) == (0, 0, 6, 0)
+    assert pipeline.store is store
+    assert vector_store._store_instance is store
+
+
+def test_stages_report_their_counts(tmp_path: Path) -> None:
+    store = SimpleVectorStore(path=tmp_path / "vector_store")
+    results = [_result(f"s{index}", 10.0 + index) for index in range(7)]
+    results += [_result("s0", 99.0), _result("bad", -1.0)]
+    pipeline = _pipeline(tmp_path, store, ListCrawler("shop", results))
+    pipeline.batch_size = 3
+
+    summary = asyncio.run(pipeline.refresh_samples())
+
+    stages = summary.stages
+    assert (stages["crawl"]["items"], stages["crawl"]["batches"]) == (9, 3)
+    assert (stages["validate"]["items"], stages["validate"]["batches"]) == (9, 3)
+    # The repeated SKU and the negative price never leave validation.
+    assert summary.rejected == 1
+    assert (stages["embed"]["items"], stages["write"]["items"]) == (7, 7)
+    assert summary.ingested == 9 and summary.added == 7
+    assert pipeline.store.search("Widget s0", top_k=1)[0]["price"] == 10.0
+
+
+def test_slow_writes_hold_back_the_crawl(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    written: List[int] = []
+    lag: List[int] = []
+    write = pipeline_module._Ingest.write
+
+    def slow_write(self, delta, vectors) -> None:
+        time.sleep(0.005)
+        write(self, delta, vectors)
+        written.append(len(delta.embed))
+
+    monkeypatch.setattr(pipeline_module._Ingest, "write", slow_write)
+
+    class CountingCrawler(ListCrawler):
+        async def iter_batches(self, runtime=None, batch_size=256):
+            for produced, result in enumerate(self.results):
+                # Batches handed over but not yet written are held by the queues.
+                lag.append(produced - len(written))
+                yield [result]
+
+    store = SimpleVectorStore(path=tmp_path / "vector_store")
+    crawler = CountingCrawler("shop", [_result(f"s{index}", 1.0) for index in range(30)])
+    pipeline = _pipeline(tmp_path, store, crawler)
+    pipeline.queue_size = 1
+
+    summary = asyncio.run(pipeline.refresh_samples())
+
+    assert summary.added == 30 and len(written) == 30
+    # Three queues of one batch each, plus one batch in the hands of each stage.
+    assert max(lag) <= 3 * pipeline.queue_size + 3
+    assert max(lag) >= 2, lag
@@ -0,0 +1,103 @@
+from pathlib import Path
+from typing import List, Optional
+
+import pytest
+
+from app.schemas.chat import BuildComponent, ChatMessage, ChatPlanRequest, ChatPlanResponse
+from app.services.plan_cache import PlanCache
+from app.services.price_history import PriceHistoryStore
+from app.services.vector_store import SimpleVectorStore
+
+CATALOG = [
+    {"sku": "gpu-1", "name": "Card One", "category": "GPU", "price": 500.0, "vendor": "shop"},
+    {"sku": "cpu-1", "name": "Chip One", "category": "CPU", "price": 300.0, "vendor": "shop"},
+]
+
+
+def _request(*texts: str, budget: Optional[float] = 1500.0) -> ChatPlanRequest:
+    return ChatPlanRequest(
+        messages=[ChatMessage(role="user", content=text) for text in texts], budget=budget
+    )
+
+
+def _plan(plan_id: str, names: List[str] = ()) -> ChatPlanResponse:
+    return ChatPlanResponse(
+        plan_id=plan_id,
+        total_price=0.0,
+        currency="USD",
+        components=[
+            BuildComponent(category="GPU", name=name, price=0.0, vendor="shop") for name in names
+        ],
+        summary="",
+    )
+
+
+@pytest.fixture
+def history(tmp_path: Path) -> PriceHistoryStore:
+    history = PriceHistoryStore(tmp_path / "price_history")
+    history.record(CATALOG)
+    return history
+
+
+@pytest.fixture
+def cache(tmp_path: Path, history: PriceHistoryStore) -> PlanCache:
+    store = SimpleVectorStore(path=tmp_path / "vector_store")
+    store.upsert_many([dict(item) for item in CATALOG])
+    return PlanCache(catalog=lambda: store, history=lambda: history)
+
+
+def _plan_id(cache: PlanCache, request: ChatPlanRequest) -> Optional[str]:
+    plan = cache.get(request)
+    return plan.plan_id if plan is not None else None
+
+
+def test_near_duplicate_conversation_is_served_from_the_cache(cache: PlanCache) -> None:
+    cache.put(_request("I want a quiet gaming PC for 1440p"), _plan("p1"))
+
+    assert _plan_id(cache, _request("I want a quiet gaming PC for 1440p")) == "p1"
+    assert _plan_id(cache, _request("Hi! Could you build me a quiet gaming pc, for 1440p?")) == "p1"
+    assert _plan_id(cache, _request("A video editing workstation, 1440p")) is None
+    assert (cache.stats.hits, cache.stats.near_hits, cache.stats.misses) == (1, 1, 1)
+
+
+@pytest.mark.parametrize(
+    "other",
+    [
+        _request("I want a quiet gaming PC for 1440p", budget=2000.0),
+        _request("I want a quiet gaming PC for 1080p"),
+        _request("I want a quiet gaming PC for 1440p with 2 monitors"),
+    ],
+    ids=["budget", "resolution", "quantity"],
+)
+def test_requests_with_different_numbers_are_kept_apart(
+    cache: PlanCache, other: ChatPlanRequest
+) -> None:
+    cache.put(_request("I want a quiet gaming PC for 1440p"), _plan("p1"))
+
+    assert _plan_id(cache, other) is None
+
+
+def test_thousands_separators_do_not_change_the_numbers(cache: PlanCache) -> None:
+    cache.put(_request("Gaming PC under 1,500 dollars", budget=None), _plan("p1"))
+
+    assert _plan_id(cache, _request("gaming pc under 1500 dollars", budget=None)) == "p1"
+    assert _plan_id(cache, _request("gaming pc under 1600 dollars", budget=None)) is None
+
+
+def test_price_move_on_a_cached_component_invalidates_the_plan(
+    cache: PlanCache, history: PriceHistoryStore
+) -> None:
+    request = _request("I want a quiet gaming PC for 1440p")
+    cache.put(request, _plan("p1", ["Card One"]))
+    other = _request("A small office PC")
+    cache.put(other, _plan("p2", ["Chip One"]))
+
+    # Card One moves within the 5% tolerance; Chip One, used only by p2, moves a third.
+    history.record([{**CATALOG[0], "price": 510.0}, {**CATALOG[1], "price": 200.0}])
+    assert _plan_id(cache, request) == "p1"
+    assert _plan_id(cache, other) is None
+
+    history.record([{**CATALOG[0], "price": 560.0}])
+    assert _plan_id(cache, request) is None
+    assert cache.stats.invalidations == 2
+    assert len(cache) == 0
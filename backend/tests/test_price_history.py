@@ -0,0 +1,172 @@
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import List, Optional
+
+import pytest
+
+from app.services.price_history import PriceChange, PriceHistoryStore
+
+# A Monday, so day and week buckets both start here.
+T0 = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def _item(price: float, sku: str = "gpu-1", vendor: str = "newegg") -> dict:
+    return {"sku": sku, "vendor": vendor, "price": price, "currency": "USD"}
+
+
+def _prices(store: PriceHistoryStore, sku: str = "gpu-1", **bounds: Optional[datetime]) -> List:
+    return [(point.timestamp, point.price) for point in store.history(sku, **bounds)]
+
+
+@pytest.fixture
+def path(tmp_path: Path) -> Path:
+    return tmp_path / "price_history"
+
+
+def test_unchanged_prices_are_not_recorded(path: Path) -> None:
+    store = PriceHistoryStore(path)
+
+    assert store.record([_item(100.0), _item(50.0, vendor="amazon")], at=T0) == 2
+    assert store.record([_item(100.0), _item(50.0, vendor="amazon")], at=T0 + timedelta(1)) == 0
+    assert store.record([_item(90.0), _item(50.0, vendor="amazon")], at=T0 + timedelta(2)) == 1
+
+    assert len(store) == 3
+    assert _prices(store) == [(T0, 100.0), (T0, 50.0), (T0 + timedelta(2), 90.0)]
+
+
+def test_range_query_includes_the_price_in_effect_at_the_start(path: Path) -> None:
+    store = PriceHistoryStore(path)
+    for day, price in enumerate((100.0, 90.0, 80.0, 70.0)):
+        store.record([_item(price)], at=T0 + timedelta(days=10 * day))
+    store.flush()
+
+    window = _prices(store, start=T0 + timedelta(days=15), end=T0 + timedelta(days=20))
+
+    # 90 was set on day 10 and still held on day 15; day 30 is past the end.
+    assert window == [(T0 + timedelta(days=10), 90.0), (T0 + timedelta(days=20), 80.0)]
+    assert _prices(store, end=T0 + timedelta(days=5)) == [(T0, 100.0)]
+    assert _prices(store, "unknown") == []
+
+
+@pytest.mark.parametrize("flushed", [False, True])
+def test_day_rollup_is_time_weighted(path: Path, flushed: bool) -> None:
+    store = PriceHistoryStore(path)
+    store.record([_item(10.0)], at=T0)
+    store.record([_item(20.0)], at=T0 + timedelta(hours=6))
+    store.record([_item(30.0)], at=T0 + timedelta(days=1, hours=12))
+    if flushed:
+        store.flush()
+
+    rollups = store.rollups("gpu-1", "day", start=T0, end=T0 + timedelta(days=1, hours=1))
+
+    assert [rollup.period_start for rollup in rollups] == [T0, T0 + timedelta(days=1)]
+    first, second = rollups
+    assert (first.min_price, first.max_price) == (10.0, 20.0)
+    assert first.avg_price == pytest.approx((10.0 * 6 + 20.0 * 18) / 24)
+    # 20 held for the first twelve hours of the second day, then 30.
+    assert (second.min_price, second.max_price) == (20.0, 30.0)
+    assert second.avg_price == pytest.approx(25.0)
+
+
+def test_week_rollup_starts_on_monday(path: Path) -> None:
+    store = PriceHistoryStore(path)
+    store.record([_item(100.0)], at=T0 + timedelta(days=2))
+    store.record([_item(200.0)], at=T0 + timedelta(days=3))
+    store.record([_item(300.0)], at=T0 + timedelta(days=7))
+    store.flush()
+
+    (week,) = store.rollups("gpu-1", "week", end=T0 + timedelta(days=6))
+
+    assert week.period_start == T0
+    assert (week.min_price, week.max_price) == (100.0, 200.0)
+    # Nothing was known for the first two days, so only the five covered days count.
+    assert week.avg_price == pytest.approx((100.0 * 1 + 200.0 * 4) / 5)
+    with pytest.raises(ValueError):
+        store.rollups("gpu-1", "month")
+
+
+def test_changes_since_reports_only_new_changes(path: Path) -> None:
+    store = PriceHistoryStore(path)
+    store.record([_item(100.0)], at=T0)
+    changes, cursor = store.changes_since(None)
+    assert changes == []
+
+    store.record([_item(100.0), _item(95.0, sku="cpu-1")], at=T0 + timedelta(1))
+    store.record([_item(80.0)], at=T0 + timedelta(2))
+    changes, later = store.changes_since(cursor)
+
+    assert changes == [
+        PriceChange("cpu-1", "newegg", None, 95.0),
+        PriceChange("gpu-1", "newegg", 100.0, 80.0),
+    ]
+    assert store.changes_since(later) == ([], later)
+
+
+def test_changes_beyond_the_log_are_reported_as_a_gap(
+    path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(PriceHistoryStore, "change_log_size", 2)
+    store = PriceHistoryStore(path)
+    _, cursor = store.changes_since(None)
+
+    store.record([_item(float(price)) for price in range(3)], at=T0)
+    store.record([_item(7.0)], at=T0 + timedelta(1))
+    store.record([_item(8.0)], at=T0 + timedelta(2))
+
+    changes, _ = store.changes_since(cursor)
+    assert changes is None
+
+
+def test_second_instance_catches_up_on_another_writers_appends(path: Path) -> None:
+    writer = PriceHistoryStore(path)
+    reader = PriceHistoryStore(path)
+    _, cursor = reader.changes_since(None)
+
+    writer.record([_item(100.0), _item(40.0, sku="ram-1")], at=T0)
+    writer.record([_item(90.0)], at=T0 + timedelta(1))
+
+    assert _prices(reader) == [(T0, 100.0), (T0 + timedelta(1), 90.0)]
+    changes, _ = reader.changes_since(cursor)
+    assert [(change.sku, change.price) for change in changes] == [
+        ("gpu-1", 100.0),
+        ("ram-1", 40.0),
+        ("gpu-1", 90.0),
+    ]
+    # The reader knows the writer's last price, so an unchanged observation is skipped.
+    assert reader.record([_item(90.0)], at=T0 + timedelta(2)) == 0
+    assert reader.record([_item(85.0)], at=T0 + timedelta(3)) == 1
+    assert _prices(writer)[-1] == (T0 + timedelta(3), 85.0)
+
+
+def test_truncated_tail_record_is_repaired(path: Path) -> None:
+    store = PriceHistoryStore(path)
+    store.record([_item(100.0)], at=T0)
+    store.record([_item(90.0)], at=T0 + timedelta(1))
+    # A writer died half-way through appending its record.
+    with store.points_path.open("ab") as handle:
+        handle.write(b"\x00\x01\x02\x03\x04")
+
+    recovered = PriceHistoryStore(path)
+    assert _prices(recovered) == [(T0, 100.0), (T0 + timedelta(1), 90.0)]
+
+    assert recovered.record([_item(80.0)], at=T0 + timedelta(2)) == 1
+    assert _prices(PriceHistoryStore(path)) == [
+        (T0, 100.0),
+        (T0 + timedelta(1), 90.0),
+        (T0 + timedelta(2), 80.0),
+    ]
+
+
+def test_long_log_is_loaded_in_one_pass(path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    writer = PriceHistoryStore(path)
+    for day in range(6):
+        writer.record([_item(100.0 - day), _item(50.0 + day, sku="ram-1")], at=T0 + timedelta(day))
+
+    # Logs longer than ``pending_limit`` skip the per-point path on startup.
+    monkeypatch.setattr(PriceHistoryStore, "pending_limit", 4)
+    loaded = PriceHistoryStore(path)
+
+    assert len(loaded) == 12
+    assert _prices(loaded) == _prices(writer)
+    assert _prices(loaded, "ram-1") == _prices(writer, "ram-1")
+    assert loaded.record([_item(95.0)], at=T0 + timedelta(7)) == 0
@@ -0,0 +1,121 @@
+from pathlib import Path
+from typing import List, Optional
+
+import pytest
+
+from app.schemas.chat import ChatMessage, ChatPlanRequest
+from app.services.prompt_builder import PromptBuilder, estimate_tokens
+from app.services.vector_store import SimpleVectorStore
+
+
+def _product(sku: str, category: str, price: float, currency: str = "USD") -> dict:
+    return {
+        "sku": sku,
+        "name": f"{category} {sku}",
+        "category": category,
+        "price": price,
+        "currency": currency,
+        "vendor": "shop",
+        "url": f"https://shop.test/{sku}",
+    }
+
+
+@pytest.fixture
+def store(tmp_path: Path) -> SimpleVectorStore:
+    store = SimpleVectorStore(path=tmp_path / "vector_store")
+    store.upsert_many(
+        [
+            _product("gpu-a", "GPU", 450.0),
+            _product("gpu-b", "GPU", 650.0),
+            _product("gpu-c", "GPU", 3200.0, currency="CNY"),
+            _product("cpu-a", "CPU", 300.0),
+            _product("cpu-b", "CPU", 400.0),
+        ]
+    )
+    return store
+
+
+def _request(*texts: str, budget: Optional[float] = None, currency: str = "USD") -> ChatPlanRequest:
+    roles = ["user", "assistant"]
+    return ChatPlanRequest(
+        messages=[
+            ChatMessage(role=roles[index % 2], content=text) for index, text in enumerate(texts)
+        ],
+        budget=budget,
+        currency=currency,
+    )
+
+
+def _listed(shortlist: str) -> List[str]:
+    # The SKU is the last part of each candidate's URL.
+    lines = [line for line in shortlist.splitlines() if line.startswith("- ")]
+    return [line.rsplit("/", 1)[-1] for line in lines]
+
+
+def test_shortlist_caps_each_category_at_its_share_of_the_budget(
+    store: SimpleVectorStore,
+) -> None:
+    builder = PromptBuilder(catalog=lambda: store, categories=("GPU", "CPU"))
+
+    # A 1000 USD build: GPUs up to 500, CPUs up to 350.
+    listed = _listed(builder.shortlist(_request("gaming pc", budget=1000)))
+
+    assert sorted(listed) == ["cpu-a", "gpu-a", "gpu-c"]
+
+
+def test_shortlist_without_a_budget_is_uncapped(store: SimpleVectorStore) -> None:
+    builder = PromptBuilder(catalog=lambda: store, categories=("GPU", "CPU"))
+
+    listed = _listed(builder.shortlist(_request("gaming pc")))
+
+    assert sorted(listed) == ["cpu-a", "cpu-b", "gpu-a", "gpu-b", "gpu-c"]
+
+
+def test_shortlist_is_skipped_without_a_query() -> None:
+    def catalog() -> SimpleVectorStore:
+        raise AssertionError("the catalog must not be searched")
+
+    builder = PromptBuilder(catalog=catalog)
+
+    shortlist = builder.shortlist(_request("  ", budget=1000))
+
+    assert shortlist.startswith("Catalog candidates: none")
+
+
+def test_conversation_keeps_the_newest_turns_and_condenses_older_ones() -> None:
+    builder = PromptBuilder(catalog=lambda: None)
+    texts = [f"message {index} " + "detail " * 40 for index in range(20)]
+
+    rendered = builder.conversation(_request(*texts).messages, tokens=200)
+
+    assert estimate_tokens(rendered) <= 200
+    lines = rendered.splitlines()
+    # The two newest turns verbatim; one older user turn condensed to a line, and the
+    # remaining room too small for another, so everything else is only counted.
+    assert lines[-2:] == ["User: " + texts[-2].strip(), "Assistant: " + texts[-1].strip()]
+    assert lines[:2] == ["(17 earlier messages omitted)", "Earlier, the user said:"]
+    assert lines[2].startswith("- message 16 detail") and lines[2].endswith("…")
+    assert len(lines) == 5
+
+
+def test_oversized_latest_message_is_clipped() -> None:
+    builder = PromptBuilder(catalog=lambda: None)
+
+    rendered = builder.conversation(_request("word " * 2000).messages, tokens=100)
+
+    assert rendered.startswith("User: word word")
+    assert rendered.endswith("…")
+    assert estimate_tokens(rendered) <= 101
+
+
+def test_prompt_fits_the_token_budget(store: SimpleVectorStore) -> None:
+    builder = PromptBuilder(token_budget=1200, catalog=lambda: store)
+    texts = [f"turn {index} " + "requirement " * 60 for index in range(30)]
+    request = _request(*texts, budget=1500)
+
+    prompt = builder.build(request)
+
+    assert estimate_tokens(prompt) <= 1200
+    assert "Budget: 1500 USD" in prompt
+    assert "Catalog candidates (name | price | vendor | url):" in prompt
+    assert prompt.rstrip().endswith("requirement")
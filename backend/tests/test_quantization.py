@@ -0,0 +1,103 @@
+import random
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pytest
+
+from app.services.quantization import QuantizedMatrix
+from app.services.vector_store import SimpleVectorStore
+
+BRANDS = ["ASUS", "MSI", "Gigabyte", "Corsair", "Samsung", "Crucial", "Intel", "AMD"]
+CATEGORIES = ["GPU", "CPU", "Memory", "SSD", "Motherboard", "Power Supply"]
+FEATURES = [
+    "RGB", "white", "silent", "compact", "overclocked", "liquid cooled",
+    "DDR5", "PCIe 4.0", "NVMe", "ATX", "mini ITX", "modular", "ray tracing", "4k gaming",
+]
+QUERIES = [
+    "white RGB gaming card",
+    "silent compact build",
+    "fast NVMe PCIe 4.0 storage",
+    "DDR5 overclocked memory kit",
+    "modular power supply",
+    "mini ITX motherboard for a small case",
+]
+
+
+def _catalog(count: int = 400) -> List[Dict[str, Any]]:
+    rng = random.Random(13)
+    items = []
+    for index in range(count):
+        category = rng.choice(CATEGORIES)
+        features = rng.sample(FEATURES, 3)
+        items.append(
+            {
+                "sku": f"p{index}",
+                "name": f"{rng.choice(BRANDS)} {category} {' '.join(features)} {index}",
+                "category": category,
+                "price": float(rng.randint(50, 1500)),
+                "vendor": rng.choice(["newegg", "amazon"]),
+                "specs": {"scene_tags": rng.sample(FEATURES, 2)},
+            }
+        )
+    return items
+
+
+def _store(path: Path, quantization: str) -> SimpleVectorStore:
+    store = SimpleVectorStore(path=path / f"{quantization}.json", quantization=quantization)
+    # Rank on the vectors alone so the comparison is not masked by BM25 fusion.
+    store.hybrid = False
+    store.upsert_many(_catalog())
+    return store
+
+
+def _ranking(store: SimpleVectorStore, query: str, category: Optional[str]) -> List[tuple]:
+    return [
+        (hit["sku"], hit["similarity"]) for hit in store.search(query, top_k=10, category=category)
+    ]
+
+
+def _assert_same_ranking(actual: List[tuple], expected: List[tuple]) -> None:
+    assert [sku for sku, _ in actual] == [sku for sku, _ in expected]
+    # Re-ranking reports the full-precision similarity, not the approximate one.
+    assert [score for _, score in actual] == pytest.approx([score for _, score in expected])
+
+
+@pytest.mark.parametrize("mode", ["int8", "float16"])
+@pytest.mark.parametrize("category", [None, "GPU"])
+def test_quantized_search_with_reranking_matches_float32(
+    tmp_path: Path, mode: str, category: Optional[str]
+) -> None:
+    exact = _store(tmp_path, "float32")
+    quantized = _store(tmp_path, mode)
+    assert quantized.embeddings.quantized
+
+    for query in QUERIES:
+        _assert_same_ranking(_ranking(quantized, query, category), _ranking(exact, query, category))
+
+
+def test_reloaded_quantized_store_reranks_from_the_snapshot(tmp_path: Path) -> None:
+    exact = _store(tmp_path, "float32")
+    quantized = _store(tmp_path, "int8")
+    quantized.persist()
+
+    reloaded = SimpleVectorStore(path=tmp_path / "int8.json", quantization="int8")
+    reloaded.hybrid = False
+
+    for query in QUERIES:
+        _assert_same_ranking(_ranking(reloaded, query, None), _ranking(exact, query, None))
+
+
+@pytest.mark.parametrize("mode, tolerance", [("int8", 0.02), ("float16", 1e-3)])
+def test_approximate_scores_stay_close_to_exact(mode: str, tolerance: float) -> None:
+    rng = np.random.default_rng(7)
+    vectors = rng.normal(size=(300, 64)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    matrix = QuantizedMatrix(64, mode)
+    matrix.extend(vectors)
+    query = vectors[0]
+
+    approximate = matrix.scores(query)
+
+    assert np.allclose(matrix.scores(query, exact=True), vectors @ query, atol=1e-6)
+    assert np.abs(approximate - vectors @ query).max() < tolerance
@@ -0,0 +1,48 @@
+import asyncio
+from pathlib import Path
+
+from app.services.scheduler import RefreshScheduler
+
+
+def _scheduler(lock: Path) -> RefreshScheduler:
+    scheduler = RefreshScheduler(
+        pipeline_factory=lambda: None, intervals={"newegg": 3600.0}, leader_lock=lock
+    )
+    scheduler.election_interval = 0.01
+    return scheduler
+
+
+def test_only_one_worker_runs_the_periodic_refreshes(tmp_path: Path) -> None:
+    lock = tmp_path / "scheduler.lock"
+    # Each scheduler opens the lock file separately, as separate worker processes would.
+    first, second = _scheduler(lock), _scheduler(lock)
+
+    async def scenario():
+        await first.start()
+        await second.start()
+        await asyncio.sleep(0.05)
+        elected = (first.is_leader, second.is_leader)
+
+        await first.stop()
+        await asyncio.sleep(0.05)
+        taken_over = second.is_leader
+        await second.stop()
+        return elected, taken_over
+
+    elected, taken_over = asyncio.run(scenario())
+
+    assert elected == (True, False)
+    assert taken_over
+
+
+def test_scheduler_without_a_lock_always_leads() -> None:
+    scheduler = RefreshScheduler(pipeline_factory=lambda: None, intervals={"newegg": 3600.0})
+
+    async def scenario() -> bool:
+        await scheduler.start()
+        await asyncio.sleep(0)
+        leading = scheduler.is_leader
+        await scheduler.stop()
+        return leading
+
+    assert asyncio.run(scenario())
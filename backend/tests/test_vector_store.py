@@ -0,0 +1,270 @@
+import json
+from pathlib import Path
+from typing import List
+
+import numpy as np
+import pytest
+
+from app.services import vector_store
+from app.services.executors import submit_ingest
+from app.services.vector_store import (
+    SimpleVectorStore,
+    get_vector_store,
+    publish_vector_store,
+)
+
+
+def _items(count: int) -> List[dict]:
+    return [
+        {
+            "sku": f"s{index}",
+            "name": f"widget {index}",
+            "category": "GPU" if index % 2 else "CPU",
+            "price": float(index),
+            "vendor": "newegg",
+        }
+        for index in range(count)
+    ]
+
+
+@pytest.fixture
+def store(tmp_path: Path) -> SimpleVectorStore:
+    store = SimpleVectorStore(path=tmp_path / "vector_store.json")
+    store.upsert_many(_items(100))
+    store.persist()
+    return store
+
+
+def _skus(results) -> List[str]:
+    return sorted(hit["sku"] for hit in results)
+
+
+@pytest.mark.parametrize("query", [None, "widget"])
+def test_deleted_row_is_not_returned_by_price_filtered_search(
+    store: SimpleVectorStore, query
+) -> None:
+    assert store.delete("s5")
+
+    assert _skus(store.search(query, min_price=4, max_price=6)) == ["s4", "s6"]
+
+
+def test_deleted_row_stays_gone_after_reload(store: SimpleVectorStore, tmp_path: Path) -> None:
+    store.delete("s5")
+    store.persist()
+
+    reloaded = SimpleVectorStore(path=tmp_path / "vector_store.json")
+
+    assert _skus(reloaded.search(None, min_price=4, max_price=6)) == ["s4", "s6"]
+    assert _skus(reloaded.search(None, max_price=6)) == ["s0", "s1", "s2", "s3", "s4", "s6"]
+
+
+def test_reinserted_row_is_found_by_price_again(store: SimpleVectorStore) -> None:
+    store.delete("s5")
+    store.upsert_many([{**_items(6)[5], "price": 5.5}])
+
+    assert _skus(store.search(None, min_price=5, max_price=6)) == ["s5", "s6"]
+
+
+def _price(store: SimpleVectorStore, sku: str) -> float:
+    return next(record.metadata["price"] for record in store.records if record.identifier == sku)
+
+
+def test_stale_journal_is_not_replayed_over_a_newer_snapshot(tmp_path: Path) -> None:
+    path = tmp_path / "vector_store.json"
+    store = SimpleVectorStore(path=path)
+    item = _items(1)[0]
+    store.upsert_many([{**item, "price": 100.0}])
+    store.persist()
+    store.upsert_many([{**item, "price": 90.0}])
+    store.persist()
+    journal = store.files.journal_path.read_bytes()
+    assert journal
+
+    store.journal_limit = 0
+    store.upsert_many([{**item, "price": 80.0}])
+    store.persist()
+    assert not store.files.journal_path.exists()
+    # A crash after publishing the snapshot but before the journal was removed.
+    store.files.journal_path.write_bytes(journal)
+
+    assert _price(SimpleVectorStore(path=path), "s0") == 80.0
+
+
+@pytest.mark.parametrize("query", [None, "widget"])
+@pytest.mark.parametrize(
+    "filters",
+    [{"min_price": 4, "max_price": 6}, {"category": "GPU", "max_price": 7}],
+)
+def test_export_after_delete_yields_only_live_matches(
+    store: SimpleVectorStore, query, filters
+) -> None:
+    store.delete("s5")
+    expected = [
+        item["sku"]
+        for item in _items(100)
+        if item["sku"] != "s5"
+        and item["price"] <= filters["max_price"]
+        and item["price"] >= filters.get("min_price", 0)
+        and item["category"] == filters.get("category", item["category"])
+    ]
+
+    assert _skus(store.iter_search(query, **filters)) == sorted(expected)
+
+
+@pytest.mark.parametrize("query", [None, "widget"])
+def test_export_skips_deleted_rows_offered_by_the_filter_index(
+    store: SimpleVectorStore, monkeypatch: pytest.MonkeyPatch, query
+) -> None:
+    store.delete("s5")
+    # An index that still lists the deleted row must not leak it or an unrelated one.
+    monkeypatch.setattr(
+        store.filters, "candidates", lambda *args, **kwargs: np.array([4, 5, 6], dtype=np.intp)
+    )
+    monkeypatch.setattr(store, "search", lambda *args, **kwargs: [])
+
+    assert _skus(store.iter_search(query, min_price=4, max_price=6)) == ["s4", "s6"]
+
+
+@pytest.mark.parametrize("filters", [{}, {"category": "GPU", "max_price": 60}])
+def test_export_tail_is_ranked_in_bounded_passes(
+    store: SimpleVectorStore, monkeypatch: pytest.MonkeyPatch, filters
+) -> None:
+    store.delete("s5")
+    # A short fused head leaves most of the results to the tail.
+    monkeypatch.setattr(store, "fusion_depth", 5)
+    expected = list(store.iter_search("widget 7", **filters))
+    monkeypatch.setattr(store, "export_batch_rows", 8)
+    scored = []
+    scores = store.embeddings.scores
+
+    def recording(query, rows=None, exact=False):
+        scored.append(len(rows))
+        return scores(query, rows, exact)
+
+    monkeypatch.setattr(store.embeddings, "scores", recording)
+
+    exported = list(store.iter_search("widget 7", **filters))
+
+    assert [hit["sku"] for hit in exported] == [hit["sku"] for hit in expected]
+    assert [hit["similarity"] for hit in exported] == [hit["similarity"] for hit in expected]
+    assert len({hit["sku"] for hit in exported}) == len(exported)
+    assert len(scored) > 2 and max(scored) <= 8
+
+
+def test_snapshot_is_published_through_one_manifest(tmp_path: Path) -> None:
+    path = tmp_path / "vector_store.json"
+    writer = SimpleVectorStore(path=path)
+    writer.journal_limit = 0
+    for price in (1.0, 2.0, 3.0):
+        writer.upsert_many([{**_items(1)[0], "price": price}])
+        writer.persist()
+
+    manifest = json.loads(writer.files.manifest_path.read_text())
+    assert manifest["sequence"] == 3
+    # The previous snapshot stays for readers that picked up its manifest; older ones go.
+    assert sorted(p.name for p in tmp_path.glob("vector_store.*.meta.json")) == [
+        "vector_store.2.meta.json",
+        "vector_store.3.meta.json",
+    ]
+    assert _price(SimpleVectorStore(path=path), "s0") == 3.0
+
+
+def test_snapshot_replaced_mid_read_is_read_again(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    path = tmp_path / "vector_store.json"
+    writer = SimpleVectorStore(path=path)
+    writer.journal_limit = 0
+    writer.upsert_many(_items(3))
+    writer.persist()
+    reader = SimpleVectorStore(path=path)
+
+    read_files = reader.files._read_files
+    calls = []
+
+    def racing_read(manifest):
+        if not calls:
+            # Two snapshots land between reading the manifest and opening its files.
+            for price in (7.0, 8.0):
+                writer.upsert_many([{**_items(1)[0], "price": price}])
+                writer.persist()
+        calls.append(manifest["sequence"])
+        return read_files(manifest)
+
+    monkeypatch.setattr(reader.files, "_read_files", racing_read)
+    reader._load()
+
+    assert calls == [1, 3]
+    assert _price(reader, "s0") == 8.0
+
+
+def test_unreadable_snapshot_is_an_error_not_an_empty_store(tmp_path: Path) -> None:
+    path = tmp_path / "vector_store.json"
+    store = SimpleVectorStore(path=path)
+    store.upsert_many(_items(3))
+    store.persist()
+    manifest = json.loads(store.files.manifest_path.read_text())
+    np.save(tmp_path / manifest["embeddings"], np.zeros((2, 256), dtype=np.float32))
+
+    with pytest.raises(ValueError):
+        SimpleVectorStore(path=path)
+
+
+def test_reader_follows_another_writers_journal(tmp_path: Path) -> None:
+    path = tmp_path / "vector_store.json"
+    writer = SimpleVectorStore(path=path)
+    writer.upsert_many(_items(3))
+    writer.persist()
+    reader = SimpleVectorStore(path=path)
+
+    writer.delete("s1")
+    writer.persist()
+
+    assert reader.is_stale()
+    assert _skus(reader.fork().search(None)) == ["s0", "s2"]
+
+
+def _drain_ingest() -> None:
+    # The ingest thread runs jobs in order, so this returns once earlier ones are done.
+    submit_ingest(lambda: None).result()
+
+
+def test_stale_store_keeps_serving_while_it_reloads_in_the_background(
+    store: SimpleVectorStore, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(vector_store, "_store_instance", store)
+    monkeypatch.setattr(vector_store, "_reloading", None)
+    other_worker = SimpleVectorStore(path=store.path)
+    other_worker.delete("s1")
+    other_worker.persist()
+
+    assert get_vector_store() is store
+    _drain_ingest()
+
+    reloaded = get_vector_store()
+    assert reloaded is not store
+    assert "s1" not in {item["sku"] for item in reloaded.all()}
+    assert get_vector_store() is reloaded
+
+
+def test_own_pending_publish_is_not_reloaded(
+    store: SimpleVectorStore, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(vector_store, "_store_instance", store)
+    monkeypatch.setattr(vector_store, "_reloading", None)
+    target = store.fork()
+    forks = []
+    monkeypatch.setattr(SimpleVectorStore, "fork", lambda self: forks.append(self))
+
+    def refresh() -> None:
+        target.delete("s1")
+        target.persist()
+        # A request between persisting and publishing sees the published store as stale.
+        assert get_vector_store() is store
+        publish_vector_store(target)
+
+    submit_ingest(refresh).result()
+    _drain_ingest()
+
+    assert forks == []
+    assert get_vector_store() is target